@@ -1,4 +1,5 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 from scripts.calc import (
     get_all_teil_ids,
@@ -7,8 +8,23 @@ from scripts.calc import (
     calc_order_cost,
     calc_full_cost_structure
 )
+from scripts.cache import ResultCache, bump_data_version, get_data_version
+from scripts.config import settings
+from scripts.cost_model import CostModel
 from scripts.database import Session
-from scripts.utils import format_de
+from scripts import embedded
+from scripts import instrumentation
+from scripts.recalc import recalc, stored_order_cost
+from scripts.snapshot import load_arrays
+from scripts.scenario import BASIS, ScenarioEngine, Scenario, Change, parse_scenario
+from scripts.utils import format_de, normalize_knoten, style_de
+from scripts.bulk import ENTITIES, insert_rows, read_table, validate
+from scripts.rollup import CycleError
+from scripts import validate as datenpruefung
+from scripts.where_used import WhereUsedIndex
+from scripts.cost_history import CostHistory
+from scripts.cost_drivers import DIMENSIONS, LABELS, DriverAnalysis
+from scripts.tree import PAGE_SIZE, CostTree, paginate
 from scripts.models import Teil, Auftrag, Material, Maschine, Arbeitsplan
 
 
@@ -17,71 +33,384 @@ st.title("Kostenträgerrechnung")
 
 mode = st.radio(
     "Bitte wählen Sie einen Modus",
-    ["Detaillierte Tabelle nach Auftrag", "Daten eingeben"]
+    ["Detaillierte Tabelle nach Auftrag", "Szenarienvergleich", "Verwendungsnachweis", "Kostenverlauf",
+     "Kostentreiber", "Daten eingeben"]
 )
 
 
-def display_structure(structure, level=0):
-    indent = "&nbsp;" * 4 * level
-    for teil in structure:
-        st.markdown(
-            f"{indent}- **Teil-ID**: {teil['teil_id']} | "
-            f"**Menge**: {teil['anzahl']} | "
-            f"**Einzelkosten**: {format_de(teil['kosten_pro_stk'])} € | "
-            f"**Gesamt**: {format_de(teil['kosten_gesamt'])} €",
-            unsafe_allow_html=True
+@st.cache_resource
+def seed_database():
+    # Eingebettete Datenbank einmal je Serverprozess befüllen (siehe embedded.py)
+    embedded.startup()
+    return True
+
+
+@st.cache_resource
+def get_result_cache():
+    # Ein Cache für alle Sitzungen des Servers
+    return ResultCache(maxsize=settings["cache_size"])
+
+
+seed_database()
+cache = get_result_cache()
+data_version = get_data_version()
+
+
+def cached_arrays():
+    # Spaltenansicht für Kostenbaum, Szenarien, Verwendungsnachweis und Kostentreiber
+    if settings["snapshot"]:
+        return cache.get_or_compute(
+            ("stammdaten_arrays",), data_version, lambda: load_arrays(settings["snapshot"], data_version)
+        )
+    return cached_cost_model().arrays()
+
+
+def cached_cost_model():
+    if settings["snapshot"]:
+        return cache.get_or_compute(
+            ("cost_model",), data_version, lambda: CostModel.from_arrays(cached_arrays())
+        )
+    return cache.get_or_compute(("cost_model",), data_version, CostModel.load)
+
+
+def cached_validation():
+    return cache.get_or_compute(("datenpruefung",), data_version, datenpruefung.validate)
+
+
+@st.cache_resource
+def get_where_used():
+    # Ein Verwendungsnachweis für alle Sitzungen, wird bei eigenen Änderungen fortgeschrieben
+    return {"index": None}
+
+
+def where_used_index():
+    holder = get_where_used()
+    index = holder["index"]
+    if index is None:
+        holder["index"] = WhereUsedIndex(cached_arrays(), data_version)
+    elif index.version != data_version:
+        index.rebuild(cached_arrays(), data_version)
+    return holder["index"]
+
+
+def commit_change(session, update_where_used=lambda index: True):
+    """Erhöht den Datenstand, committet und schreibt den Verwendungsnachweis fort"""
+    version = bump_data_version(session)
+    session.commit()
+    index = get_where_used()["index"]
+    if index is not None:
+        index.advance(version, lambda: update_where_used(index))
+
+
+def bulk_where_used(index, result):
+    """Schreibt importierte Teile und Arbeitspläne in den Verwendungsnachweis fort"""
+    rows = result.rows.astype(object).where(result.rows.notna(), None)
+    if result.entity == "Teil":
+        return index.add_teile(list(rows[["teil_id", "knoten", "anzahl", "mat"]].itertuples(index=False, name=None)))
+    if result.entity == "Arbeitsplan":
+        return all([index.add_arbeitsplan(t, m, d) for t, m, d in
+                    rows[["teil_id", "maschine", "dauer"]].itertuples(index=False, name=None)])
+    # Neue Aufträge, Materialien und Maschinen werden noch nirgends verwendet
+    return True
+
+
+def render_tree(tree, auftrag, teil_id=None, level=0):
+    """Zeigt eine Seite der Unterteile; Unterbäume werden erst beim Aufklappen geladen"""
+    open_nodes = st.session_state.setdefault("baum_offen", set())
+    limits = st.session_state.setdefault("baum_limit", {})
+    limit = limits.get(teil_id, PAGE_SIZE)
+    page = tree.children(auftrag, teil_id, limit=limit)
+
+    indent = "\u2003" * 2 * level
+    for row in page.rows.itertuples(index=False):
+        label = (
+            f"Teil {row[0]} | Menge {format_de(row[3])} | "
+            f"Einzelkosten {format_de(row[5])} € | Gesamt {format_de(row[6])} €"
         )
-        if teil["struktur"]:
-            display_structure(teil["struktur"], level + 1)
+        node = row[0]
+        if row[7]:
+            # Umschalten im Callback, damit das Symbol schon im selben Lauf stimmt
+            st.button(f"{indent}{'▾' if node in open_nodes else '▸'} {label} ({row[7]} Unterteile)",
+                      key=f"baum_{node}", on_click=open_nodes.symmetric_difference_update, args=({node},))
+            if node in open_nodes:
+                render_tree(tree, auftrag, node, level + 1)
+        else:
+            st.markdown(f"{indent}\u2003• {label}")
+
+    if page.total > limit:
+        st.button(f"{indent}… weitere {min(PAGE_SIZE, page.total - limit)} von {page.total - limit} laden",
+                  key=f"baum_mehr_{teil_id or auftrag}", on_click=limits.__setitem__, args=(teil_id, limit + PAGE_SIZE))
 
 
 if mode == "Detaillierte Tabelle nach Auftrag":
     def load_orders():
-        return get_all_auftrag_ids()
+        return cache.get_or_compute(("auftraege",), data_version, get_all_auftrag_ids)
 
 
     orders = load_orders()
     auftrag = st.selectbox("Wählen Sie einen Auftrag für die detaillierte Tabelle", orders)
 
+    # Datenprüfung vor der Kalkulation (einmal je Datenstand)
+    issues = cached_validation()
+    error_count = int((issues["Schwere"] == datenpruefung.FEHLER).sum())
+    if error_count:
+        st.warning(f"Datenprüfung: {error_count} Fehler in den Stammdaten, Ergebnisse können unvollständig sein "
+                   f"(Details unter „Datenprüfung“ in der Seitenleiste).")
+
+    stored = stored_order_cost(auftrag) if auftrag else None
+    if stored:
+        st.caption(
+            f"Gespeicherte Auftragskosten: {format_de(stored['order_total'])} € "
+            f"(Material {format_de(stored['k_mat'])} €, Fertigung {format_de(stored['k_fert'])} €, "
+            f"Stand {stored['dat_kost']})"
+        )
+
+    # Auswahl über Neuläufe hinweg merken (Blättern, Sortieren, Aufklappen)
     if st.button("Tabelle generieren"):
-        session = Session()
+        st.session_state["tabelle_auftrag"] = auftrag
+        st.session_state["baum_offen"] = set()
+        st.session_state["baum_limit"] = {}
+
+    if auftrag and st.session_state.get("tabelle_auftrag") == auftrag:
         try:
-            df = calc_full_cost_structure(auftrag)
+            df = cache.get_or_compute(
+                ("kostenstruktur", auftrag), data_version,
+                lambda: calc_full_cost_structure(auftrag, model=cached_cost_model())
+            )
+        except CycleError as e:
+            df = None
+            st.error(f"Kalkulation nicht möglich: {e}")
+
+        if df is not None:
             st.subheader(f"Detaillierte Kostenstruktur für Auftrag {auftrag}")
+            view = st.radio("Ansicht", ["Tabelle", "Baum"], horizontal=True, key="rad_ansicht")
 
-            # Formatierung der numerischen Spalten
-            numeric_cols = ["Anzahl", "Gesamt Anzahl", "Mat. Einzel", "Mat. Pos.", "MGK", "Fert. Pos.", "FGK", "Gesamtkosten"]
-            for col in numeric_cols:
-                if col in df.columns:
-                    df[col] = df[col].apply(
-                        lambda x: format_de(x) if isinstance(x, (int, float)) else x
-                    )
+            if view == "Tabelle":
+                # Nur Positionen, Auftragskopf und GESAMT-Zeile werden gesondert behandelt
+                positions = df.iloc[1:-1]
+                col_sort, col_dir, col_size, col_search = st.columns([2, 1, 1, 2])
+                sort_by = col_sort.selectbox("Sortieren nach", ["(Stückliste)"] + list(positions.columns[1:]),
+                                             key="sel_sort")
+                descending = col_dir.selectbox("Richtung", ["absteigend", "aufsteigend"], key="sel_dir") == "absteigend"
+                page_size = col_size.selectbox("Zeilen je Seite", [50, 100, 500], key="sel_page_size")
+                suche = col_search.text_input("Position enthält", key="inp_suche").strip()
 
+                matches = paginate(positions, limit=0, suche=suche).total
+                pages = max(1, -(-matches // page_size))
+                if st.session_state.get("inp_seite", 1) > pages:
+                    st.session_state["inp_seite"] = 1
+                page_nr = st.number_input(f"Seite (von {pages})", min_value=1, max_value=pages, value=1,
+                                          key="inp_seite")
+                page = paginate(
+                    positions, offset=(page_nr - 1) * page_size, limit=page_size,
+                    sort_by=None if sort_by == "(Stückliste)" else sort_by,
+                    descending=descending, suche=suche
+                )
+                st.caption(f"{page.total} von {len(positions)} Positionen")
 
-            # Highlight der Gesamtsumme
-            def color_last_row(row):
-                if row["Position"] == "GESAMT":
-                    return ['background-color: #FFEB3B; font-weight: bold;'] * len(row)
-                return [''] * len(row)
+                # Zahlen bleiben numerisch (Sortieren in der Tabelle), formatiert wird erst beim Rendern
+                numeric_cols = ["Anzahl", "Gesamt Anzahl", "Mat. Einzel", "Mat. Pos.", "MGK", "Fert. Pos.", "FGK", "Gesamtkosten"]
+                st.dataframe(
+                    style_de(page.rows, numeric_cols),
+                    use_container_width=True,
+                    hide_index=True,
+                    height=min(800, 35 * (len(page.rows) + 1))
+                )
+                # GESAMT-Zeile unabhängig von Seite, Sortierung und Suche unter der Tabelle, hervorgehoben wie bisher
+                total_row = style_de(df.iloc[[-1]], numeric_cols).set_properties(
+                    **{"background-color": "#FFEB3B", "font-weight": "bold"})
+                st.dataframe(total_row, use_container_width=True, hide_index=True)
+            else:
+                try:
+                    tree = cache.get_or_compute(("kostenbaum",), data_version, lambda: CostTree(cached_arrays()))
+                except CycleError as e:
+                    st.error(f"Kostenbaum nicht möglich: {e}")
+                else:
+                    render_tree(tree, auftrag)
 
+            # Gesamtsumme extra anzeigen
+            total_value = df["Gesamtkosten"].iloc[-1]
+            st.success(f"## Gesamtsumme des Auftrags: {format_de(total_value)} €")
 
-            styled_df = df.style.apply(color_last_row, axis=1)
+if mode == "Szenarienvergleich":
+    try:
+        engine = cache.get_or_compute(
+            ("szenarien",), data_version, lambda: ScenarioEngine(cached_arrays())
+        )
+    except CycleError as e:
+        engine = None
+        st.error(f"Szenarienvergleich nicht möglich: {e}")
 
-            st.dataframe(
-                styled_df,
-                use_container_width=True,
-                height=min(800, 35 * len(df))
+    if engine is not None:
+        st.caption(
+            "Ein Szenario je Zeile: `Name: Änderung, Änderung, …` mit `M001*1.15` (Faktor), "
+            "`003+8` bzw. `003-8` (Aufschlag in €), `003+5%` (Aufschlag in %), `M002=20` (neuer Preis) "
+            "sowie `MGK=12` / `FGK=12` (Zuschlagssatz in %)."
+        )
+        text = st.text_area(
+            "Szenarien",
+            value="Stahl +15 %: M001*1.15\nZuschläge 12 %: MGK=12%, FGK=12%",
+            key="inp_szenarien"
+        )
+
+        scenarios = []
+        for line in text.splitlines():
+            if line.strip():
+                try:
+                    scenarios.append(parse_scenario(line))
+                except ValueError as e:
+                    st.error(str(e))
+
+        with st.expander("Parameterreihe", expanded=False):
+            sweep_nr = st.selectbox(
+                "Material oder Maschine",
+                [""] + engine.arrays.material_ids.tolist() + engine.arrays.maschine_ids.tolist(),
+                key="sel_sweep_nr"
             )
+            col_von, col_bis, col_n = st.columns(3)
+            von = col_von.number_input("Faktor von", value=0.8, step=0.05, key="inp_sweep_von")
+            bis = col_bis.number_input("Faktor bis", value=1.2, step=0.05, key="inp_sweep_bis")
+            schritte = col_n.number_input("Schritte", min_value=2, max_value=1000, value=41, key="inp_sweep_n")
+            if sweep_nr:
+                for faktor in np.linspace(von, bis, int(schritte)):
+                    scenarios.append(Scenario(f"{sweep_nr}*{faktor:.3f}", changes=(Change(sweep_nr, "*", faktor),)))
 
-            # Gesamtsumme extra anzeigen
-            total_row = df[df["Position"] == "GESAMT"].iloc[0]
-            total_value = total_row["Gesamtkosten"]
-            st.success(f"## Gesamtsumme des Auftrags: {format_de(total_value)} €")
-        finally:
-            session.close()
+        if scenarios:
+            try:
+                summary = engine.summary(scenarios)
+            except KeyError as e:
+                st.error(e.args[0])
+            else:
+                st.subheader(f"{len(scenarios)} Szenarien über {len(engine.order_ids)} Aufträge")
+                st.dataframe(
+                    style_de(summary, ["Material", "Fertigung", "Gesamt", "Abweichung", "Abweichung %"]),
+                    hide_index=True,
+                    use_container_width=True
+                )
+                if sweep_nr:
+                    st.line_chart(summary.set_index("Szenario")["Gesamt"])
+
+                with st.expander("Kosten je Auftrag", expanded=False):
+                    per_order = engine.frame([BASIS, *scenarios])
+                    st.dataframe(style_de(per_order), use_container_width=True)
+
+if mode == "Verwendungsnachweis":
+    try:
+        index = where_used_index()
+    except CycleError as e:
+        index = None
+        st.error(f"Verwendungsnachweis nicht möglich: {e}")
+
+    if index is not None:
+        arrays = cached_arrays()
+        col_kind, col_nr = st.columns(2)
+        kind = col_kind.radio("Art", ["Material", "Maschine"], horizontal=True, key="rad_wu_kind")
+        nrs = sorted((arrays.material_ids if kind == "Material" else arrays.maschine_ids).tolist())
+        nr = col_nr.selectbox(f"{kind}-Nr", nrs, key="sel_wu_nr")
+
+        if nr:
+            kind_key = kind.lower()
+            orders_df = index.orders(kind_key, nr)
+            parts_df = index.parts(kind_key, nr)
+            einheit = "Stück" if kind == "Material" else "Stunden"
+
+            col_a, col_b, col_c = st.columns(3)
+            col_a.metric("Betroffene Aufträge", len(orders_df))
+            col_b.metric("Betroffene Teile", len(parts_df))
+            col_c.metric("€ je € Preisänderung (alle Aufträge)",
+                         format_de(orders_df["€ je € Preisänderung"].sum()))
+
+            st.subheader(f"Aufträge ({einheit})")
+            st.dataframe(style_de(orders_df, ["Menge", "€ je € Preisänderung"]),
+                         hide_index=True, use_container_width=True)
+
+            st.subheader(f"Teile ({einheit} je Stück)")
+            page = paginate(parts_df, limit=PAGE_SIZE * 4)
+            if page.total > len(page.rows):
+                st.caption(f"Die ersten {len(page.rows)} von {page.total} Teilen")
+            st.dataframe(style_de(page.rows, ["Menge je Stück", "€ je € Preisänderung"]),
+                         hide_index=True, use_container_width=True)
+
+if mode == "Kostenverlauf":
+    history = CostHistory()
+    col_note, col_record = st.columns([3, 1])
+    bemerkung = col_note.text_input("Bemerkung zum Kostenlauf", key="inp_lauf_bemerkung")
+    if col_record.button("Kostenlauf erfassen", key="btn_lauf"):
+        try:
+            auftraege = cache.get_or_compute(("auftraege",), data_version, get_all_auftrag_ids)
+            entry = history.record(cached_cost_model(), auftraege, data_version, bemerkung)
+            st.success(f"Kostenlauf {entry['lauf']} erfasst ({entry['teile_geschrieben']} von "
+                       f"{entry['teile']} Teilen neu gespeichert).")
+        except CycleError as e:
+            st.error(f"Kostenlauf nicht möglich: {e}")
+
+    runs = history.runs()
+    if len(runs) < 2:
+        st.info("Für einen Vergleich werden mindestens zwei Kostenläufe benötigt.")
+    else:
+        labels = {r["lauf"]: f"{r['lauf']} – {r['zeit']} (Datenstand {r['datenstand']}) {r['bemerkung']}".strip()
+                  for r in runs}
+        col_alt, col_neu = st.columns(2)
+        alt = col_alt.selectbox("Alter Lauf", list(labels), index=len(labels) - 2, format_func=labels.get,
+                                key="sel_lauf_alt")
+        neu = col_neu.selectbox("Neuer Lauf", list(labels), index=len(labels) - 1, format_func=labels.get,
+                                key="sel_lauf_neu")
+        result = cache.get_or_compute(("kostenvergleich", alt, neu), data_version, lambda: history.diff(alt, neu))
+        delta_cols = ["Gesamt alt", "Gesamt neu", "Δ Material", "Δ MGK", "Δ Fertigung", "Δ FGK", "Δ Gesamt", "Δ %"]
+
+        col_a, col_b = st.columns(2)
+        col_a.metric("Geänderte Aufträge", len(result.auftraege))
+        col_b.metric("Δ Gesamt", f"{format_de(result.auftraege['Δ Gesamt'].sum())} €")
+        page = paginate(result.auftraege, limit=PAGE_SIZE * 4)
+        if page.total > len(page.rows):
+            st.caption(f"Die ersten {len(page.rows)} von {page.total} Aufträgen (nach Betrag der Änderung)")
+        st.dataframe(style_de(page.rows, delta_cols), hide_index=True, use_container_width=True)
+
+        if len(result.auftraege):
+            auftrag = st.selectbox("Ursachen für Auftrag", result.auftraege["Auftrag"].tolist(), key="sel_lauf_auftrag")
+            teile = result.teile[result.teile["Auftrag"] == auftrag]
+            page = paginate(teile, limit=PAGE_SIZE * 4)
+            if page.total > len(page.rows):
+                st.caption(f"Die ersten {len(page.rows)} von {page.total} Teilen")
+            st.dataframe(style_de(page.rows), hide_index=True, use_container_width=True)
+
+if mode == "Kostentreiber":
+    col_dim, col_share, col_sketch = st.columns([2, 2, 1])
+    dimension = col_dim.selectbox("Dimension", DIMENSIONS, format_func=LABELS.get, key="sel_treiber_dim")
+    share = col_share.slider("Kostenanteil %", 50, 100, 80, step=5, key="sld_treiber_anteil") / 100
+    sketch = col_sketch.checkbox("Schätzung (Sketch)", key="chk_treiber_sketch",
+                                 disabled=dimension not in ("teil", "teil_nr"),
+                                 help="Count-Min-Sketch statt exakter Summen, für sehr viele Teile")
+    try:
+        result = cache.get_or_compute(
+            ("kostentreiber", dimension, share, sketch), data_version,
+            lambda: DriverAnalysis(cached_arrays()).run([dimension], sketch=sketch, share=share)
+        )[dimension]
+    except CycleError as e:
+        st.error(f"Analyse nicht möglich: {e}")
+    else:
+        table = result.table
+        reached = table["Kumuliert %"].iloc[-1] if len(table) else 0.0
+        col_a, col_b, col_c = st.columns(3)
+        col_a.metric("Gesamtkosten", f"{format_de(result.total)} €")
+        col_b.metric(f"{LABELS[dimension]} für {format_de(reached)} %", len(table))
+        if not result.exact:
+            col_c.caption("Beträge sind obere Schätzungen aus dem Count-Min-Sketch.")
+        if reached < share * 100 - 1e-9:
+            st.info("Die größten Kostentreiber erreichen den gewählten Anteil nicht.")
+
+        page = paginate(table, limit=PAGE_SIZE * 4)
+        if page.total > len(page.rows):
+            st.caption(f"Die ersten {len(page.rows)} von {page.total} Schlüsseln")
+        st.dataframe(style_de(page.rows, ["Kosten", "Anteil %", "Kumuliert %"]),
+                     hide_index=True, use_container_width=True)
+        if len(table):
+            st.bar_chart(page.rows.set_index(LABELS[dimension])["Kosten"])
 
 if mode == "Daten eingeben":
-    tab1, tab2, tab3, tab4 = st.tabs(["➕ Auftrag", "➕ Teil", "➕ Arbeitsplan", "➕ Material / Maschine"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        ["➕ Auftrag", "➕ Teil", "➕ Arbeitsplan", "➕ Material / Maschine", "⬆️ Massenimport"]
+    )
 
     with tab1:
         st.subheader("Neuen Auftrag anlegen")
@@ -98,7 +427,8 @@ if mode == "Daten eingeben":
                         st.warning(f"Auftrag {auftrag_nr} existiert bereits.")
                     else:
                         session.add(Auftrag(auftrag_nr=auftrag_nr))
-                        session.commit()
+                        recalc(session, auftraege=[auftrag_nr])
+                        commit_change(session)
                         st.success(f"Auftrag {auftrag_nr} wurde erfolgreich gespeichert.")
                 finally:
                     session.close()
@@ -108,7 +438,7 @@ if mode == "Daten eingeben":
         teil_id_raw = st.text_input("Teil-ID (z. B. 0000042)", key="inp_teil_id_raw")
         teil_id = teil_id_raw.strip().zfill(7)
         teil_nr = st.text_input("Teil-Nr", key="inp_teil_nr")
-        knoten = st.text_input("Gehört zu (Auftrag oder übergeordnetes Teil)", key="inp_knoten").strip().upper()
+        knoten = normalize_knoten(st.text_input("Gehört zu (Auftrag oder übergeordnetes Teil)", key="inp_knoten"))
         mat = st.text_input("Material-Nr (z. B. M004)", key="inp_mat").strip().upper()
         anzahl = st.number_input("Anzahl", min_value=1, value=1, key="inp_anzahl")
 
@@ -120,9 +450,15 @@ if mode == "Daten eingeben":
                 elif not session.query(Material).filter_by(nr=mat).first():
                     st.error(f"Material {mat} existiert nicht.")
                 else:
-                    session.add(Teil(teil_id=teil_id, teil_nr=teil_nr, knoten=knoten, anzahl=anzahl, mat=mat))
-                    session.commit()
-                    st.success(f"Teil {teil_id} wurde gespeichert.")
+                    try:
+                        session.add(Teil(teil_id=teil_id, teil_nr=teil_nr, knoten=knoten, anzahl=anzahl, mat=mat))
+                        recalc(session, teil_ids=[teil_id])
+                    except CycleError as e:
+                        session.rollback()
+                        st.error(str(e))
+                    else:
+                        commit_change(session, lambda index: index.add_teil(teil_id, knoten, anzahl, mat))
+                        st.success(f"Teil {teil_id} wurde gespeichert.")
             finally:
                 session.close()
 
@@ -145,9 +481,15 @@ if mode == "Daten eingeben":
                     if exists:
                         st.warning("Diese Arbeitsplan-Zeile existiert bereits.")
                     else:
-                        session.add(Arbeitsplan(teil_id=ap_teil_id, ag_nr=ag_nr, maschine=maschine, dauer=dauer))
-                        session.commit()
-                        st.success("Arbeitsplan gespeichert.")
+                        try:
+                            session.add(Arbeitsplan(teil_id=ap_teil_id, ag_nr=ag_nr, maschine=maschine, dauer=dauer))
+                            recalc(session, teil_ids=[ap_teil_id])
+                        except CycleError as e:
+                            session.rollback()
+                            st.error(str(e))
+                        else:
+                            commit_change(session, lambda index: index.add_arbeitsplan(ap_teil_id, maschine, dauer))
+                            st.success("Arbeitsplan gespeichert.")
             finally:
                 session.close()
 
@@ -166,7 +508,8 @@ if mode == "Daten eingeben":
                         st.warning("Material existiert bereits.")
                     else:
                         session.add(Material(nr=mat_nr, kost=mat_kost))
-                        session.commit()
+                        recalc(session, materialien=[mat_nr])
+                        commit_change(session)
                         st.success("Material gespeichert.")
                 finally:
                     session.close()
@@ -182,7 +525,79 @@ if mode == "Daten eingeben":
                         st.warning("Maschine existiert bereits.")
                     else:
                         session.add(Maschine(nr=maschine_nr, bezeichnung=bezeichnung, ks=ks))
-                        session.commit()
+                        recalc(session, maschinen=[maschine_nr])
+                        commit_change(session)
                         st.success("Maschine gespeichert.")
                 finally:
-                    session.close()
\ No newline at end of file
+                    session.close()
+
+    with tab5:
+        st.subheader("Mehrere Zeilen auf einmal importieren")
+        entity = st.selectbox("Tabelle", list(ENTITIES), key="sel_bulk_entity")
+        st.caption("Spalten: " + ", ".join(f.name for f in ENTITIES[entity].fields))
+        upload = st.file_uploader("CSV- oder Excel-Datei", type=["csv", "txt", "xlsx"], key="upl_bulk")
+        pasted = st.text_area("… oder Tabelle einfügen (mit Kopfzeile)", key="inp_bulk_paste")
+        skip_invalid = st.checkbox("Fehlerhafte Zeilen überspringen", value=False, key="chk_bulk_skip")
+
+        if st.button("Prüfen und importieren", key="btn_bulk_import"):
+            session = Session()
+            try:
+                if upload is not None:
+                    df = read_table(upload.getvalue(), upload.name)
+                elif pasted.strip():
+                    df = read_table(pasted)
+                else:
+                    df = None
+                    st.error("Bitte eine Datei hochladen oder eine Tabelle einfügen.")
+
+                if df is not None:
+                    result = validate(session, entity, df)
+                    if len(result.errors):
+                        st.warning(f"{len(result.errors)} von {len(df)} Zeilen fehlerhaft.")
+                        st.dataframe(result.errors, hide_index=True, use_container_width=True)
+
+                    if len(result.errors) and not skip_invalid:
+                        st.info("Es wurde nichts gespeichert.")
+                    elif result.rows.empty:
+                        st.info("Keine gültigen Zeilen zum Speichern.")
+                    else:
+                        count = insert_rows(session, result, bump=False)
+                        commit_change(session, lambda index: bulk_where_used(index, result))
+                        st.success(f"{count} Zeilen in {entity} gespeichert.")
+            except (ValueError, CycleError) as e:
+                session.rollback()
+                st.error(str(e))
+            finally:
+                session.close()
+
+with st.sidebar:
+    cache_stats = cache.stats()
+    st.caption(
+        f"Cache: {cache_stats['hits']} Treffer, {cache_stats['misses']} Fehlzugriffe, "
+        f"{cache_stats['size']}/{cache_stats['maxsize']} Einträge, Datenstand {data_version}"
+    )
+
+    with st.expander("Datenprüfung", expanded=False):
+        issues = cached_validation()
+        if issues.empty:
+            st.caption("Keine Befunde.")
+        else:
+            st.dataframe(datenpruefung.summary(issues), hide_index=True, use_container_width=True)
+            st.dataframe(issues, hide_index=True, use_container_width=True)
+
+    with st.expander("Performance", expanded=False):
+        profiling = st.checkbox("Messung aktiv (für alle Sitzungen)", value=instrumentation.is_enabled(),
+                                key="chk_profile",
+                                help="Schaltet die Messung im ganzen Serverprozess um, nicht nur für diese Sitzung.")
+        if profiling != instrumentation.is_enabled():
+            if profiling:
+                instrumentation.enable()
+            else:
+                instrumentation.disable()
+        if st.button("Zurücksetzen", key="btn_profile_reset"):
+            instrumentation.reset()
+        perf = instrumentation.report()
+        if perf:
+            st.dataframe(pd.DataFrame(perf), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Noch keine Messwerte.")
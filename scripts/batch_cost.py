@@ -0,0 +1,148 @@
+# scripts/batch_cost.py
+"""Kalkuliert alle Aufträge im Stapel und schreibt die Ergebnisse als JSON Lines.
+
+Die Stammdaten werden einmal geladen und an die Worker-Prozesse verteilt,
+jeder Worker rechnet mit einem eigenen CostRollup, sodass gemeinsame Teile
+nur einmal je Prozess kalkuliert werden. Mit --snapshot blenden die Worker
+den Snapshot ein und rechnen direkt auf den Arrays (ArrayRollup).
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .cache import get_data_version
+from .calc import calc_order_cost, get_all_auftrag_ids
+from .cost_model import CostModel
+from .rollup import ArrayRollup, CostRollup
+from .config import settings
+from .cost_history import CostHistory
+from .snapshot import DEFAULT_PATH, load_arrays
+
+_rollup: Optional[CostRollup] = None
+
+
+def _init_worker(model: Optional[CostModel], snapshot_path: Optional[str] = None):
+    global _rollup
+    if model is None:
+        # Jeder Worker blendet denselben Snapshot ein, statt das Modell gepickelt zu bekommen
+        _rollup = ArrayRollup(load_arrays(snapshot_path))
+    else:
+        _rollup = CostRollup(model)
+
+
+def _cost_chunk(auftrag_nrs: List[str]) -> List[Tuple[str, Dict, float]]:
+    results = []
+    for auftrag_nr in auftrag_nrs:
+        start = time.perf_counter()
+        result = calc_order_cost(auftrag_nr, rollup=_rollup)
+        results.append((auftrag_nr, result, time.perf_counter() - start))
+    return results
+
+
+def run_batch(auftrag_nrs: List[str], model: Optional[CostModel], out_path: str, workers: int = 0,
+              chunk_size: int = 16, snapshot_path: Optional[str] = None) -> Dict:
+    """Kalkuliert die Aufträge und schreibt jedes Ergebnis sofort nach Fertigstellung.
+
+    Bei ``workers=0`` wird im aktuellen Prozess gerechnet. Mit ``snapshot_path``
+    rechnen die Worker auf den Arrays des Snapshots, ``model`` darf dann None sein.
+    """
+    chunks = [auftrag_nrs[i:i + chunk_size] for i in range(0, len(auftrag_nrs), chunk_size)]
+    latencies = []
+    start = time.perf_counter()
+
+    with open(out_path, "w", encoding="utf-8") as out:
+        def write(results):
+            for auftrag_nr, result, latency in results:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                latencies.append(latency)
+            out.flush()
+
+        if workers:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(None if snapshot_path else model, snapshot_path)) as pool:
+                futures = [pool.submit(_cost_chunk, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    write(future.result())
+        else:
+            _init_worker(None if snapshot_path else model, snapshot_path)
+            for chunk in chunks:
+                write(_cost_chunk(chunk))
+
+    elapsed = time.perf_counter() - start
+    lat_ms = np.array(latencies) * 1000
+    return {
+        "orders": len(latencies),
+        "seconds": elapsed,
+        "orders_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            f"p{p}": float(np.percentile(lat_ms, p)) if len(lat_ms) else 0.0 for p in (50, 90, 99)
+        } | {"max": float(lat_ms.max()) if len(lat_ms) else 0.0}
+    }
+
+
+def verify(out_path: str, model: CostModel) -> List[str]:
+    """Vergleicht die Datei mit einer seriellen Berechnung, gibt abweichende Aufträge zurück"""
+    abweichend = []
+    with open(out_path, encoding="utf-8") as f:
+        for line in f:
+            result = json.loads(line)
+            expected = json.loads(json.dumps(calc_order_cost(result["auftrag_nr"], model=model), ensure_ascii=False))
+            if result != expected:
+                abweichend.append(result["auftrag_nr"])
+    return abweichend
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--out", default="auftragskosten.jsonl", help="Ausgabedatei (JSON Lines)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Anzahl Worker-Prozesse, 0 = im aktuellen Prozess")
+    parser.add_argument("--chunk", type=int, default=16, help="Aufträge je Arbeitspaket")
+    parser.add_argument("--snapshot", nargs="?", const="", default=None,
+                        help="Stammdaten aus dem Binär-Snapshot laden (optional mit Pfad)")
+    parser.add_argument("--verify", action="store_true", help="Ergebnisse mit serieller Berechnung vergleichen")
+    parser.add_argument("--kostenstand", action="store_true",
+                        help="Ergebnisse zusätzlich als Kostenlauf ablegen (siehe cost_history)")
+    args = parser.parse_args()
+
+    print("📥 Lade Stammdaten...")
+    snapshot_path = None
+    if args.snapshot is not None:
+        # Snapshot einmal auffrischen, die Worker blenden ihn danach nur noch ein
+        snapshot_path = args.snapshot or settings["snapshot"] or DEFAULT_PATH
+        arrays = load_arrays(snapshot_path)
+        model = None
+    else:
+        model = CostModel.load()
+    auftrag_nrs = get_all_auftrag_ids()
+
+    print(f"⚙️ Kalkuliere {len(auftrag_nrs)} Aufträge mit {args.workers} Workern...")
+    stats = run_batch(auftrag_nrs, model, args.out, workers=args.workers, chunk_size=args.chunk,
+                      snapshot_path=snapshot_path)
+    lat = stats["latency_ms"]
+    print(f"✅ {stats['orders']} Aufträge in {stats['seconds']:.2f} s "
+          f"({stats['orders_per_second']:.1f} Aufträge/s) nach '{args.out}' geschrieben.")
+    print(f"⏱️ Latenz je Auftrag: p50 {lat['p50']:.2f} ms, p90 {lat['p90']:.2f} ms, "
+          f"p99 {lat['p99']:.2f} ms, max {lat['max']:.2f} ms")
+
+    if model is None and (args.verify or args.kostenstand):
+        # Prüfung und Kostenlauf arbeiten auf dem Kostenmodell
+        model = CostModel.from_arrays(arrays)
+
+    if args.verify:
+        abweichend = verify(args.out, model)
+        if abweichend:
+            print(f"❌ Abweichungen bei {len(abweichend)} Aufträgen: {', '.join(abweichend[:10])}")
+        else:
+            print("✅ Ergebnisse identisch mit serieller Berechnung.")
+
+    if args.kostenstand:
+        entry = CostHistory().record(model, auftrag_nrs, get_data_version(), bemerkung="batch_cost")
+        print(f"🗂️ Kostenlauf {entry['lauf']} abgelegt ({entry['teile_geschrieben']} von {entry['teile']} Teilen neu).")
+
+
+if __name__ == "__main__":
+    main()
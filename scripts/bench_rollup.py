@@ -0,0 +1,73 @@
+# scripts/bench_rollup.py
+"""Vergleicht die rekursive Kostenberechnung mit CostRollup auf einer
+synthetischen Stückliste, in der jedes Teil alle Teile der nächsten Ebene
+wiederverwendet (Anzahl Pfade = Breite ** Tiefe)."""
+import argparse
+import time
+from .cost_model import CostModel, FGK_SATZ, MGK_SATZ, TeilRow, ArbeitsplanRow, MaschineRow, MaterialRow
+from .rollup import CostRollup
+
+
+def build_lattice(tiefe: int, breite: int) -> CostModel:
+    teile = []
+    arbeitsplaene = []
+    ebenen = []
+    nr = 0
+    for ebene in range(tiefe + 1):
+        ids = []
+        for _ in range(breite if ebene else 1):
+            nr += 1
+            teil_id = str(nr).zfill(7)
+            knoten = ebenen[-1][0] if ebenen else "A00001"
+            teile.append(TeilRow(teil_id, str(nr), knoten, 2, "M001"))
+            arbeitsplaene.append(ArbeitsplanRow(teil_id, "01", "001", 30))
+            ids.append(teil_id)
+        ebenen.append(ids)
+
+    model = CostModel(teile, arbeitsplaene, [MaschineRow("001", "Maschine1", 60)], [MaterialRow("M001", 10)])
+
+    # Das Schema kennt nur einen Knoten je Teil; die Mehrfachverwendung wird
+    # daher direkt im Eltern-Kind-Index nachgebildet.
+    for oben, unten in zip(ebenen, ebenen[1:]):
+        for parent_id in oben:
+            model.by_knoten[parent_id] = [model.teile[t] for t in unten]
+    return model
+
+
+def naive_total(model: CostModel, teil_id: str) -> float:
+    teil = model.teile[teil_id]
+    total = model.material_kost(teil) * (1 + MGK_SATZ) + model.fert_kost(teil_id) * (1 + FGK_SATZ)
+    for child in model.by_knoten.get(teil_id, []):
+        total += (child.anzahl or 1) * naive_total(model, child.teil_id)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--breite", type=int, default=4)
+    parser.add_argument("--tiefe", type=int, default=9)
+    parser.add_argument("--naiv-bis", type=int, default=7, help="größte Tiefe für die rekursive Variante")
+    args = parser.parse_args()
+
+    print(f"{'Tiefe':>5} {'Teile':>7} {'Kanten':>8} {'Rollup (ms)':>12} {'Rekursiv (ms)':>14}")
+    for tiefe in range(1, args.tiefe + 1):
+        model = build_lattice(tiefe, args.breite)
+        kanten = sum(len(c) for c in model.by_knoten.values())
+
+        start = time.perf_counter()
+        rollup = CostRollup(model)
+        total = rollup.unit("0000001")["total"]
+        rollup_ms = (time.perf_counter() - start) * 1000
+
+        naiv = ""
+        if tiefe <= args.naiv_bis:
+            start = time.perf_counter()
+            naiv_total = naive_total(model, "0000001")
+            naiv = f"{(time.perf_counter() - start) * 1000:14.2f}"
+            assert abs(naiv_total - total) <= 1e-6 * abs(total)
+
+        print(f"{tiefe:>5} {len(model.teile):>7} {kanten:>8} {rollup_ms:12.2f} {naiv:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# scripts/benchmark.py
+"""Benchmark-Suite für scripts/calc.py auf synthetischen Daten.
+
+Je Szenario werden die Daten erzeugt und in eine lokale SQLite-Datenbank
+geladen, dann wird jede Kalkulationsfunktion gemessen: Laufzeit, Spitzen-
+speicher (tracemalloc) und Anzahl SQL-Anweisungen. Ergebnisse lassen sich
+als JSON-Baseline speichern und mit einer früheren Baseline vergleichen.
+
+    python -m scripts.benchmark --save bench_baseline.json
+    python -m scripts.benchmark --compare bench_baseline.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+from sqlalchemy import create_engine, event
+from . import calc
+from .database import Session
+from .synthetic import generate, load_into
+
+SCENARIOS = {
+    "klein": dict(orders=20, depth=3, fanout=3, reuse=0.0),
+    "tief": dict(orders=10, depth=8, fanout=2, reuse=0.2),
+    "breit": dict(orders=50, depth=3, fanout=8, reuse=0.2),
+    "wiederverwendung": dict(orders=100, depth=4, fanout=4, reuse=0.8),
+}
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def _benchmarks(orders: List[str]) -> Dict[str, Callable[[], None]]:
+    def per_order(fn):
+        return lambda: [fn(a) for a in orders]
+
+    return {
+        "calc_full_cost_structure": per_order(calc.calc_full_cost_structure),
+        "calc_full_cost_structure[sql]": per_order(lambda a: calc.calc_full_cost_structure(a, mode="sql")),
+        "calc_order_cost": per_order(calc.calc_order_cost),
+        "calc_machine_costs": lambda: calc.calc_machine_costs(),
+        "calc_machine_utilization": lambda: calc.calc_machine_utilization(),
+        "get_material_costs": lambda: calc.get_material_costs(),
+    }
+
+
+def measure(fn: Callable[[], None], counter: StatementCounter, repeat: int = 3) -> Dict:
+    # Bester von mehreren Läufen, Anweisungen aus dem ersten Lauf
+    seconds = float("inf")
+    statements = None
+    for _ in range(repeat):
+        counter.count = 0
+        start = time.perf_counter()
+        fn()
+        seconds = min(seconds, time.perf_counter() - start)
+        if statements is None:
+            statements = counter.count
+
+    # Speicher in einem zweiten Lauf messen, damit tracemalloc die Zeit nicht verfälscht
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"seconds": seconds, "peak_kb": peak / 1024, "statements": statements}
+
+
+def run(scenarios: Dict[str, dict], seed: int, sample: int, repeat: int = 3) -> Dict[str, Dict]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, params in scenarios.items():
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, name + '.db')}")
+            data = generate(seed=seed, **params)
+            load_into(engine, data)
+
+            # Die Kalkulation nutzt die globale Session, daher auf die Benchmark-Datenbank umbinden
+            Session.remove()
+            Session.configure(bind=engine)
+            counter = StatementCounter(engine)
+            orders = calc.get_all_auftrag_ids()[:sample]
+
+            results[name] = {
+                "teile": len(data["teil"]),
+                "auftraege": len(data["auftrag"]),
+                "functions": {fname: measure(fn, counter, repeat) for fname, fn in _benchmarks(orders).items()},
+            }
+            Session.remove()
+            engine.dispose()
+    return results
+
+
+def compare(results: Dict, baseline: Dict, threshold: float, min_seconds: float = 0.005) -> List[str]:
+    """Liefert eine Meldung je Funktion, die langsamer oder gesprächiger als die Baseline ist"""
+    regressions = []
+    for scenario, res in results.items():
+        base = baseline.get(scenario, {}).get("functions", {})
+        for fname, m in res["functions"].items():
+            b = base.get(fname)
+            if not b:
+                continue
+            if m["seconds"] > b["seconds"] * (1 + threshold) and m["seconds"] - b["seconds"] > min_seconds:
+                regressions.append(f"{scenario}/{fname}: {m['seconds']:.3f} s statt {b['seconds']:.3f} s")
+            if m["statements"] > b["statements"]:
+                regressions.append(f"{scenario}/{fname}: {m['statements']} statt {b['statements']} SQL-Anweisungen")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="nur diese Szenarien")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sample", type=int, default=20, help="Aufträge je Szenario für Auftragsfunktionen")
+    parser.add_argument("--repeat", type=int, default=3, help="Läufe je Messung (Minimum zählt)")
+    parser.add_argument("--save", help="Ergebnisse als JSON-Baseline speichern")
+    parser.add_argument("--compare", help="mit JSON-Baseline vergleichen")
+    parser.add_argument("--threshold", type=float, default=0.25, help="erlaubte Verlangsamung (Anteil)")
+    args = parser.parse_args()
+
+    scenarios = {k: SCENARIOS[k] for k in (args.scenario or SCENARIOS)}
+    results = run(scenarios, args.seed, args.sample, args.repeat)
+
+    for scenario, res in results.items():
+        print(f"\n📊 {scenario} ({res['auftraege']} Aufträge, {res['teile']} Teile)")
+        print(f"   {'Funktion':<32} {'Zeit (ms)':>10} {'Peak (KB)':>10} {'SQL':>6}")
+        for fname, m in res["functions"].items():
+            print(f"   {fname:<32} {m['seconds'] * 1000:>10.1f} {m['peak_kb']:>10.0f} {m['statements']:>6}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"seed": args.seed, "sample": args.sample, "results": results}, f, indent=2)
+        print(f"\n💾 Baseline nach '{args.save}' geschrieben.")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\n❌ Regressionen:")
+            for r in regressions:
+                print(f"   {r}")
+            raise SystemExit(1)
+        print("\n✅ Keine Regressionen gegenüber der Baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# scripts/bulk.py
+"""Massenimport von Stammdaten aus CSV/XLSX oder eingefügten Tabellen.
+
+Alle Prüfungen (Pflichtfelder, Zahlen, Duplikate in der Datei, vorhandene
+Schlüssel, Fremdschlüssel) laufen mengenbasiert über den ganzen Upload:
+pro Prüfung höchstens eine Abfrage je ``IN_CHUNK`` Schlüssel statt einer
+Abfrage pro Zeile. Gültige Zeilen werden zusammen mit der Neuberechnung
+der Kosten in einer Transaktion gespeichert.
+"""
+import io
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+import pandas as pd
+from sqlalchemy import insert, select, tuple_
+from .cache import bump_data_version
+from .models import Arbeitsplan, Auftrag, Maschine, Material, Teil
+from .recalc import recalc
+from .utils import normalize_id, normalize_knoten
+
+IN_CHUNK = 500
+
+
+def _upper(value: str) -> str:
+    return value.upper()
+
+
+class Field(NamedTuple):
+    name: str
+    number: bool = False
+    required: bool = True
+    minimum: Optional[float] = None
+    normalize: Optional[Callable[[str], str]] = None
+    aliases: Tuple[str, ...] = ()
+
+
+class Reference(NamedTuple):
+    """Fremdschlüssel: ``field`` muss in einer der Zielspalten vorkommen"""
+    field: str
+    targets: Tuple
+    # Darf auch auf einen Schlüssel derselben Datei verweisen (neue Stücklisten)
+    self_key: Optional[str] = None
+
+
+class Entity(NamedTuple):
+    model: type
+    fields: Tuple[Field, ...]
+    key: Tuple[str, ...]
+    references: Tuple[Reference, ...] = ()
+
+
+ENTITIES: Dict[str, Entity] = {
+    "Auftrag": Entity(
+        Auftrag,
+        (Field("auftrag_nr", normalize=_upper, aliases=("Auftrag-Nr",)),),
+        key=("auftrag_nr",),
+    ),
+    "Material": Entity(
+        Material,
+        (Field("nr", normalize=_upper, aliases=("Material-Nr",)),
+         Field("kost", number=True, minimum=0, aliases=("Kosten",))),
+        key=("nr",),
+    ),
+    "Maschine": Entity(
+        Maschine,
+        (Field("nr", normalize=_upper, aliases=("Maschine-Nr",)),
+         Field("bezeichnung", required=False),
+         Field("ks", number=True, minimum=0, aliases=("Kosten €/h",))),
+        key=("nr",),
+    ),
+    "Teil": Entity(
+        Teil,
+        (Field("teil_id", normalize=normalize_id, aliases=("Teil-ID",)),
+         Field("teil_nr", required=False, aliases=("Teil-Nr",)),
+         Field("knoten", normalize=normalize_knoten),
+         Field("mat", normalize=_upper, aliases=("Material-Nr",)),
+         Field("anzahl", number=True, minimum=1)),
+        key=("teil_id",),
+        references=(
+            Reference("mat", (Material.nr,)),
+            Reference("knoten", (Auftrag.auftrag_nr, Teil.teil_id), self_key="teil_id"),
+        ),
+    ),
+    "Arbeitsplan": Entity(
+        Arbeitsplan,
+        (Field("teil_id", normalize=normalize_id, aliases=("Teil-ID",)),
+         Field("ag_nr", aliases=("AG-Nr",)),
+         Field("maschine", normalize=_upper, aliases=("Maschine-Nr",)),
+         Field("dauer", number=True, minimum=1, aliases=("Dauer",))),
+        key=("teil_id", "ag_nr"),
+        references=(
+            Reference("teil_id", (Teil.teil_id,)),
+            Reference("maschine", (Maschine.nr,)),
+        ),
+    ),
+}
+
+
+class BulkResult(NamedTuple):
+    entity: str
+    rows: pd.DataFrame      # gültige, normalisierte Zeilen (Spalten = Modellattribute)
+    errors: pd.DataFrame    # Zeile (wie in der Datei) und Fehlermeldungen
+
+
+def read_table(data: Union[bytes, str], filename: str = "") -> pd.DataFrame:
+    """Liest CSV (Trennzeichen ; , oder Tab), XLSX oder aus Excel eingefügten Text"""
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        return pd.read_excel(io.BytesIO(data), dtype=str)
+
+    text = data.decode("utf-8-sig") if isinstance(data, bytes) else data
+    first_line = text.lstrip().split("\n", 1)[0]
+    sep = max(("\t", ";", ","), key=first_line.count)
+    if not first_line.count(sep):
+        sep = ","
+    return pd.read_csv(io.StringIO(text.strip()), sep=sep, dtype=str, skipinitialspace=True)
+
+
+def _column_map(entity: Entity, columns: Sequence[str]) -> Dict[str, str]:
+    """Ordnet Spaltenköpfe (Attribut, DB-Spalte oder Beschriftung) den Feldern zu"""
+    lookup = {}
+    for field in entity.fields:
+        db_name = getattr(entity.model, field.name).property.columns[0].name
+        for name in (field.name, db_name, *field.aliases):
+            lookup[name.strip().lower()] = field.name
+    return {c: lookup[str(c).strip().lower()] for c in columns if str(c).strip().lower() in lookup}
+
+
+def _existing(session, columns: Sequence, values: List) -> Set:
+    """Vorhandene Werte (bzw. Wertetupel) der Spalten, abgefragt in Blöcken"""
+    found = set()
+    target = columns[0] if len(columns) == 1 else tuple_(*columns)
+    for start in range(0, len(values), IN_CHUNK):
+        chunk = values[start:start + IN_CHUNK]
+        rows = session.execute(select(*columns).where(target.in_(chunk))).all()
+        found.update(r[0] if len(columns) == 1 else tuple(r) for r in rows)
+    return found
+
+
+def validate(session, entity_name: str, df: pd.DataFrame) -> BulkResult:
+    entity = ENTITIES[entity_name]
+    df = df.rename(columns=_column_map(entity, df.columns))
+    missing = [f.name for f in entity.fields if f.required and f.name not in df.columns]
+    if missing:
+        raise ValueError(f"Fehlende Spalten für {entity_name}: {', '.join(missing)}")
+
+    df = df.reset_index(drop=True)
+    data = pd.DataFrame(index=df.index)
+    problems: List[Tuple[pd.Series, str]] = []
+
+    for field in entity.fields:
+        raw = df[field.name] if field.name in df.columns else pd.Series(None, index=df.index, dtype=object)
+        text = raw.fillna("").astype(str).str.strip()
+        empty = text == ""
+        if field.required:
+            problems.append((empty, f"{field.name} fehlt"))
+
+        if field.number:
+            values = pd.to_numeric(text.str.replace(",", ".", regex=False), errors="coerce")
+            problems.append((~empty & values.isna(), f"{field.name} ist keine Zahl"))
+            if field.minimum is not None:
+                problems.append((values < field.minimum, f"{field.name} kleiner als {field.minimum:g}"))
+            data[field.name] = values
+        else:
+            if field.normalize:
+                text = text.where(empty, text.map(field.normalize))
+            data[field.name] = text.where(~empty, None)
+
+    # Schlüssel: doppelt in der Datei oder bereits vorhanden
+    key = list(entity.key)
+    complete = data[key].notna().all(axis=1)
+    problems.append((complete & data.duplicated(key, keep=False), "Schlüssel mehrfach in der Datei"))
+
+    key_columns = [getattr(entity.model, k) for k in key]
+    key_values = list(data.loc[complete, key].itertuples(index=False, name=None))
+    if len(key) == 1:
+        key_values = [v[0] for v in key_values]
+    existing = _existing(session, key_columns, sorted(set(key_values)))
+    in_db = pd.Series([v in existing for v in key_values], index=data.index[complete], dtype=bool)
+    problems.append((in_db.reindex(data.index, fill_value=False), "existiert bereits"))
+
+    self_refs = []
+    for ref in entity.references:
+        values = data[ref.field]
+        wanted = sorted(set(values.dropna()))
+        known = set()
+        for target in ref.targets:
+            known |= _existing(session, [target], wanted)
+        if ref.self_key:
+            self_refs.append((ref, known))
+        else:
+            problems.append((values.notna() & ~values.isin(known), f"{ref.field} verweist auf unbekannten Eintrag"))
+
+    # Verweise innerhalb der Datei zählen nur, wenn die Zielzeile selbst gültig
+    # ist; wiederholen, bis keine weitere Zeile mehr wegfällt (Ketten)
+    invalid = pd.Series(False, index=data.index)
+    for mask, _ in problems:
+        invalid |= mask.fillna(False).astype(bool)
+    unknown = {ref: pd.Series(False, index=data.index) for ref, _ in self_refs}
+    while self_refs:
+        rejected = invalid.copy()
+        for ref, known in self_refs:
+            accepted = known | set(data.loc[~rejected, ref.self_key].dropna())
+            values = data[ref.field]
+            unknown[ref] = values.notna() & ~values.isin(accepted)
+            invalid |= unknown[ref]
+        if invalid.equals(rejected):
+            break
+    for ref, _ in self_refs:
+        problems.append((unknown[ref], f"{ref.field} verweist auf unbekannten Eintrag"))
+
+    messages = pd.Series("", index=data.index)
+    for mask, message in problems:
+        mask = mask.fillna(False).astype(bool)
+        messages[mask] = messages[mask] + message + "; "
+    invalid = messages != ""
+
+    errors = pd.DataFrame({
+        # Zeilennummer in der Datei (Kopfzeile = 1)
+        "Zeile": data.index[invalid] + 2,
+        "Fehler": messages[invalid].str.rstrip("; ").values,
+    })
+    return BulkResult(entity_name, data[~invalid].reset_index(drop=True), errors)
+
+
+def insert_rows(session, result: BulkResult, bump: bool = True) -> int:
+    """Speichert die gültigen Zeilen und berechnet die Kosten neu; committen muss der Aufrufer.
+
+    Mit ``bump=False`` erhöht der Aufrufer den Datenstand selbst (z. B. die App,
+    die damit den Verwendungsnachweis fortschreibt).
+    """
+    rows = result.rows
+    if rows.empty:
+        return 0
+
+    records = [
+        {k: (None if pd.isna(v) else v) for k, v in record.items()}
+        for record in rows.to_dict("records")
+    ]
+    session.execute(insert(ENTITIES[result.entity].model), records)
+
+    if result.entity == "Auftrag":
+        recalc(session, auftraege=rows["auftrag_nr"].tolist())
+    elif result.entity == "Material":
+        recalc(session, materialien=rows["nr"].tolist())
+    elif result.entity == "Maschine":
+        recalc(session, maschinen=rows["nr"].tolist())
+    else:
+        recalc(session, teil_ids=rows["teil_id"].unique().tolist())
+    if bump:
+        bump_data_version(session)
+    return len(records)
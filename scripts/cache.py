@@ -0,0 +1,102 @@
+# scripts/cache.py
+"""Versionierter Ergebnis-Cache mit LRU-Verdrängung.
+
+Jeder Eintrag ist an den Datenstand (Tabelle ``datenstand``) gebunden, den
+alle Speicherpfade über bump_data_version erhöhen. Ändert sich der
+Datenstand, werden ältere Einträge verworfen.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+from sqlalchemy import select
+from .database import Session
+from .models import Datenstand
+
+
+def get_data_version(session: Optional[Session] = None) -> int:
+    own_session = session is None
+    if own_session:
+        session = Session()
+    try:
+        version = session.execute(select(Datenstand.version).where(Datenstand.id == 1)).scalar()
+        return version or 0
+    finally:
+        if own_session:
+            session.close()
+
+
+def bump_data_version(session: Session) -> int:
+    """Erhöht den Datenstand in der Transaktion des Aufrufers und liefert den neuen Stand.
+
+    Ein einziges INSERT ... ON CONFLICT, damit zwei gleichzeitige erste
+    Erhöhungen nicht beide die Zeile id=1 anlegen.
+    """
+    if session.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+
+    table = Datenstand.__table__
+    stmt = insert(table).values(id=1, version=1)
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.id], set_={"version": table.c.version + 1})
+    return session.execute(stmt.returning(table.c.version)).scalar_one()
+
+
+class ResultCache:
+    """Thread-sicherer LRU-Cache für Auftragslisten, Kostenmodelle und Kostenstrukturen"""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.version: Optional[int] = None
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, version: int, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if self.version is not None and version < self.version:
+                # Veralteter Aufrufer: rechnen, aber nichts speichern
+                self.misses += 1
+                stale = True
+            else:
+                stale = False
+                if self.version != version:
+                    # Neuer Datenstand: alles Zwischengespeicherte ist veraltet
+                    self._entries.clear()
+                    self.version = version
+        if stale:
+            return compute()
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            if self.version == version:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "version": self.version,
+            }
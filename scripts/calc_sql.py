@@ -0,0 +1,240 @@
+# scripts/calc_sql.py
+"""SQL-Ausführungsmodus: Stücklistenauflösung per WITH RECURSIVE in der Datenbank.
+
+Liefert dieselben Ergebnisse wie calc_full_cost_structure bzw. calc_order_cost,
+lädt aber nur die Teile des angefragten Auftrags. Kinder werden über die
+berechnete Spalte knoten_norm gefunden, die den knoten-Wert wie
+normalize_knoten normalisiert; auch nicht normalisiert gespeicherte Verweise
+werden also gefunden (bestehende Datenbanken: python -m scripts.migrate).
+"""
+import argparse
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from .cost_model import FGK_SATZ, MGK_SATZ
+from .database import Session
+from .explosion import COLUMNS, with_summary_rows
+from .instrumentation import note
+from .rollup import CycleError
+from .utils import normalize_knoten
+
+EXPLODE_SQL = """
+WITH RECURSIVE bom AS (
+    SELECT t.teil_id, t.teil_nr, t."Mat" AS mat, COALESCE(t."Anzahl", 1) AS anzahl, 1 AS ebene,
+           COALESCE(t."Anzahl", 1) AS gesamt_anzahl, {root_path} AS pfad, 0 AS zyklus
+    FROM teil t
+    WHERE t.knoten_norm = :auftrag_nr
+    UNION ALL
+    SELECT c.teil_id, c.teil_nr, c."Mat", COALESCE(c."Anzahl", 1), b.ebene + 1,
+           b.gesamt_anzahl * COALESCE(c."Anzahl", 1), {child_path},
+           CASE WHEN {in_path} THEN 1 ELSE 0 END
+    FROM teil c
+    JOIN bom b ON c.knoten_norm = b.teil_id
+    -- Steht das Teil schon im Pfad, liegt ein Zyklus vor: die Zeile wird markiert und nicht weiter aufgelöst
+    WHERE b.zyklus = 0
+),
+fert AS (
+    -- Nur die Arbeitspläne der Teile des Auftrags (Primärschlüssel beginnt mit teil_id)
+    SELECT a.teil_id, SUM(a."dauer (min)" / 60.0 * m."KS (€/h)") AS fert_einzel
+    FROM arbeitsplan a
+    JOIN maschine m ON m."Nr" = a.maschine
+    WHERE a.teil_id IN (SELECT teil_id FROM bom)
+    GROUP BY a.teil_id
+)
+SELECT b.teil_id, b.teil_nr, b.ebene, b.anzahl, b.gesamt_anzahl, b.pfad, b.zyklus,
+       COALESCE(mat.kost, 0) AS mat_einzel,
+       COALESCE(mat.kost, 0) * b.gesamt_anzahl AS mat_pos,
+       COALESCE(f.fert_einzel, 0) AS fert_einzel,
+       COALESCE(f.fert_einzel, 0) * b.gesamt_anzahl AS fert_pos
+FROM bom b
+LEFT JOIN material mat ON mat."Nr" = b.mat
+LEFT JOIN fert f ON f.teil_id = b.teil_id
+ORDER BY {order_path}
+"""
+
+# Pfad als Array (Postgres, DuckDB): Vorordnung über den elementweisen Vergleich, Zyklen per = ANY.
+# Die Reihenfolge muss bytewise sein wie in der Python-Auflösung, nicht nach der Sortierfolge der Datenbank.
+ARRAY_PATH = {
+    "root_path": "ARRAY[CAST(t.teil_id AS TEXT)]",
+    "child_path": "array_append(b.pfad, CAST(c.teil_id AS TEXT))",
+    "in_path": "CAST(c.teil_id AS TEXT) = ANY(b.pfad)",
+    "order_path": 'b.pfad COLLATE "C"',
+}
+PATH_PARTS = {
+    "postgresql": ARRAY_PATH,
+    "duckdb": {**ARRAY_PATH, "order_path": "b.pfad"},
+    # SQLite kennt keine Arrays: Pfad als Text mit "/", verglichen wird ohnehin bytewise (BINARY)
+    "sqlite": {
+        "root_path": "CAST(t.teil_id AS TEXT)",
+        "child_path": "b.pfad || '/' || c.teil_id",
+        "in_path": "instr('/' || b.pfad || '/', '/' || c.teil_id || '/') > 0",
+        "order_path": "b.pfad COLLATE BINARY",
+    },
+}
+_statements = {}
+
+
+def explode_sql(dialect: str):
+    if dialect not in _statements:
+        _statements[dialect] = text(EXPLODE_SQL.format(**PATH_PARTS.get(dialect, ARRAY_PATH)))
+    return _statements[dialect]
+
+
+def explode_order(auftrag_nr: str, session=None) -> List:
+    own_session = session is None
+    if own_session:
+        session = Session()
+    try:
+        statement = explode_sql(session.get_bind().dialect.name)
+        rows = session.execute(statement, {"auftrag_nr": normalize_knoten(auftrag_nr)}).all()
+        note(rows=len(rows), depth=max((r.ebene for r in rows), default=0), nodes=len(rows))
+    finally:
+        if own_session:
+            session.close()
+
+    for r in rows:
+        if r.zyklus:
+            # Wie CostRollup: vom ersten Auftreten des Teils bis zur Wiederholung
+            path = list(r.pfad) if not isinstance(r.pfad, str) else r.pfad.split("/")
+            raise CycleError(path[path.index(r.teil_id):])
+    return rows
+
+
+def calc_full_cost_structure(auftrag_nr: str, session=None) -> pd.DataFrame:
+    rows = explode_order(auftrag_nr, session)
+    mat_pos = np.array([r.mat_pos for r in rows], dtype=np.float64)
+    fert_pos = np.array([r.fert_pos for r in rows], dtype=np.float64)
+    mgk = mat_pos * MGK_SATZ
+    fgk = fert_pos * FGK_SATZ
+
+    positions = pd.DataFrame({
+        "Position": [f"Teil {r.teil_id}" for r in rows],
+        "Ebene": np.array([r.ebene for r in rows], dtype=np.int64),
+        "Anzahl": np.array([r.anzahl for r in rows], dtype=np.float64),
+        "Gesamt Anzahl": np.array([r.gesamt_anzahl for r in rows], dtype=np.float64),
+        "Mat. Einzel": np.array([r.mat_einzel for r in rows], dtype=np.float64),
+        "Mat. Pos.": mat_pos,
+        "MGK": mgk,
+        "Fert. Pos.": fert_pos,
+        "FGK": fgk,
+        "Gesamtkosten": mat_pos + mgk + fert_pos + fgk,
+    }, columns=COLUMNS)
+    return with_summary_rows(positions, auftrag_nr)
+
+
+def calc_order_cost(auftrag_nr: str, session=None) -> Dict:
+    rows = explode_order(auftrag_nr, session)
+
+    # Eltern über einen Stapel je Ebene bestimmen (Zeilen sind in Vorordnung)
+    parent = [-1] * len(rows)
+    stack = []
+    for i, r in enumerate(rows):
+        del stack[r.ebene - 1:]
+        parent[i] = stack[-1] if stack else -1
+        stack.append(i)
+
+    children = [[] for _ in rows]
+    for i in range(len(rows)):
+        if parent[i] >= 0:
+            children[parent[i]].append(i)
+
+    # Stückkosten von unten nach oben
+    units = [None] * len(rows)
+    for i in range(len(rows) - 1, -1, -1):
+        r = rows[i]
+        k_mat = r.mat_einzel
+        k_fert = r.fert_einzel
+        children_cost = 0.0
+        for c in children[i]:
+            children_cost += rows[c].anzahl * units[c]["total"]
+        units[i] = {
+            "k_mat": k_mat,
+            "mgk": k_mat * MGK_SATZ,
+            "k_fert": k_fert,
+            "fgk": k_fert * FGK_SATZ,
+            "children_cost": children_cost,
+            "total": k_mat + k_mat * MGK_SATZ + k_fert + k_fert * FGK_SATZ + children_cost,
+        }
+
+    # Strukturbäume von unten nach oben (in Vorordnung stehen Kinder hinter den Eltern)
+    structures = [None] * len(rows)
+    for i in range(len(rows) - 1, -1, -1):
+        structures[i] = [{
+            "teil_id": rows[c].teil_id,
+            "teil_nr": rows[c].teil_nr,
+            "anzahl": rows[c].anzahl,
+            "kosten_pro_stk": units[c]["total"],
+            "kosten_gesamt": rows[c].anzahl * units[c]["total"],
+            "level": rows[c].ebene - 1,
+            "struktur": structures[c]
+        } for c in children[i]]
+
+    positions = []
+    order_total = 0.0
+    for i, r in enumerate(rows):
+        if parent[i] >= 0:
+            continue
+        unit = units[i]
+        total_component = unit["total"] * r.anzahl
+        positions.append({
+            "teil_id": r.teil_id,
+            "teil_nr": r.teil_nr,
+            "amount": r.anzahl,
+            "cost_per_unit": unit["total"],
+            "total_cost": total_component,
+            "structure": structures[i],
+            "details": {
+                "direct_material": unit["k_mat"],
+                "material_overhead": unit["mgk"],
+                "direct_production": unit["k_fert"],
+                "production_overhead": unit["fgk"],
+                "subcomponents_cost": unit["children_cost"]
+            }
+        })
+        order_total += total_component
+
+    return {
+        "auftrag_nr": auftrag_nr,
+        "positions": positions,
+        "order_total": order_total
+    }
+
+
+def compare(auftrag_nr: str, model) -> float:
+    """Größte absolute Abweichung der Gesamtkosten je Position zwischen SQL- und Python-Pfad"""
+    from .calc import calc_full_cost_structure as calc_python, calc_order_cost as order_python
+
+    sql_df = calc_full_cost_structure(auftrag_nr)
+    py_df = calc_python(auftrag_nr, model=model)
+    if list(sql_df["Position"]) != list(py_df["Position"]):
+        return float("inf")
+
+    numeric = COLUMNS[2:]
+    diff = np.nanmax(np.abs(sql_df[numeric].to_numpy() - py_df[numeric].to_numpy()), initial=0.0)
+    diff_order = abs(calc_order_cost(auftrag_nr)["order_total"] - order_python(auftrag_nr, model=model)["order_total"])
+    return float(max(diff, diff_order))
+
+
+def main():
+    from .calc import get_all_auftrag_ids
+    from .cost_model import CostModel
+
+    parser = argparse.ArgumentParser(description="Vergleicht den SQL-Modus mit der Python-Berechnung")
+    parser.add_argument("auftraege", nargs="*", help="Auftragsnummern (Standard: alle)")
+    parser.add_argument("--toleranz", type=float, default=1e-6)
+    args = parser.parse_args()
+
+    model = CostModel.load()
+    auftraege = args.auftraege or get_all_auftrag_ids()
+    fehler = 0
+    for auftrag_nr in auftraege:
+        diff = compare(auftrag_nr, model)
+        ok = diff <= args.toleranz
+        fehler += not ok
+        print(f"{'✅' if ok else '❌'} {auftrag_nr}: max. Abweichung {diff:.3g}")
+    print(f"{len(auftraege) - fehler}/{len(auftraege)} Aufträge übereinstimmend.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# scripts/capacity.py
+"""Kapazitätsrechnung über alle Aufträge in einem Durchlauf.
+
+Für jedes Teil wird die kumulierte Menge (Produkt der Anzahlen bis zum
+Auftrag) und der zugehörige Auftrag per Pointer-Jumping bestimmt. Daraus
+entstehen dünnbesetzte Matrizen Aufträge × Maschinen mit Stunden und Euro,
+die gegen die Wochenkapazität der Maschinen gestellt werden.
+"""
+import argparse
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from .config import settings
+from .cost_model import BomArrays, CostModel
+from .gozinto import find_cycles
+from .rollup import CycleError
+from .utils import normalize_knoten
+
+
+def order_quantities(arrays: BomArrays) -> Tuple[np.ndarray, np.ndarray]:
+    """Oberstes Teil und kumulierte Menge (inkl. eigener Anzahl) je Teil"""
+    n = len(arrays.teil_ids)
+    up = arrays.parent.copy()
+    qty = arrays.anzahl.copy()
+    top = np.where(up < 0, np.arange(n), up)
+
+    # Jede Runde verdoppelt die übersprungene Pfadlänge
+    for _ in range(max(1, int(np.ceil(np.log2(n + 1)))) + 1):
+        active = np.flatnonzero(up >= 0)
+        if not len(active):
+            break
+        anc = up[active]
+        qty[active] = qty[active] * qty[anc]
+        top[active] = top[anc]
+        up[active] = up[anc]
+    else:
+        active = np.flatnonzero(up >= 0)
+    if len(active):
+        # active enthält auch Teile unterhalb eines Zyklus, genannt wird der Zyklus selbst
+        raise CycleError(find_cycles(arrays)[0])
+    return top, qty
+
+
+class CapacityResult:
+    """Stunden und Kosten je Auftrag und Maschine als CSR-Matrizen"""
+
+    def __init__(self, order_ids: np.ndarray, arrays: BomArrays, hours: sparse.csr_matrix):
+        self.order_ids = order_ids
+        self.maschine_ids = arrays.maschine_ids
+        self.maschine_bez = arrays.maschine_bez
+        self.hours = hours
+        self.cost = sparse.csr_matrix(hours.multiply(arrays.maschine_ks[np.newaxis, :]))
+        self._order_index = {a: i for i, a in enumerate(order_ids.tolist())}
+
+    def machine_hours(self) -> np.ndarray:
+        return np.asarray(self.hours.sum(axis=0)).ravel()
+
+    def order_frame(self, auftrag_nr: str) -> pd.DataFrame:
+        """Maschinenstunden und -kosten eines Auftrags"""
+        i = self._order_index.get(normalize_knoten(auftrag_nr))
+        if i is None:
+            return pd.DataFrame(columns=["Maschine", "Bezeichnung", "Stunden", "Kosten"])
+        row_hours = self.hours.getrow(i)
+        row_cost = self.cost.getrow(i)
+        cols = row_hours.indices
+        return pd.DataFrame({
+            "Maschine": self.maschine_ids[cols],
+            "Bezeichnung": self.maschine_bez[cols],
+            "Stunden": row_hours.data,
+            "Kosten": np.asarray(row_cost[:, cols].todense()).ravel(),
+        })
+
+    def utilization(self, weeks: float = 1, hours_per_week: Optional[float] = None,
+                    capacity: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+        """Auslastung je Maschine; ``capacity`` überschreibt die Wochenstunden einzelner Maschinen"""
+        if hours_per_week is None:
+            hours_per_week = settings["hours_per_week"]
+        per_week = np.full(len(self.maschine_ids), hours_per_week)
+        for nr, value in (capacity or {}).items():
+            per_week[self.maschine_ids == nr] = value
+        max_hours = per_week * weeks
+        total = self.machine_hours()
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent = np.where(max_hours > 0, total / max_hours * 100, np.where(total > 0, np.inf, 0.0))
+        return pd.DataFrame({
+            "Maschine": self.maschine_ids,
+            "Bezeichnung": self.maschine_bez,
+            "Stunden": total,
+            "Kapazität": max_hours,
+            "Auslastung %": percent,
+            "Überlastet": total > max_hours,
+            "Kosten": np.asarray(self.cost.sum(axis=0)).ravel(),
+        }).sort_values("Auslastung %", ascending=False, ignore_index=True)
+
+
+def machine_load(arrays: BomArrays, order_ids: Optional[List[str]] = None) -> CapacityResult:
+    """Löst alle Aufträge mit kumulierten Mengen auf und summiert die Maschinenstunden"""
+    top, qty = order_quantities(arrays)
+
+    # Auftrag je Teil über den Knoten des obersten Teils
+    order_ids, root_parts, root_orders = arrays.order_roots(order_ids)
+    root_order = np.full(len(top), -1, dtype=np.int64)
+    root_order[root_parts] = root_orders
+    part_order = root_order[top]
+
+    op_valid = (arrays.op_teil >= 0) & (arrays.op_maschine >= 0)
+    op_teil = arrays.op_teil[op_valid]
+    op_order = part_order[op_teil]
+    keep = op_order >= 0
+    hours = arrays.op_dauer[op_valid][keep] / 60 * qty[op_teil[keep]]
+
+    matrix = sparse.coo_matrix(
+        (hours, (op_order[keep], arrays.op_maschine[op_valid][keep])),
+        shape=(len(order_ids), len(arrays.maschine_ids))
+    ).tocsr()
+    matrix.sum_duplicates()
+    return CapacityResult(order_ids, arrays, matrix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--weeks", type=float, default=1)
+    parser.add_argument("--hours-per-week", type=float, default=None)
+    parser.add_argument("--kapazitaet", action="append", default=[], metavar="NR=STUNDEN",
+                        help="Wochenstunden einer Maschine, mehrfach möglich")
+    parser.add_argument("--auftrag", help="Maschinenbelastung eines Auftrags anzeigen")
+    args = parser.parse_args()
+
+    capacity = {}
+    for item in args.kapazitaet:
+        nr, value = item.split("=", 1)
+        capacity[nr.strip()] = float(value)
+
+    result = machine_load(CostModel.load().arrays())
+    if args.auftrag:
+        print(result.order_frame(args.auftrag).to_string(index=False))
+        return
+
+    util = result.utilization(args.weeks, args.hours_per_week, capacity)
+    print(util.to_string(index=False))
+    overloaded = util[util["Überlastet"]]
+    print(f"\n{'⚠️' if len(overloaded) else '✅'} {len(overloaded)} von {len(util)} Maschinen überlastet "
+          f"({len(result.order_ids)} Aufträge).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+# scripts/cost_drivers.py
+"""Kostentreiber über den ganzen Auftragsbestand (Pareto-Analyse).
+
+Die Aufträge werden blockweise aufgelöst (explode), je Block werden die
+Beiträge der Positionen zu den Dimensionen
+
+    teil       Teil-ID (Einzelkosten inkl. Gemeinkosten mal Gesamtmenge)
+    teil_nr    Teil-Nr., d. h. alle Kopien einer Baugruppe zusammen
+    material   Materialkosten inkl. MGK
+    maschine   Fertigungskosten inkl. FGK je Maschine
+
+berechnet und an Aggregatoren mit fester Speichergröße übergeben. Der
+Speicherbedarf hängt nur von der Blockgröße und der Anzahl der Schlüssel
+ab, nicht von der Größe des Auftragsbestands.
+
+Für sehr viele Schlüssel (Teil-IDs, Teil-Nummern) kann statt der exakten
+Summen ein Count-Min-Sketch mit Heap der k größten Kandidaten verwendet
+werden; die Beträge sind dann obere Schätzungen.
+
+Aufruf: python -m scripts.cost_drivers [--dimension teil_nr,material] [--anteil 0.8] [--sketch]
+"""
+import argparse
+import heapq
+import time
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+import numpy as np
+import pandas as pd
+from .capacity import order_quantities
+from .cost_model import BomArrays, CostModel, FGK_SATZ, MGK_SATZ
+from .explosion import explode
+from .snapshot import load_arrays
+from .tree import top_k
+from .utils import format_de
+
+DIMENSIONS = ("teil", "teil_nr", "material", "maschine")
+LABELS = {"teil": "Teil-ID", "teil_nr": "Teil-Nr", "material": "Material", "maschine": "Maschine"}
+BATCH_ROWS = 200000
+SKETCH_WIDTH = 1 << 16
+SKETCH_DEPTH = 4
+# Mersenne-Primzahl für die Hashfunktionen des Sketches
+_PRIME = (1 << 31) - 1
+
+
+class ExactSums:
+    """Laufende Summen je Schlüssel-Code (Codes 0..size-1)"""
+
+    exact = True
+
+    def __init__(self, size: int):
+        self.sums = np.zeros(size)
+        self.total = 0.0
+
+    def add(self, codes: np.ndarray, values: np.ndarray):
+        self.sums += np.bincount(codes, weights=values, minlength=len(self.sums))
+        self.total += float(values.sum())
+
+    def top(self, k: int) -> List[Tuple[int, float]]:
+        codes = top_k(self.sums, k)
+        return [(int(c), float(self.sums[c])) for c in codes if self.sums[c] > 0]
+
+
+class SketchTopK:
+    """Count-Min-Sketch für die Summen, dazu ein Heap der k Schlüssel mit den größten Schätzungen.
+
+    Der Sketch überschätzt nur (nicht negative Beiträge), ein Schlüssel mit
+    hohem Anteil gelangt daher sicher in die Kandidaten.
+    """
+
+    exact = False
+
+    def __init__(self, k: int, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.k = k
+        self.table = np.zeros((depth, width))
+        self._a = rng.integers(1, _PRIME, size=depth, dtype=np.int64)
+        self._b = rng.integers(0, _PRIME, size=depth, dtype=np.int64)
+        self._heap: List[Tuple[float, int]] = []
+        self.total = 0.0
+
+    def _buckets(self, codes: np.ndarray) -> np.ndarray:
+        codes = codes.astype(np.int64) % _PRIME
+        # (a·x + b) mod p ohne Überlauf: a und x liegen unter 2^31
+        return (self._a[:, None] * codes[None, :] + self._b[:, None]) % _PRIME % self.table.shape[1]
+
+    def estimate(self, codes: np.ndarray) -> np.ndarray:
+        buckets = self._buckets(codes)
+        return self.table[np.arange(self.table.shape[0])[:, None], buckets].min(axis=0)
+
+    def add(self, codes: np.ndarray, values: np.ndarray):
+        keys, inverse = np.unique(codes, return_inverse=True)
+        batch = np.bincount(inverse, weights=values, minlength=len(keys))
+        buckets = self._buckets(keys)
+        for row in range(self.table.shape[0]):
+            np.add.at(self.table[row], buckets[row], batch)
+        self.total += float(values.sum())
+
+        # Kandidaten: bisheriger Heap und die größten Schlüssel dieses Blocks, neu geschätzt
+        best = keys[top_k(batch, self.k)]
+        candidates = np.union1d(best, np.array([c for _, c in self._heap], dtype=keys.dtype))
+        estimates = self.estimate(candidates)
+        self._heap = heapq.nlargest(self.k, zip(estimates.tolist(), candidates.tolist()))
+        heapq.heapify(self._heap)
+
+    def top(self, k: int) -> List[Tuple[int, float]]:
+        return [(c, v) for v, c in heapq.nlargest(k, self._heap) if v > 0]
+
+
+class Pareto(NamedTuple):
+    dimension: str
+    table: pd.DataFrame
+    total: float
+    exact: bool
+
+
+class DriverAnalysis:
+    """Zerlegt den Auftragsbestand blockweise in Beiträge je Dimension"""
+
+    def __init__(self, arrays: BomArrays):
+        self.arrays = arrays
+        self.order_ids, self.roots, _ = arrays.order_roots()
+        self.teil_nr_ids, self.teil_nr_code = np.unique(arrays.teil_nr, return_inverse=True)
+
+        # Arbeitsgänge je Teil im CSR-Format, mit Fertigungskosten inkl. FGK je Stück
+        valid = (arrays.op_teil >= 0) & (arrays.op_maschine >= 0)
+        op_rows = np.flatnonzero(valid)
+        op_rows = op_rows[np.argsort(arrays.op_teil[op_rows], kind="stable")]
+        self.op_rows = op_rows
+        self.op_ptr = np.zeros(len(arrays.teil_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(arrays.op_teil[op_rows], minlength=len(arrays.teil_ids)), out=self.op_ptr[1:])
+        self.op_kost = (arrays.op_dauer[op_rows] / 60 * arrays.maschine_ks[arrays.op_maschine[op_rows]]
+                        * (1 + FGK_SATZ))
+
+        self.unit_total = arrays.mat_einzel * (1 + MGK_SATZ) + arrays.fert_einzel * (1 + FGK_SATZ)
+
+    def batches(self, batch_rows: int = BATCH_ROWS) -> Iterator[np.ndarray]:
+        """Oberste Teile in Blöcken, deren aufgelöste Positionen zusammen etwa ``batch_rows`` ergeben"""
+        top, _ = order_quantities(self.arrays)
+        size = np.bincount(top, minlength=len(self.arrays.teil_ids))[self.roots]
+        start, rows = 0, 0
+        for i, n in enumerate(size.tolist()):
+            if rows and rows + n > batch_rows:
+                yield self.roots[start:i]
+                start, rows = i, 0
+            rows += n
+        if start < len(self.roots):
+            yield self.roots[start:]
+
+    def contributions(self, roots: np.ndarray) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Schlüssel-Codes und Beträge je Dimension für die aufgelösten Positionen eines Blocks"""
+        arrays = self.arrays
+        explosion = explode(arrays, roots)
+        part, qty = explosion.part, explosion.gesamt_anzahl
+
+        has_mat = arrays.teil_mat[part] >= 0
+        starts = self.op_ptr[part]
+        counts = self.op_ptr[part + 1] - starts
+        offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+        ops = np.repeat(starts, counts) + offsets
+
+        return {
+            "teil": (part, qty * self.unit_total[part]),
+            "teil_nr": (self.teil_nr_code[part], qty * self.unit_total[part]),
+            "material": (arrays.teil_mat[part[has_mat]],
+                         qty[has_mat] * arrays.mat_einzel[part[has_mat]] * (1 + MGK_SATZ)),
+            "maschine": (arrays.op_maschine[self.op_rows[ops]], np.repeat(qty, counts) * self.op_kost[ops]),
+        }
+
+    def keys(self, dimension: str) -> np.ndarray:
+        return {
+            "teil": self.arrays.teil_ids,
+            "teil_nr": self.teil_nr_ids,
+            "material": self.arrays.material_ids,
+            "maschine": self.arrays.maschine_ids,
+        }[dimension]
+
+    def run(self, dimensions=DIMENSIONS, k: int = 1000, sketch: bool = False, share: float = 0.8,
+            batch_rows: int = BATCH_ROWS, progress: bool = False) -> Dict[str, Pareto]:
+        """Pareto-Tabelle je Dimension; mit ``sketch`` für Teil-ID und Teil-Nr. per Count-Min-Sketch"""
+        aggregators = {}
+        for dim in dimensions:
+            if sketch and dim in ("teil", "teil_nr"):
+                aggregators[dim] = SketchTopK(k)
+            else:
+                aggregators[dim] = ExactSums(len(self.keys(dim)))
+
+        done, start = 0, time.perf_counter()
+        for roots in self.batches(batch_rows):
+            for dim, (codes, values) in self.contributions(roots).items():
+                if dim in aggregators:
+                    aggregators[dim].add(codes, values)
+            done += len(roots)
+            if progress:
+                print(f"\r   {done}/{len(self.roots)} oberste Teile ({time.perf_counter() - start:.1f} s)",
+                      end="", flush=True)
+        if progress:
+            print()
+
+        return {dim: self._pareto(dim, agg, k, share) for dim, agg in aggregators.items()}
+
+    def _pareto(self, dimension: str, aggregator, k: int, share: float) -> Pareto:
+        top = aggregator.top(k)
+        keys = self.keys(dimension)
+        values = np.array([v for _, v in top])
+        total = aggregator.total
+        cumulative = np.cumsum(values) / total if total else np.zeros(len(values))
+        # Alle Schlüssel bis einschließlich des ersten, mit dem der Anteil erreicht ist
+        n = min(len(values), int(np.searchsorted(cumulative, share - 1e-12)) + 1)
+        table = pd.DataFrame({
+            "Rang": np.arange(1, n + 1),
+            LABELS[dimension]: keys[[c for c, _ in top[:n]]] if n else np.array([], dtype=str),
+            "Kosten": values[:n],
+            "Anteil %": values[:n] / total * 100 if total else values[:n],
+            "Kumuliert %": cumulative[:n] * 100,
+        })
+        if dimension == "maschine" and n:
+            table.insert(2, "Bezeichnung", self.arrays.maschine_bez[[c for c, _ in top[:n]]])
+        return Pareto(dimension, table, total, aggregator.exact)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dimension", default=",".join(DIMENSIONS), help=f"kommagetrennt aus {', '.join(DIMENSIONS)}")
+    parser.add_argument("--anteil", type=float, default=0.8, help="Kostenanteil der Pareto-Tabelle (0–1)")
+    parser.add_argument("--k", type=int, default=1000, help="höchstens so viele Schlüssel je Dimension")
+    parser.add_argument("--sketch", action="store_true",
+                        help="Teil-ID und Teil-Nr. per Count-Min-Sketch statt exakter Summen")
+    parser.add_argument("--zeilen", type=int, default=BATCH_ROWS, help="aufgelöste Positionen je Block")
+    parser.add_argument("--snapshot", nargs="?", const="", default=None,
+                        help="Stammdaten aus dem Binär-Snapshot laden (optional mit Pfad)")
+    parser.add_argument("--max", type=int, default=30, help="höchstens so viele Zeilen je Tabelle ausgeben")
+    args = parser.parse_args()
+
+    dimensions = [d.strip() for d in args.dimension.split(",") if d.strip()]
+    unknown = [d for d in dimensions if d not in DIMENSIONS]
+    if unknown:
+        parser.error(f"Unbekannte Dimension: {', '.join(unknown)}")
+
+    print("📥 Lade Stammdaten...")
+    arrays = load_arrays(args.snapshot or None) if args.snapshot is not None else CostModel.load().arrays()
+    start = time.perf_counter()
+    result = DriverAnalysis(arrays).run(dimensions, args.k, args.sketch, args.anteil, args.zeilen, progress=True)
+    print(f"✅ Analyse in {time.perf_counter() - start:.2f} s.")
+
+    for dim, pareto in result.items():
+        table = pareto.table
+        reached = table["Kumuliert %"].iloc[-1] if len(table) else 0.0
+        print(f"\n{LABELS[dim]}: {len(table)} Schlüssel ergeben {format_de(reached)} % von "
+              f"{format_de(pareto.total)} €{'' if pareto.exact else ' (Schätzung)'}")
+        print(table.head(args.max).to_string(index=False, float_format=format_de))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+# scripts/cost_history.py
+"""Kostenstände: Ergebnisse jedes Kostenlaufs als Parquet-Dateien mit Vergleich.
+
+Ein Lauf besteht aus
+
+    lauf-NNNNN-auftraege.parquet   Summen je Auftrag (Material, MGK, Fertigung, FGK, Gesamt)
+    lauf-NNNNN-teile.parquet       nur die Teile, die sich seit dem vorigen Lauf geändert haben
+
+und einer Zeile in ``laeufe.jsonl`` (Zeitpunkt, Datenstand, Zuschlagssätze).
+Je Teil werden die lokalen Daten gespeichert: Knoten, Anzahl sowie
+Material- und Fertigungseinzelkosten. Unveränderte Teile werden nicht neu
+geschrieben, sondern aus früheren Läufen übernommen (zuletzt geschriebene
+Zeile je Teil, gelöschte Teile als ``geloescht``). Gesamtmengen, Positions-
+und Auftragskosten eines Laufs ergeben sich daraus wie in cost_table.
+
+Der Vergleich zweier Läufe ordnet die Änderung jedes Auftrags den Teilen
+zu, deren Beitrag sich geändert hat, und nennt die Ursache (Materialpreis,
+Fertigung, Menge, neu/entfernt, Zuschlagssatz).
+
+Aufruf: python -m scripts.cost_history erfassen | liste | vergleich 3 4 [--teile]
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from .cache import get_data_version
+from .capacity import order_quantities
+from .calc import get_all_auftrag_ids
+from .config import settings
+from .cost_model import BomArrays, CostModel, FGK_SATZ, MGK_SATZ
+from .database import Session
+from .models import Auftrag
+from .utils import format_de, normalize_knoten
+
+MANIFEST = "laeufe.jsonl"
+PART_COLUMNS = ["teil_id", "knoten", "anzahl", "mat_einzel", "fert_einzel"]
+ORDER_COLUMNS = ["Auftrag", "Material", "MGK", "Fertigung", "FGK", "Gesamt"]
+PARTS = ["Material", "MGK", "Fertigung", "FGK", "Gesamt"]
+
+
+def _differs(a: pd.Series, b: pd.Series) -> pd.Series:
+    """Ungleich bis auf Rundungsrauschen (Summationsreihenfolge beim Laden)"""
+    if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+        return pd.Series(~np.isclose(a, b, rtol=1e-12, atol=1e-9), index=a.index)
+    return a != b
+
+
+class CostDiff(NamedTuple):
+    auftraege: pd.DataFrame     # Änderung je Auftrag
+    teile: pd.DataFrame         # Beiträge der einzelnen Teile mit Ursache
+
+
+def _arrays(parts: pd.DataFrame) -> BomArrays:
+    """Stückliste eines Laufs als BomArrays; Einzelkosten stehen in den Teilen, nicht in den Arrays"""
+    n = len(parts)
+    teil_ids = parts["teil_id"].to_numpy(dtype=str)
+    knoten = parts["knoten"].to_numpy(dtype=str)
+    none = np.zeros(0, dtype=np.int64)
+    return BomArrays(
+        teil_ids=teil_ids, teil_nr=np.full(n, "", dtype=str), knoten=knoten,
+        parent=pd.Index(teil_ids).get_indexer(knoten).astype(np.int64),
+        anzahl=parts["anzahl"].to_numpy(dtype=np.float64), teil_mat=np.full(n, -1, dtype=np.int64),
+        material_ids=np.zeros(0, dtype=str), material_kost=np.zeros(0),
+        maschine_ids=np.zeros(0, dtype=str), maschine_ks=np.zeros(0), maschine_bez=np.zeros(0, dtype=str),
+        op_teil=none, op_maschine=none, op_dauer=np.zeros(0),
+    )
+
+
+def positions(parts: pd.DataFrame, mgk_satz: float, fgk_satz: float) -> pd.DataFrame:
+    """Kostenbeitrag jedes Teils zu seinem Auftrag (Einzelkosten mal Gesamtmenge)"""
+    teil_ids = parts["teil_id"].to_numpy()
+    knoten = parts["knoten"].to_numpy()
+    top, qty = order_quantities(_arrays(parts))
+
+    material = qty * parts["mat_einzel"].to_numpy()
+    fertigung = qty * parts["fert_einzel"].to_numpy()
+    df = pd.DataFrame({
+        "Auftrag": knoten[top],
+        "Teil-ID": teil_ids,
+        "Gesamt Anzahl": qty,
+        "mat_einzel": parts["mat_einzel"].to_numpy(),
+        "fert_einzel": parts["fert_einzel"].to_numpy(),
+        "Material": material,
+        "MGK": material * mgk_satz,
+        "Fertigung": fertigung,
+        "FGK": fertigung * fgk_satz,
+    })
+    df["Gesamt"] = df["Material"] + df["MGK"] + df["Fertigung"] + df["FGK"]
+    # Teile ohne Auftrag (Waisen) zählen nicht
+    return df[df["Auftrag"] != ""].reset_index(drop=True)
+
+
+def order_totals(positions_df: pd.DataFrame, auftraege: Optional[List[str]] = None) -> pd.DataFrame:
+    totals = positions_df.groupby("Auftrag", sort=True)[PARTS].sum()
+    if auftraege is not None:
+        # Positionen tragen den normalisierten Knoten, gespeicherte Nummern evtl. nicht
+        totals = totals.reindex(sorted({normalize_knoten(a) for a in auftraege}), fill_value=0.0)
+    return totals.rename_axis("Auftrag").reset_index()[ORDER_COLUMNS]
+
+
+class CostHistory:
+    """Ablage der Kostenläufe in einem Verzeichnis"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings["kostenstaende"]
+        self._parts: Dict[int, pd.DataFrame] = {}
+
+    def _file(self, lauf: int, kind: str) -> str:
+        return os.path.join(self.path, f"lauf-{lauf:05d}-{kind}.parquet")
+
+    def runs(self) -> List[Dict]:
+        path = os.path.join(self.path, MANIFEST)
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def run(self, lauf: int) -> Dict:
+        for entry in self.runs():
+            if entry["lauf"] == lauf:
+                return entry
+        raise KeyError(f"Kostenlauf {lauf} nicht vorhanden")
+
+    def parts(self, lauf: int) -> pd.DataFrame:
+        """Stand aller Teile zum Lauf: je Teil die zuletzt geschriebene Zeile bis zu diesem Lauf"""
+        if lauf not in self._parts:
+            laeufe = [e["lauf"] for e in self.runs() if e["lauf"] <= lauf]
+            if lauf not in laeufe:
+                raise KeyError(f"Kostenlauf {lauf} nicht vorhanden")
+            frames = [pd.read_parquet(self._file(l, "teile")) for l in laeufe]
+            rows = pd.concat(frames, ignore_index=True).drop_duplicates("teil_id", keep="last")
+            rows = rows[~rows["geloescht"]].sort_values("teil_id", kind="stable")
+            self._parts[lauf] = rows[PART_COLUMNS].reset_index(drop=True)
+        return self._parts[lauf]
+
+    def orders(self, lauf: int) -> pd.DataFrame:
+        df = pd.read_parquet(self._file(lauf, "auftraege"))
+        # Ältere Läufe enthalten die Auftragsnummern wie gespeichert
+        df["Auftrag"] = df["Auftrag"].map(normalize_knoten)
+        return df
+
+    def positions(self, lauf: int, auftrag: Optional[str] = None) -> pd.DataFrame:
+        entry = self.run(lauf)
+        df = positions(self.parts(lauf), entry["mgk_satz"], entry["fgk_satz"])
+        return df if auftrag is None else df[df["Auftrag"] == normalize_knoten(auftrag)].reset_index(drop=True)
+
+    def record(self, model: Optional[CostModel] = None, auftraege: Optional[List[str]] = None,
+               data_version: Optional[int] = None, bemerkung: str = "") -> Dict:
+        """Legt einen neuen Kostenlauf an und liefert seinen Manifest-Eintrag"""
+        if model is None:
+            # Datenstand, Modell und Aufträge aus derselben Transaktion
+            session = Session()
+            try:
+                data_version = get_data_version(session)
+                model = CostModel.load(session)
+                if auftraege is None:
+                    auftraege = session.execute(select(Auftrag.auftrag_nr)).scalars().all()
+            finally:
+                session.close()
+        if auftraege is None:
+            auftraege = get_all_auftrag_ids()
+
+        arrays = model.arrays()
+        current = pd.DataFrame({
+            "teil_id": arrays.teil_ids.astype(object),
+            "knoten": arrays.knoten.astype(object),
+            "anzahl": arrays.anzahl,
+            "mat_einzel": arrays.mat_einzel,
+            "fert_einzel": arrays.fert_einzel,
+        }).sort_values("teil_id", kind="stable").reset_index(drop=True)
+        totals = order_totals(positions(current, MGK_SATZ, FGK_SATZ), auftraege)
+
+        runs = self.runs()
+        lauf = runs[-1]["lauf"] + 1 if runs else 1
+        changed = self._changed_parts(current, self.parts(runs[-1]["lauf"]) if runs else None)
+
+        os.makedirs(self.path, exist_ok=True)
+        for kind, df in (("teile", changed), ("auftraege", totals)):
+            tmp = self._file(lauf, kind) + ".tmp"
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, self._file(lauf, kind))
+
+        entry = {
+            "lauf": lauf,
+            "zeit": datetime.now().isoformat(timespec="seconds"),
+            "datenstand": data_version,
+            "mgk_satz": MGK_SATZ,
+            "fgk_satz": FGK_SATZ,
+            "auftraege": len(totals),
+            "teile": len(current),
+            "teile_geschrieben": int((~changed["geloescht"]).sum()),
+            "gesamt": float(totals["Gesamt"].sum()),
+            "bemerkung": bemerkung,
+        }
+        # Erst die Dateien, dann der Eintrag: ein abgebrochener Lauf bleibt unsichtbar
+        with open(os.path.join(self.path, MANIFEST), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._parts[lauf] = current
+        return entry
+
+    @staticmethod
+    def _changed_parts(current: pd.DataFrame, previous: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """Neue und geänderte Teile sowie Löschvermerke gegenüber dem vorigen Stand"""
+        if previous is None:
+            return current.assign(geloescht=False)
+        merged = current.merge(previous, on="teil_id", how="outer", suffixes=("", "_alt"), indicator=True)
+        same = merged["_merge"] == "both"
+        for col in PART_COLUMNS[1:]:
+            same &= ~_differs(merged[col], merged[f"{col}_alt"])
+        new = merged[(merged["_merge"] != "right_only") & ~same][PART_COLUMNS].assign(geloescht=False)
+        removed = merged[merged["_merge"] == "right_only"][["teil_id"]].assign(
+            knoten="", anzahl=0.0, mat_einzel=0.0, fert_einzel=0.0, geloescht=True)
+        return pd.concat([new, removed], ignore_index=True)[PART_COLUMNS + ["geloescht"]]
+
+    def diff(self, alt: int, neu: int, alle: bool = False) -> CostDiff:
+        """Vergleicht zwei Läufe je Auftrag und je Teil (neu minus alt)"""
+        satz_alt = self.run(alt)
+        satz_neu = self.run(neu)
+        orders = self.orders(alt).merge(self.orders(neu), on="Auftrag", how="outer", suffixes=(" alt", " neu"),
+                                        indicator=True)
+        pos = self.positions(alt).merge(self.positions(neu), on=["Auftrag", "Teil-ID"], how="outer",
+                                        suffixes=(" alt", " neu"), indicator=True)
+        # Nur Teile, die an einem Auftrag hängen (keine Waisen)
+        pos = pos[pos["Auftrag"].isin(orders["Auftrag"])].reset_index(drop=True)
+        for col in PARTS + ["Gesamt Anzahl", "mat_einzel", "fert_einzel"]:
+            pos[[f"{col} alt", f"{col} neu"]] = pos[[f"{col} alt", f"{col} neu"]].fillna(0.0)
+        for col in PARTS:
+            pos[f"Δ {col}"] = pos[f"{col} neu"] - pos[f"{col} alt"]
+
+        # Ursachen je Teil, mehrere möglich
+        both = pos["_merge"] == "both"
+        reasons = {
+            "neu": pos["_merge"] == "right_only",
+            "entfernt": pos["_merge"] == "left_only",
+            "Materialpreis": both & _differs(pos["mat_einzel alt"], pos["mat_einzel neu"]),
+            "Fertigung": both & _differs(pos["fert_einzel alt"], pos["fert_einzel neu"]),
+            "Menge": both & _differs(pos["Gesamt Anzahl alt"], pos["Gesamt Anzahl neu"]),
+            "MGK-Satz": both & (pos["Material neu"] != 0) & (satz_alt["mgk_satz"] != satz_neu["mgk_satz"]),
+            "FGK-Satz": both & (pos["Fertigung neu"] != 0) & (satz_alt["fgk_satz"] != satz_neu["fgk_satz"]),
+        }
+        ursache = np.full(len(pos), "", dtype=object)
+        for name, mask in reasons.items():
+            rows = mask.to_numpy()
+            ursache[rows] = np.where(ursache[rows] == "", name, ursache[rows] + ", " + name)
+        pos["Ursache"] = ursache
+
+        changed = pos["Δ Gesamt"].abs() > 1e-9
+        teile = pos.loc[changed | (pos["Ursache"] != ""), ["Auftrag", "Teil-ID", "Ursache", "Gesamt Anzahl alt",
+                                                    "Gesamt Anzahl neu"] + [f"Δ {c}" for c in PARTS]]
+        teile = teile.sort_values("Δ Gesamt", key=np.abs, ascending=False, kind="stable").reset_index(drop=True)
+
+        for col in PARTS:
+            orders[[f"{col} alt", f"{col} neu"]] = orders[[f"{col} alt", f"{col} neu"]].fillna(0.0)
+            orders[f"Δ {col}"] = orders[f"{col} neu"] - orders[f"{col} alt"]
+        orders["Status"] = np.select(
+            [orders["_merge"] == "right_only", orders["_merge"] == "left_only", orders["Δ Gesamt"].abs() > 1e-9],
+            ["neu", "entfernt", "geändert"], "unverändert")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            orders["Δ %"] = np.where(orders["Gesamt alt"] != 0,
+                                     orders["Δ Gesamt"] / orders["Gesamt alt"] * 100, np.nan)
+        auftraege = orders[["Auftrag", "Status", "Gesamt alt", "Gesamt neu"] + [f"Δ {c}" for c in PARTS] + ["Δ %"]]
+        if not alle:
+            auftraege = auftraege[auftraege["Status"] != "unverändert"]
+        auftraege = auftraege.sort_values("Δ Gesamt", key=np.abs, ascending=False, kind="stable")
+        return CostDiff(auftraege.reset_index(drop=True), teile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pfad", default=None, help="Verzeichnis der Kostenstände")
+    sub = parser.add_subparsers(dest="befehl", required=True)
+    erfassen = sub.add_parser("erfassen", help="neuen Kostenlauf anlegen")
+    erfassen.add_argument("--bemerkung", default="")
+    sub.add_parser("liste", help="vorhandene Kostenläufe")
+    vergleich = sub.add_parser("vergleich", help="zwei Kostenläufe vergleichen")
+    vergleich.add_argument("alt", type=int)
+    vergleich.add_argument("neu", type=int)
+    vergleich.add_argument("--teile", action="store_true", help="Beiträge der Teile mit Ursache ausgeben")
+    vergleich.add_argument("--auftrag", help="nur diesen Auftrag")
+    vergleich.add_argument("--zeilen", type=int, default=30, help="höchstens so viele Zeilen je Tabelle")
+    args = parser.parse_args()
+
+    history = CostHistory(args.pfad)
+    pd.set_option("display.width", 200)
+    if args.befehl == "erfassen":
+        start = time.perf_counter()
+        entry = history.record(bemerkung=args.bemerkung)
+        print(f"✅ Kostenlauf {entry['lauf']} (Datenstand {entry['datenstand']}): {entry['auftraege']} Aufträge, "
+              f"{entry['teile_geschrieben']} von {entry['teile']} Teilen geschrieben "
+              f"in {time.perf_counter() - start:.2f} s.")
+    elif args.befehl == "liste":
+        runs = history.runs()
+        if not runs:
+            print("Noch keine Kostenläufe.")
+        else:
+            print(pd.DataFrame(runs).to_string(index=False))
+    else:
+        start = time.perf_counter()
+        try:
+            result = history.diff(args.alt, args.neu)
+        except KeyError as e:
+            parser.error(e.args[0])
+        auftraege, teile = result.auftraege, result.teile
+        if args.auftrag:
+            auftrag = normalize_knoten(args.auftrag)
+            auftraege = auftraege[auftraege["Auftrag"] == auftrag]
+            teile = teile[teile["Auftrag"] == auftrag]
+        print(f"{len(auftraege)} geänderte Aufträge, Summe Δ {format_de(auftraege['Δ Gesamt'].sum())} € "
+              f"({time.perf_counter() - start:.2f} s)")
+        print(auftraege.head(args.zeilen).to_string(index=False, float_format=format_de))
+        if args.teile:
+            print()
+            print(teile.head(args.zeilen).to_string(index=False, float_format=format_de))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional
+import numpy as np
+from .config import settings
+from .models import Material, Maschine, Teil, Arbeitsplan
+from .database import Session
+from .instrumentation import note
+from .utils import normalize_knoten
+
+# Gemeinkostenzuschläge (MGK auf Material-, FGK auf Fertigungseinzelkosten)
+MGK_SATZ: float = settings["mgk_satz"]
+FGK_SATZ: float = settings["fgk_satz"]
+
+class TeilRow(NamedTuple):
+    teil_id: str
+    teil_nr: Optional[str]
+    knoten: Optional[str]
+    anzahl: Optional[float]
+    mat: Optional[str]
+
+
+class ArbeitsplanRow(NamedTuple):
+    teil_id: str
+    ag_nr: str
+    maschine: Optional[str]
+    dauer: Optional[float]
+
+
+class MaschineRow(NamedTuple):
+    nr: str
+    bezeichnung: Optional[str]
+    ks: Optional[float]
+
+
+class MaterialRow(NamedTuple):
+    nr: str
+    kost: Optional[float]
+
+
+class CostModel:
+    """Kostenrelevante Stammdaten im Speicher, geladen mit einer festen Anzahl Abfragen.
+
+    Alle Kalkulationsfunktionen können auf einem geladenen Modell ohne weitere
+    SQL-Abfragen laufen.
+    """
+
+    # Anzahl der SQL-Abfragen, die load() absetzt
+    QUERY_COUNT = 4
+
+    def __init__(self, teile: List[TeilRow], arbeitsplaene: List[ArbeitsplanRow],
+                 maschinen: List[MaschineRow], materialien: List[MaterialRow]):
+        self.teile: Dict[str, TeilRow] = {t.teil_id: t for t in teile}
+        self.maschinen: Dict[str, MaschineRow] = {m.nr: m for m in maschinen}
+        self.materialien: Dict[str, MaterialRow] = {m.nr: m for m in materialien}
+
+        self.arbeitsplaene: Dict[str, List[ArbeitsplanRow]] = defaultdict(list)
+        for op in arbeitsplaene:
+            self.arbeitsplaene[op.teil_id].append(op)
+
+        # Eltern -> Kinder über den normalisierten Knoten, für Teile wie für Auftragsköpfe
+        self._arrays: Optional["BomArrays"] = None
+        self.by_knoten: Dict[str, List[TeilRow]] = defaultdict(list)
+        for t in teile:
+            if t.knoten:
+                self.by_knoten[normalize_knoten(t.knoten)].append(t)
+
+    @classmethod
+    def load(cls, session: Optional[Session] = None) -> "CostModel":
+        own_session = session is None
+        if own_session:
+            session = Session()
+        try:
+            teile = session.query(
+                Teil.teil_id, Teil.teil_nr, Teil.knoten, Teil.anzahl, Teil.mat
+            ).order_by(Teil.teil_id).all()
+            arbeitsplaene = session.query(
+                Arbeitsplan.teil_id, Arbeitsplan.ag_nr, Arbeitsplan.maschine, Arbeitsplan.dauer
+            ).order_by(Arbeitsplan.teil_id, Arbeitsplan.ag_nr).all()
+            maschinen = session.query(Maschine.nr, Maschine.bezeichnung, Maschine.ks).all()
+            materialien = session.query(Material.nr, Material.kost).all()
+        finally:
+            if own_session:
+                session.close()
+        note(rows=len(teile) + len(arbeitsplaene) + len(maschinen) + len(materialien))
+
+        return cls(
+            [TeilRow(*r) for r in teile],
+            [ArbeitsplanRow(*r) for r in arbeitsplaene],
+            [MaschineRow(*r) for r in maschinen],
+            [MaterialRow(*r) for r in materialien],
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays: "BomArrays") -> "CostModel":
+        """Baut das Modell aus einer Spaltenansicht (z. B. einem Snapshot) wieder auf.
+
+        Verweise auf nicht vorhandene Materialien oder Maschinen sind dort mit
+        -1 codiert und fehlen daher im Modell; zu den Kosten tragen sie ohnehin
+        nichts bei.
+        """
+        material_ids = arrays.material_ids.tolist()
+        maschine_ids = arrays.maschine_ids.tolist()
+        teil_ids = arrays.teil_ids.tolist()
+        teile = [
+            TeilRow(teil_id, nr or None, knoten or None, float(anzahl), material_ids[mat] if mat >= 0 else None)
+            for teil_id, nr, knoten, anzahl, mat in zip(
+                teil_ids, arrays.teil_nr.tolist(), arrays.knoten.tolist(), arrays.anzahl.tolist(),
+                arrays.teil_mat.tolist()
+            )
+        ]
+        arbeitsplaene = [
+            ArbeitsplanRow(teil_ids[t], ag_nr, maschine_ids[m] if m >= 0 else None, dauer)
+            for t, ag_nr, m, dauer in zip(
+                arrays.op_teil.tolist(), arrays.op_ag_nr.tolist(), arrays.op_maschine.tolist(),
+                arrays.op_dauer.tolist()
+            )
+            if t >= 0
+        ]
+        maschinen = [
+            MaschineRow(nr, bez or None, ks)
+            for nr, bez, ks in zip(maschine_ids, arrays.maschine_bez.tolist(), arrays.maschine_ks.tolist())
+        ]
+        materialien = [MaterialRow(nr, kost) for nr, kost in zip(material_ids, arrays.material_kost.tolist())]
+
+        model = cls(teile, arbeitsplaene, maschinen, materialien)
+        model._arrays = arrays
+        return model
+
+    def material_kost(self, teil: TeilRow) -> float:
+        """Materialeinzelkosten eines Teils (0, wenn kein Material hinterlegt ist)"""
+        if not teil.mat:
+            return 0.0
+        material = self.materialien.get(teil.mat)
+        return material.kost if material else 0.0
+
+    def fert_kost(self, teil_id: str) -> float:
+        """Fertigungseinzelkosten eines Teils über alle Arbeitsgänge"""
+        kost = 0.0
+        for op in self.arbeitsplaene.get(teil_id, ()):
+            maschine = self.maschinen.get(op.maschine)
+            if maschine:
+                kost += (op.dauer / 60) * maschine.ks
+        return kost
+
+    def arrays(self) -> "BomArrays":
+        """Spaltenansicht des Modells (wird beim ersten Aufruf aufgebaut)"""
+        if self._arrays is None:
+            self._arrays = BomArrays.from_model(self)
+        return self._arrays
+
+
+class BomArrays:
+    """Ganzzahlig codierte Spaltenansicht der Stammdaten für NumPy-Berechnungen.
+
+    Teile, Maschinen und Materialien werden über ihre Position in
+    ``teil_ids``, ``maschine_ids`` bzw. ``material_ids`` angesprochen,
+    fehlende Verweise sind mit -1 codiert.
+    """
+
+    def __init__(self, teil_ids: np.ndarray, teil_nr: np.ndarray, knoten: np.ndarray, parent: np.ndarray,
+                 anzahl: np.ndarray, teil_mat: np.ndarray, material_ids: np.ndarray, material_kost: np.ndarray,
+                 maschine_ids: np.ndarray, maschine_ks: np.ndarray, maschine_bez: np.ndarray,
+                 op_teil: np.ndarray, op_maschine: np.ndarray, op_dauer: np.ndarray,
+                 op_ag_nr: Optional[np.ndarray] = None):
+        self.teil_ids = teil_ids
+        self.teil_nr = teil_nr
+        self.knoten = knoten
+        self.parent = parent
+        self.anzahl = anzahl
+        self.teil_mat = teil_mat
+        self.material_ids = material_ids
+        self.material_kost = material_kost
+        self.maschine_ids = maschine_ids
+        self.maschine_ks = maschine_ks
+        self.maschine_bez = maschine_bez
+        self.op_teil = op_teil
+        self.op_maschine = op_maschine
+        self.op_dauer = op_dauer
+        self.op_ag_nr = op_ag_nr if op_ag_nr is not None else np.full(len(op_teil), "", dtype=str)
+
+        n = len(teil_ids)
+
+        # Einzelkosten je Teil
+        has_mat = teil_mat >= 0
+        self.mat_einzel = np.zeros(n)
+        self.mat_einzel[has_mat] = material_kost[teil_mat[has_mat]]
+
+        has_maschine = op_maschine >= 0
+        op_kost = np.zeros(len(op_teil))
+        op_kost[has_maschine] = op_dauer[has_maschine] / 60 * maschine_ks[op_maschine[has_maschine]]
+        valid_op = op_teil >= 0
+        self.fert_einzel = np.bincount(op_teil[valid_op], weights=op_kost[valid_op], minlength=n)
+
+        # Kinder je Teil im CSR-Format, innerhalb eines Elternteils in Teil-Reihenfolge
+        has_parent = parent >= 0
+        self.child_order = np.flatnonzero(has_parent)[np.argsort(parent[has_parent], kind="stable")]
+        self.child_ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(parent[has_parent], minlength=n), out=self.child_ptr[1:])
+
+        # Suche der Teile je normalisiertem Knoten (Auftragsköpfe)
+        self._knoten_order = np.argsort(knoten, kind="stable")
+        self._knoten_sorted = knoten[self._knoten_order]
+
+    @classmethod
+    def from_model(cls, model: CostModel) -> "BomArrays":
+        teile = list(model.teile.values())
+        teil_ids = np.array([t.teil_id for t in teile], dtype=str)
+        teil_index = {t: i for i, t in enumerate(teil_ids.tolist())}
+
+        material_ids = np.array(list(model.materialien), dtype=str)
+        material_index = {m: i for i, m in enumerate(material_ids.tolist())}
+        maschine_ids = np.array(list(model.maschinen), dtype=str)
+        maschine_index = {m: i for i, m in enumerate(maschine_ids.tolist())}
+
+        ops = [op for ops in model.arbeitsplaene.values() for op in ops]
+        knoten = [normalize_knoten(t.knoten) if t.knoten else "" for t in teile]
+
+        return cls(
+            teil_ids=teil_ids,
+            teil_nr=np.array([t.teil_nr or "" for t in teile], dtype=str),
+            knoten=np.array(knoten, dtype=str),
+            parent=np.array([teil_index.get(k, -1) if k else -1 for k in knoten], dtype=np.int64),
+            anzahl=np.array([t.anzahl or 1 for t in teile], dtype=np.float64),
+            teil_mat=np.array([material_index.get(t.mat, -1) if t.mat else -1 for t in teile], dtype=np.int64),
+            material_ids=material_ids,
+            material_kost=np.array([m.kost or 0.0 for m in model.materialien.values()], dtype=np.float64),
+            maschine_ids=maschine_ids,
+            maschine_ks=np.array([m.ks or 0.0 for m in model.maschinen.values()], dtype=np.float64),
+            maschine_bez=np.array([m.bezeichnung or "" for m in model.maschinen.values()], dtype=str),
+            op_teil=np.array([teil_index.get(op.teil_id, -1) for op in ops], dtype=np.int64),
+            op_maschine=np.array([maschine_index.get(op.maschine, -1) for op in ops], dtype=np.int64),
+            op_dauer=np.array([op.dauer or 0.0 for op in ops], dtype=np.float64),
+            op_ag_nr=np.array([op.ag_nr for op in ops], dtype=str),
+        )
+
+    def order_roots(self, order_ids: Optional[List[str]] = None):
+        """Oberste Teile der Aufträge: (Auftragsnummern, Teil-Codes, Auftragsindex je Teil).
+
+        Ohne ``order_ids`` gelten alle Knoten oberster Teile als Aufträge.
+        """
+        top_level = np.flatnonzero((self.parent < 0) & (self.knoten != ""))
+        knoten = self.knoten[top_level]
+        if order_ids is None:
+            order_ids = np.unique(knoten)
+        else:
+            order_ids = np.asarray([normalize_knoten(a) for a in order_ids], dtype=str)
+        if not len(order_ids):
+            return order_ids, top_level[:0], top_level[:0]
+
+        order_sorted = np.argsort(order_ids, kind="stable")
+        pos = np.clip(np.searchsorted(order_ids[order_sorted], knoten), 0, len(order_ids) - 1)
+        found = order_ids[order_sorted][pos] == knoten
+        return order_ids, top_level[found], order_sorted[pos[found]]
+
+    def roots(self, knoten: str) -> np.ndarray:
+        """Teile, deren (normalisierter) Knoten dem angegebenen Wert entspricht"""
+        knoten = normalize_knoten(knoten)
+        lo = np.searchsorted(self._knoten_sorted, knoten, side="left")
+        hi = np.searchsorted(self._knoten_sorted, knoten, side="right")
+        return self._knoten_order[lo:hi]
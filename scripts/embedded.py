@@ -0,0 +1,50 @@
+# scripts/embedded.py
+"""Befüllt eine eingebettete Datenbank (SQLite/DuckDB) beim Start aus einer Excel-Datei.
+
+App und Kalkulationsdienst rufen startup() beim Start auf. Beispiel ohne
+Postgres-Server::
+
+    KOSTCALC_DB_URL=sqlite:// KOSTCALC_SEED_XLSX=data/source.xlsx streamlit run app.py
+
+Eine Datenbankdatei lässt sich auch einmalig befüllen::
+
+    KOSTCALC_DB_URL=sqlite:///data/kostcalc.db python -m scripts.embedded data/source.xlsx
+"""
+import argparse
+from sqlalchemy import func, select
+from .config import settings
+
+
+def seed(engine, path: str):
+    """Legt die Tabellen an und importiert die Datei, falls noch keine Teile vorhanden sind"""
+    from .database import Base
+    from .models import Teil
+    from .import_data import import_workbook
+
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        if conn.execute(select(func.count()).select_from(Teil.__table__)).scalar():
+            return
+    import_workbook(path, engine, quiet=True)
+
+
+def startup():
+    """Befüllt die Datenbank, wenn KOSTCALC_SEED_XLSX gesetzt ist"""
+    if settings["seed_xlsx"]:
+        from .database import engine
+        seed(engine, settings["seed_xlsx"])
+
+
+def main():
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=settings["seed_xlsx"] or "data/source.xlsx")
+    args = parser.parse_args()
+
+    seed(engine, args.path)
+    print("✅ Datenbank bereit.")
+
+
+if __name__ == "__main__":
+    main()
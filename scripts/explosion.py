@@ -0,0 +1,134 @@
+from typing import List, NamedTuple
+import numpy as np
+import pandas as pd
+from .cost_model import BomArrays, FGK_SATZ, MGK_SATZ
+from .rollup import CycleError
+
+COLUMNS = ["Position", "Ebene", "Anzahl", "Gesamt Anzahl", "Mat. Einzel", "Mat. Pos.", "MGK",
+           "Fert. Pos.", "FGK", "Gesamtkosten"]
+
+
+class Explosion(NamedTuple):
+    """Aufgelöste Stückliste, eine Zeile je Position in Vorordnung (Tiefensuche)"""
+    part: np.ndarray            # Teil-Code je Position
+    parent_row: np.ndarray      # Zeile des Elternteils, -1 auf Ebene 1
+    ebene: np.ndarray
+    gesamt_anzahl: np.ndarray   # Produkt der Anzahlen entlang des Pfads
+
+
+def _cycle_above(arrays: BomArrays, part: int) -> List[str]:
+    """Zyklus über den Elternverweisen oberhalb des Teils, von oben nach unten wie bei CostRollup"""
+    path = []
+    seen = {}
+    while part not in seen:
+        seen[part] = len(path)
+        path.append(part)
+        part = int(arrays.parent[part])
+    cycle = path[seen[part]:] + [part]
+    return arrays.teil_ids[cycle[::-1]].tolist()
+
+
+def explode(arrays: BomArrays, roots: np.ndarray) -> Explosion:
+    """Löst die Stückliste ebenenweise mit Array-Operationen auf."""
+    roots = np.asarray(roots, dtype=np.int64)
+    parts = [roots]
+    parent_rows = [np.full(len(roots), -1, dtype=np.int64)]
+    qty = [arrays.anzahl[roots]]
+    # Index innerhalb der Geschwistergruppe, je Ebene
+    offsets = [np.arange(len(roots), dtype=np.int64)]
+    first_row = 0
+
+    while len(parts[-1]):
+        if len(parts) > len(arrays.teil_ids):
+            # Tiefer als die Anzahl der Teile geht nur mit einem Zyklus
+            raise CycleError(_cycle_above(arrays, int(parts[-1][0])))
+
+        level_parts = parts[-1]
+        rows = np.arange(first_row, first_row + len(level_parts))
+        first_row += len(level_parts)
+
+        starts = arrays.child_ptr[level_parts]
+        counts = arrays.child_ptr[level_parts + 1] - starts
+        total = int(counts.sum())
+        level_offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        child_parts = arrays.child_order[np.repeat(starts, counts) + level_offsets]
+
+        parts.append(child_parts)
+        parent_rows.append(np.repeat(rows, counts))
+        qty.append(arrays.anzahl[child_parts] * np.repeat(qty[-1], counts))
+        offsets.append(level_offsets)
+
+    part = np.concatenate(parts)
+    parent_row = np.concatenate(parent_rows)
+    gesamt_anzahl = np.concatenate(qty)
+    ebene = np.concatenate([np.full(len(p), i + 1, dtype=np.int64) for i, p in enumerate(parts)])
+    bounds = np.cumsum([0] + [len(p) for p in parts])
+
+    # Größe der Teilbäume von unten nach oben
+    size = np.ones(len(part), dtype=np.int64)
+    for level in range(len(parts) - 1, 0, -1):
+        rows = slice(bounds[level], bounds[level + 1])
+        np.add.at(size, parent_row[rows], size[rows])
+
+    # Vorordnungsposition von oben nach unten: Position des Elternteils + 1
+    # + Größe der Teilbäume aller vorherigen Geschwister
+    pos = np.empty(len(part), dtype=np.int64)
+    for level in range(len(parts)):
+        rows = slice(bounds[level], bounds[level + 1])
+        level_size = size[rows]
+        before = np.cumsum(level_size) - level_size
+        within = before - before[np.arange(len(level_size)) - offsets[level]]
+        if level:
+            pos[rows] = pos[parent_row[rows]] + 1 + within
+        else:
+            pos[rows] = within
+
+    order = np.empty_like(pos)
+    order[pos] = np.arange(len(pos))
+    parent_row = parent_row[order]
+    has_parent = parent_row >= 0
+    parent_row[has_parent] = pos[parent_row[has_parent]]
+
+    return Explosion(part[order], parent_row, ebene[order], gesamt_anzahl[order])
+
+
+def cost_table(arrays: BomArrays, explosion: Explosion) -> pd.DataFrame:
+    """Positionskosten als typisierter DataFrame (ohne Kopf- und Summenzeile)"""
+    part = explosion.part
+    gesamt = explosion.gesamt_anzahl
+
+    mat_einzel = arrays.mat_einzel[part]
+    mat_pos = mat_einzel * gesamt
+    mgk = mat_pos * MGK_SATZ
+    fert_pos = arrays.fert_einzel[part] * gesamt
+    fgk = fert_pos * FGK_SATZ
+
+    return pd.DataFrame({
+        "Position": np.char.add("Teil ", arrays.teil_ids[part]),
+        "Ebene": explosion.ebene,
+        "Anzahl": arrays.anzahl[part],
+        "Gesamt Anzahl": gesamt,
+        "Mat. Einzel": mat_einzel,
+        "Mat. Pos.": mat_pos,
+        "MGK": mgk,
+        "Fert. Pos.": fert_pos,
+        "FGK": fgk,
+        "Gesamtkosten": mat_pos + mgk + fert_pos + fgk,
+    }, columns=COLUMNS)
+
+
+def with_summary_rows(positions: pd.DataFrame, auftrag_nr: str) -> pd.DataFrame:
+    """Ergänzt Auftragskopf und GESAMT-Zeile für die Anzeige.
+
+    Nicht zutreffende Zellen bleiben leer (NaN), die Zahlenspalten behalten
+    ihre numerischen Typen.
+    """
+    head = pd.DataFrame({"Position": [f"Auftrag {auftrag_nr}"], "Ebene": [0], "Anzahl": [1.0],
+                         "Gesamt Anzahl": [1.0]}, columns=COLUMNS)
+    total = pd.DataFrame({"Position": ["GESAMT"], "Gesamtkosten": [positions["Gesamtkosten"].sum()]},
+                         columns=COLUMNS)
+
+    df = pd.concat([head, positions, total], ignore_index=True)
+    dtypes = {col: "float64" for col in COLUMNS[2:]}
+    dtypes.update({"Position": object, "Ebene": "Int64"})
+    return df.astype(dtypes)
@@ -0,0 +1,191 @@
+# scripts/export.py
+"""Exportiert die Kostenstruktur aller Aufträge als Parquet oder CSV.
+
+Die Zeilen von calc_full_cost_structure werden je Auftrag erzeugt, zu
+Blöcken von etwa ``batch_rows`` Zeilen gesammelt (ein Auftrag wird nie
+geteilt) und jeder Block als eigene Datei ``teil-NNNNN.parquet`` bzw.
+``teil-NNNNN.csv`` geschrieben. Der Speicherbedarf hängt damit nur von der
+Blockgröße ab.
+
+Jede Zeile trägt ihre Zeilenart (Kopf, Position, Summe) und bei Positionen
+die Teil-ID. Für Auswertungen nur Zeilen mit Zeilenart "Position"
+summieren, die Summenzeile enthält den Auftragswert ein zweites Mal.
+
+Fertige Dateien werden in ``_manifest.jsonl`` eingetragen; ein erneuter
+Aufruf mit ``--fortsetzen`` überspringt alle dort verzeichneten Aufträge.
+
+Aufruf: python -m scripts.export export/ --format parquet --von A00100 --bis A00199
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import numpy as np
+import pandas as pd
+from .calc import calc_full_cost_structure, get_all_auftrag_ids
+from .cost_model import CostModel
+from .explosion import COLUMNS
+
+MANIFEST = "_manifest.jsonl"
+BATCH_ROWS = 100000
+KOPF, POSITION, SUMME = "Kopf", "Position", "Summe"
+
+
+def arrow_schema():
+    """Arrow-Schema des Exports: Texte als string, Ebene als int64, Beträge als float64"""
+    import pyarrow as pa
+    fields = [pa.field("Auftrag", pa.string(), nullable=False), pa.field("Zeilenart", pa.string(), nullable=False),
+              pa.field("Position", pa.string()), pa.field("Teil-ID", pa.string()), pa.field("Ebene", pa.int64())]
+    fields.extend(pa.field(name, pa.float64()) for name in COLUMNS[2:])
+    return pa.schema(fields)
+
+
+def select_orders(auftrag_nrs: List[str], von: Optional[str] = None, bis: Optional[str] = None) -> List[str]:
+    """Sortierte Auftragsnummern im Bereich [von, bis]"""
+    return [a for a in sorted(auftrag_nrs) if (von is None or a >= von) and (bis is None or a <= bis)]
+
+
+def iter_structures(auftrag_nrs: List[str], model: Optional[CostModel] = None) -> Iterator[pd.DataFrame]:
+    """Kostenstruktur je Auftrag mit Auftrag, Zeilenart und Teil-ID (nur bei Positionen)"""
+    if model is None:
+        model = CostModel.load()
+    for auftrag_nr in auftrag_nrs:
+        df = calc_full_cost_structure(auftrag_nr, model=model)
+        # Erste Zeile ist der Auftragskopf, letzte die GESAMT-Zeile (with_summary_rows)
+        zeilenart = np.full(len(df), POSITION, dtype=object)
+        zeilenart[0], zeilenart[-1] = KOPF, SUMME
+        teil_id = df["Position"].str.removeprefix("Teil ").where(zeilenart == POSITION)
+        df.insert(0, "Auftrag", auftrag_nr)
+        df.insert(1, "Zeilenart", zeilenart)
+        df.insert(3, "Teil-ID", teil_id)
+        yield df
+
+
+def iter_batches(auftrag_nrs: List[str], model: Optional[CostModel] = None,
+                 batch_rows: int = BATCH_ROWS) -> Iterator[Tuple[List[str], pd.DataFrame]]:
+    """Fasst ganze Aufträge zu Blöcken von etwa ``batch_rows`` Zeilen zusammen"""
+    orders, frames, rows = [], [], 0
+    for df in iter_structures(auftrag_nrs, model):
+        orders.append(df["Auftrag"].iat[0])
+        frames.append(df)
+        rows += len(df)
+        if rows >= batch_rows:
+            yield orders, pd.concat(frames, ignore_index=True)
+            orders, frames, rows = [], [], 0
+    if frames:
+        yield orders, pd.concat(frames, ignore_index=True)
+
+
+def iter_record_batches(auftrag_nrs: List[str], model: Optional[CostModel] = None,
+                        batch_rows: int = BATCH_ROWS):
+    """Wie iter_batches, aber als pyarrow.RecordBatch mit festem Schema"""
+    import pyarrow as pa
+    schema = arrow_schema()
+    for _, df in iter_batches(auftrag_nrs, model, batch_rows):
+        yield from pa.Table.from_pandas(df, schema=schema, preserve_index=False).to_batches()
+
+
+def read_manifest(out_dir: str) -> List[Dict]:
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+
+def _write_parquet(df: pd.DataFrame, path: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pandas(df, schema=arrow_schema(), preserve_index=False)
+    pq.write_table(table, path)
+
+
+def _write_csv(df: pd.DataFrame, path: str):
+    df.to_csv(path, index=False)
+
+
+WRITERS = {"parquet": _write_parquet, "csv": _write_csv}
+
+
+def export(out_dir: str, fmt: str = "parquet", auftrag_nrs: Optional[List[str]] = None,
+           model: Optional[CostModel] = None, batch_rows: int = BATCH_ROWS, resume: bool = False,
+           progress: bool = True) -> Dict:
+    """Schreibt die Kostenstrukturen blockweise; liefert Anzahl Dateien, Aufträge und Zeilen"""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unbekanntes Format '{fmt}' (erlaubt: {', '.join(WRITERS)})")
+    os.makedirs(out_dir, exist_ok=True)
+
+    entries = read_manifest(out_dir)
+    if not resume:
+        # Neuer Export: Dateien des vorherigen Laufs entfernen
+        for entry in entries:
+            path = os.path.join(out_dir, entry["datei"])
+            if os.path.exists(path):
+                os.remove(path)
+        if os.path.exists(os.path.join(out_dir, MANIFEST)):
+            os.remove(os.path.join(out_dir, MANIFEST))
+        entries = []
+    done: Set[str] = {a for e in entries for a in e["auftraege"]}
+    # Reste eines abgebrochenen Laufs entfernen
+    for name in os.listdir(out_dir):
+        if name.startswith("_") and name.endswith(".tmp"):
+            os.remove(os.path.join(out_dir, name))
+
+    if auftrag_nrs is None:
+        auftrag_nrs = get_all_auftrag_ids()
+    todo = [a for a in sorted(auftrag_nrs) if a not in done]
+
+    write = WRITERS[fmt]
+    part = max((e["teil"] for e in entries), default=-1) + 1
+    stats = {"dateien": 0, "auftraege": 0, "zeilen": 0}
+    start = time.perf_counter()
+
+    with open(os.path.join(out_dir, MANIFEST), "a", encoding="utf-8") as manifest:
+        for orders, df in iter_batches(todo, model, batch_rows):
+            name = f"teil-{part:05d}.{fmt}"
+            # Führender Unterstrich: Parquet-Leser ignorieren unfertige Dateien
+            tmp = os.path.join(out_dir, f"_{name}.tmp")
+            write(df, tmp)
+            # Erst die vollständige Datei sichtbar machen, dann im Manifest eintragen
+            os.replace(tmp, os.path.join(out_dir, name))
+            manifest.write(json.dumps({"teil": part, "datei": name, "auftraege": orders, "zeilen": len(df)},
+                                      ensure_ascii=False) + "\n")
+            manifest.flush()
+
+            part += 1
+            stats["dateien"] += 1
+            stats["auftraege"] += len(orders)
+            stats["zeilen"] += len(df)
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(f"\r   {stats['auftraege']}/{len(todo)} Aufträge, {stats['zeilen']} Zeilen "
+                      f"({stats['zeilen'] / elapsed:.0f} Zeilen/s)", end="", flush=True)
+
+    stats["uebersprungen"] = len(auftrag_nrs) - len(todo)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="parquet")
+    parser.add_argument("--von", help="erste Auftragsnummer (einschließlich)")
+    parser.add_argument("--bis", help="letzte Auftragsnummer (einschließlich)")
+    parser.add_argument("--zeilen", type=int, default=BATCH_ROWS, help="Zeilen je Datei (ungefähr)")
+    parser.add_argument("--fortsetzen", action="store_true", help="bereits exportierte Aufträge überspringen")
+    args = parser.parse_args()
+
+    model = CostModel.load()
+    auftrag_nrs = select_orders(get_all_auftrag_ids(), args.von, args.bis)
+    stats = export(args.out_dir, args.format, auftrag_nrs, model, args.zeilen, args.fortsetzen)
+    print(f"\n✅ {stats['auftraege']} Aufträge in {stats['dateien']} Dateien ({stats['zeilen']} Zeilen) "
+          f"exportiert, {stats['uebersprungen']} übersprungen.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# scripts/gozinto.py
+"""Gozinto-Rechnung: Stückliste als Direktbedarfsmatrix N.
+
+N[i, j] ist die Anzahl von Teil j, die direkt in eine Einheit von Teil i
+eingeht. Die über alle Ebenen aufsummierten Stückkosten r lösen
+(I − N) r = d mit den direkten Stückkosten d, der Gesamtbedarf X der
+Aufträge erfüllt X (I − N) = A mit dem Direktbedarf A der Aufträge.
+Bei zyklenfreier Stückliste ist N nilpotent, (I − N)⁻¹ = I + N + N² + …
+bricht also nach (Stücklistentiefe) Schritten exakt ab.
+"""
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu
+from .cost_model import BomArrays, FGK_SATZ, MGK_SATZ
+from .rollup import CycleError
+
+
+def find_cycles(arrays: BomArrays) -> List[List[str]]:
+    """Alle Zyklen über die Elternverweise, je Zyklus die Teil-IDs in Pfadreihenfolge"""
+    n = len(arrays.teil_ids)
+    up = arrays.parent.copy()
+    for _ in range(max(1, int(np.ceil(np.log2(n + 1)))) + 1):
+        active = np.flatnonzero(up >= 0)
+        if not len(active):
+            return []
+        up[active] = up[up[active]]
+
+    # Nur Teile, deren Vorgängerkette nie endet, können auf einem Zyklus liegen
+    cycles = []
+    done = set()
+    for start in np.flatnonzero(up >= 0).tolist():
+        path = []
+        seen = {}
+        node = start
+        while node >= 0 and node not in done and node not in seen:
+            seen[node] = len(path)
+            path.append(node)
+            node = int(arrays.parent[node])
+        if node >= 0 and node in seen:
+            cycles.append(arrays.teil_ids[path[seen[node]:]].tolist())
+        done.update(path)
+    return cycles
+
+
+class GozintoSolver:
+    """Löst Stückkosten und Gesamtbedarfe aller Teile und Aufträge über dünnbesetzte Matrizen"""
+
+    def __init__(self, arrays: BomArrays):
+        cycles = find_cycles(arrays)
+        if cycles:
+            raise CycleError(cycles[0])
+
+        self.arrays = arrays
+        n = len(arrays.teil_ids)
+        child = np.flatnonzero(arrays.parent >= 0)
+        self.N = sparse.csr_matrix((arrays.anzahl[child], (arrays.parent[child], child)), shape=(n, n))
+        self._lu = None
+
+        # Material je Teil als Indikatormatrix Teile × Materialien
+        has_mat = np.flatnonzero(arrays.teil_mat >= 0)
+        self.M = sparse.csr_matrix((np.ones(len(has_mat)), (has_mat, arrays.teil_mat[has_mat])),
+                                   shape=(n, len(arrays.material_ids)))
+
+        # Maschinenstunden je Stück als Matrix Teile × Maschinen
+        valid_op = (arrays.op_teil >= 0) & (arrays.op_maschine >= 0)
+        self.T = sparse.csr_matrix((arrays.op_dauer[valid_op] / 60,
+                                    (arrays.op_teil[valid_op], arrays.op_maschine[valid_op])),
+                                   shape=(n, len(arrays.maschine_ids)))
+
+    def unit_costs(self) -> Dict[str, np.ndarray]:
+        """Aufgerollte Stückkosten je Teil (Material bzw. Fertigung inkl. Gemeinkosten)"""
+        n = len(self.arrays.teil_ids)
+        if not n:
+            empty = np.zeros(0)
+            return {"mat_gesamt": empty, "fert_gesamt": empty, "total": empty}
+        if self._lu is None:
+            self._lu = splu((sparse.identity(n, format="csc") - self.N.tocsc()).tocsc())
+
+        direct = np.column_stack([self.arrays.mat_einzel * (1 + MGK_SATZ), self.arrays.fert_einzel * (1 + FGK_SATZ)])
+        rolled = self._lu.solve(direct)
+        return {"mat_gesamt": rolled[:, 0], "fert_gesamt": rolled[:, 1], "total": rolled.sum(axis=1)}
+
+    def order_demand(self, order_ids: Optional[List[str]] = None) -> Tuple[np.ndarray, sparse.csr_matrix]:
+        """Direktbedarf A der Aufträge (Aufträge × Teile)"""
+        order_ids, root_parts, root_orders = self.arrays.order_roots(order_ids)
+        A = sparse.csr_matrix((self.arrays.anzahl[root_parts], (root_orders, root_parts)),
+                              shape=(len(order_ids), len(self.arrays.teil_ids)))
+        return order_ids, A
+
+    def total_requirements(self, order_ids: Optional[List[str]] = None) -> Tuple[np.ndarray, sparse.csr_matrix]:
+        """Gesamtbedarf X = A (I − N)⁻¹ aller Teile je Auftrag"""
+        order_ids, A = self.order_demand(order_ids)
+        X = A.copy()
+        step = A
+        while step.nnz:
+            step = step @ self.N
+            X = X + step
+        return order_ids, X.tocsr()
+
+    def material_requirements(self, order_ids: Optional[List[str]] = None
+                              ) -> Tuple[np.ndarray, np.ndarray, sparse.csr_matrix]:
+        """Materialbedarf (Mengen) je Auftrag und Material.Nr"""
+        order_ids, X = self.total_requirements(order_ids)
+        return order_ids, self.arrays.material_ids, (X @ self.M).tocsr()
+
+    def machine_hours(self, order_ids: Optional[List[str]] = None
+                      ) -> Tuple[np.ndarray, np.ndarray, sparse.csr_matrix]:
+        """Maschinenstunden je Auftrag und Maschine.Nr"""
+        order_ids, X = self.total_requirements(order_ids)
+        return order_ids, self.arrays.maschine_ids, (X @ self.T).tocsr()
@@ -0,0 +1,125 @@
+# scripts/instrumentation.py
+"""Messpunkte für die Kalkulation: Laufzeit, SQL-Anweisungen, gelesene Zeilen,
+Rekursionstiefe und Anzahl Knoten je Aufruf.
+
+Eingeschaltet über ``KOSTCALC_PROFILE=1`` (optional ``KOSTCALC_PROFILE_LOG``
+für ein JSON-Lines-Protokoll) oder zur Laufzeit mit enable(). Ausgeschaltet
+kostet ein dekorierter Aufruf nur eine zusätzliche Abfrage eines Flags.
+"""
+import functools
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from .config import settings
+from .database import engine
+
+_enabled = settings["profile"]
+_log_path: Optional[str] = settings["profile_log"]
+_local = threading.local()
+_lock = threading.Lock()
+_totals: Dict[str, Dict] = defaultdict(lambda: {
+    "calls": 0, "seconds": 0.0, "max_seconds": 0.0, "statements": 0, "rows": 0, "max_depth": 0, "nodes": 0
+})
+
+
+def enable(log_path: Optional[str] = None):
+    global _enabled, _log_path
+    _enabled = True
+    if log_path is not None:
+        _log_path = log_path
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _frames() -> List[Dict]:
+    frames = getattr(_local, "frames", None)
+    if frames is None:
+        frames = _local.frames = []
+    return frames
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if _enabled:
+        for frame in _frames():
+            frame["statements"] += 1
+
+
+def note(rows: int = 0, depth: int = 0, nodes: int = 0):
+    """Ergänzt den laufenden Messpunkt um gelesene Zeilen, Tiefe und Knoten"""
+    if not _enabled:
+        return
+    for frame in _frames():
+        frame["rows"] += rows
+        frame["nodes"] += nodes
+        frame["max_depth"] = max(frame["max_depth"], depth)
+
+
+def instrumented(fn):
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return fn(*args, **kwargs)
+
+        frames = _frames()
+        frame = {"statements": 0, "rows": 0, "max_depth": 0, "nodes": 0}
+        frames.append(frame)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            frames.pop()
+            _record(name, seconds, frame)
+
+    return wrapper
+
+
+def _record(name: str, seconds: float, frame: Dict):
+    with _lock:
+        totals = _totals[name]
+        totals["calls"] += 1
+        totals["seconds"] += seconds
+        totals["max_seconds"] = max(totals["max_seconds"], seconds)
+        totals["statements"] += frame["statements"]
+        totals["rows"] += frame["rows"]
+        totals["nodes"] += frame["nodes"]
+        totals["max_depth"] = max(totals["max_depth"], frame["max_depth"])
+
+        if _log_path:
+            with open(_log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ts": time.time(), "function": name, "seconds": seconds, **frame}) + "\n")
+
+
+def report() -> List[Dict]:
+    """Je Funktion aufsummierte Messwerte, nach Gesamtzeit absteigend"""
+    with _lock:
+        rows = [{
+            "function": name,
+            "calls": t["calls"],
+            "total_ms": t["seconds"] * 1000,
+            "mean_ms": t["seconds"] * 1000 / t["calls"],
+            "max_ms": t["max_seconds"] * 1000,
+            "statements": t["statements"],
+            "rows": t["rows"],
+            "max_depth": t["max_depth"],
+            "nodes": t["nodes"],
+        } for name, t in _totals.items() if t["calls"]]
+    return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+
+def reset():
+    with _lock:
+        _totals.clear()
@@ -0,0 +1,143 @@
+# scripts/loadtest.py
+"""Lasttest für den Kalkulationsdienst (siehe service.py).
+
+Mehrere Client-Threads rufen über dauerhafte HTTP/1.1-Verbindungen
+zufällige Aufträge ab und messen Durchsatz, Latenzen und Antwortcodes
+(503 = von der Warteschlange abgewiesen). Mit ``--intern`` wird der Dienst
+im selben Prozess auf einem freien Port gestartet, z. B. gegen SQLite:
+
+    KOSTCALC_DB_URL=sqlite:///data/kostcalc.db python -m scripts.loadtest --intern --clients 32
+
+Aufruf: python -m scripts.loadtest [--url http://127.0.0.1:8502] [--clients 16] [--dauer 10]
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from urllib.parse import quote, urlsplit
+import numpy as np
+from .config import settings
+
+ENDPOINTS = {
+    "kosten": "/auftraege/{nr}/kosten",
+    "struktur": "/auftraege/{nr}/struktur",
+    "maschinen": "/maschinen/kosten?auftrag={nr}",
+}
+
+
+def _get(conn: http.client.HTTPConnection, path: str):
+    conn.request("GET", path)
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def run(url: str, clients: int = 16, duration: float = 10.0, endpoints: Optional[List[str]] = None,
+        orders: Optional[List[str]] = None, seed: int = 0) -> Dict:
+    """Lässt ``clients`` Threads ``duration`` Sekunden lang Anfragen stellen"""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    endpoints = endpoints or ["kosten"]
+
+    if orders is None:
+        conn = http.client.HTTPConnection(host, port, timeout=60)
+        status, body = _get(conn, "/auftraege")
+        conn.close()
+        if status != 200:
+            raise RuntimeError(f"/auftraege lieferte {status}: {body[:200]!r}")
+        orders = json.loads(body)
+    if not orders:
+        raise RuntimeError("Keine Aufträge vorhanden")
+
+    latencies: List[List[float]] = [[] for _ in range(clients)]
+    statuses: List[Counter] = [Counter() for _ in range(clients)]
+    stop = time.perf_counter() + duration
+
+    def client(i: int):
+        rng = random.Random(seed + i)
+        conn = http.client.HTTPConnection(host, port, timeout=60)
+        while time.perf_counter() < stop:
+            path = ENDPOINTS[rng.choice(endpoints)].format(nr=quote(rng.choice(orders)))
+            start = time.perf_counter()
+            try:
+                status, _ = _get(conn, path)
+            except (OSError, http.client.HTTPException):
+                status = 0
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=60)
+            latencies[i].append(time.perf_counter() - start)
+            statuses[i][status] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    lat_ms = np.concatenate([np.array(l) for l in latencies]) * 1000
+    counts = sum(statuses, Counter())
+    return {
+        "requests": len(lat_ms),
+        "seconds": elapsed,
+        "requests_per_second": len(lat_ms) / elapsed if elapsed else 0.0,
+        "status": dict(sorted(counts.items())),
+        "latency_ms": {
+            f"p{p}": float(np.percentile(lat_ms, p)) if len(lat_ms) else 0.0 for p in (50, 90, 99)
+        } | {"max": float(lat_ms.max()) if len(lat_ms) else 0.0}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=f"http://{settings['service_host']}:{settings['service_port']}")
+    parser.add_argument("--clients", type=int, default=16, help="gleichzeitige Client-Threads")
+    parser.add_argument("--dauer", type=float, default=10.0, help="Sekunden")
+    parser.add_argument("--endpunkte", default="kosten",
+                        help=f"kommagetrennt aus {', '.join(ENDPOINTS)}")
+    parser.add_argument("--intern", action="store_true", help="Dienst im selben Prozess starten")
+    parser.add_argument("--workers", type=int, default=settings["service_workers"], help="nur mit --intern")
+    parser.add_argument("--queue", type=int, default=settings["service_queue"], help="nur mit --intern")
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpunkte.split(",") if e.strip()]
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown:
+        parser.error(f"Unbekannte Endpunkte: {', '.join(unknown)}")
+
+    server = service = None
+    url = args.url
+    if args.intern:
+        from .embedded import startup
+        from .service import CostService, make_server
+        startup()
+        service = CostService(args.workers, args.queue, settings["service_timeout"])
+        print("📥 Lade Stammdaten...")
+        service.holder.current()
+        server = make_server("127.0.0.1", 0, service)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"🚀 {args.clients} Clients, {args.dauer:g} s gegen {url} ({', '.join(endpoints)})...")
+    try:
+        stats = run(url, args.clients, args.dauer, endpoints)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            service.pool.shutdown()
+
+    lat = stats["latency_ms"]
+    print(f"✅ {stats['requests']} Anfragen in {stats['seconds']:.2f} s ({stats['requests_per_second']:.1f} /s), "
+          f"Antwortcodes: {', '.join(f'{k}: {v}' for k, v in stats['status'].items())}")
+    print(f"⏱️ Latenz: p50 {lat['p50']:.2f} ms, p90 {lat['p90']:.2f} ms, "
+          f"p99 {lat['p99']:.2f} ms, max {lat['max']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
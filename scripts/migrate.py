@@ -0,0 +1,37 @@
+# scripts/migrate.py
+"""Legt fehlende Tabellen, Spalten und Indizes in einer bestehenden Datenbank an, ohne Daten zu löschen."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+from scripts.database import Base, engine
+from scripts import models
+
+
+def add_missing_columns():
+    """Ergänzt Spalten, die im Modell neu hinzugekommen sind (z. B. teil.knoten_norm)"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    print(f"🛠️ Spalte {column.name} in {table.name}...")
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+
+def main():
+    Base.metadata.create_all(engine)
+    add_missing_columns()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            print(f"🛠️ Index {index.name} auf {table.name}...")
+            index.create(engine, checkfirst=True)
+    print("✅ Migration abgeschlossen.")
+
+
+if __name__ == "__main__":
+    main()
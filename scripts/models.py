@@ -1,9 +1,30 @@
 from sqlalchemy import (
-    Column, String, Float, ForeignKey
+    Column, Computed, String, Float, Integer, ForeignKey
 )
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
 from .database import Base
 
+def knoten_sql(column: str = "knoten") -> str:
+    """SQL-Ausdruck wie utils.normalize_knoten: Ziffernfolgen auf 7 Stellen, sonst Großbuchstaben.
+
+    Nur Funktionen, die SQLite, Postgres und DuckDB gleich kennen.
+    """
+    k = f"TRIM({column})"
+    return (f"CASE WHEN {k} <> '' AND LTRIM({k}, '0123456789') = '' AND LENGTH({k}) < 7 "
+            f"THEN SUBSTR('0000000' || {k}, LENGTH({k}) + 1) "
+            f"WHEN {k} <> '' AND LTRIM({k}, '0123456789') = '' THEN {k} "
+            f"ELSE UPPER({k}) END")
+
+
+@compiles(Computed, "duckdb")
+def _computed_duckdb(computed, compiler, **kw):
+    # DuckDB kennt nur virtuelle berechnete Spalten, der Postgres-Dialekt darunter schreibt STORED
+    return "GENERATED ALWAYS AS (%s) VIRTUAL" % compiler.sql_compiler.process(
+        computed.sqltext, include_table=False, literal_binds=True
+    )
+
+
 class Auftrag(Base):
     __tablename__ = 'auftrag'
     auftrag_nr = Column('auftrag_nr', String, primary_key=True)
@@ -26,7 +47,9 @@ class Teil(Base):
     __tablename__ = 'teil'
     teil_id = Column('teil_id', String, primary_key=True)
     teil_nr = Column('teil_nr', String)
-    knoten  = Column('knoten', String)
+    knoten  = Column('knoten', String, index=True)
+    # Von der Datenbank berechnet, damit SQL-Abfragen wie normalize_knoten vergleichen
+    knoten_norm = Column('knoten_norm', String, Computed(knoten_sql()), index=True)
     k_mat   = Column('K_mat', Float)
     k_fert  = Column('K_fert', Float)
     anzahl  = Column('Anzahl', Float)
@@ -41,9 +64,17 @@ class Arbeitsplan(Base):
 
     teil_id  = Column('teil_id', String, ForeignKey('teil.teil_id'), primary_key=True)
     ag_nr    = Column('ag_nr', String, primary_key=True)
-    maschine = Column('maschine', String, ForeignKey('maschine.Nr'))
+    maschine = Column('maschine', String, ForeignKey('maschine.Nr'), index=True)
     dauer    = Column('dauer (min)', Float)
 
     # Связь обратно на Teil
     teil = relationship("Teil", back_populates="arbeitsplaene", lazy="joined")
 
+
+class Datenstand(Base):
+    """Versionszähler der Stammdaten, wird bei jeder Änderung erhöht"""
+    __tablename__ = 'datenstand'
+
+    # Immer genau eine Zeile mit id 1, daher ohne Autoinkrement (DuckDB kennt kein SERIAL)
+    id      = Column('id', Integer, primary_key=True, autoincrement=False)
+    version = Column('version', Integer, nullable=False)
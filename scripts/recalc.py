@@ -0,0 +1,214 @@
+# scripts/recalc.py
+"""Inkrementelle Neuberechnung der gespeicherten Kosten (K_mat, K_fert, dat_kost).
+
+Nach einer Änderung werden nur die betroffenen Teile und deren Vorgänger
+neu berechnet und zusammen mit den Aufträgen in einer Transaktion
+zurückgeschrieben. K_mat bzw. K_fert enthalten die Material- bzw.
+Fertigungskosten pro Stück über den ganzen Teilbaum, jeweils inklusive
+Gemeinkosten.
+
+Geladen werden dafür nur die betroffenen Teile mit ihren Vorgängern und die
+gespeicherten K_mat/K_fert der unveränderten direkten Kinder. Fehlen dort
+gespeicherte Kosten (z. B. nach einem Import), wird alles neu berechnet.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import bindparam, update
+from .cost_model import ArbeitsplanRow, CostModel, MaschineRow, MaterialRow, TeilRow
+from .database import Session
+from .models import Arbeitsplan, Auftrag, Maschine, Material, Teil
+from .rollup import CostRollup
+from .utils import normalize_id, normalize_knoten
+
+# Höchstens so viele Werte je IN-Liste (ältere SQLite-Versionen erlauben 999 Parameter)
+IN_CHUNK = 900
+
+
+def affected(model: CostModel, teil_ids: Iterable[str] = (), materialien: Iterable[str] = (),
+             maschinen: Iterable[str] = ()) -> Tuple[Set[str], Set[str]]:
+    """Betroffene Teile (inkl. aller Vorgänger) und Auftragsknoten einer Änderung"""
+    materialien = set(materialien)
+    maschinen = set(maschinen)
+
+    dirty = {normalize_id(t) for t in teil_ids if normalize_id(t) in model.teile}
+    if materialien:
+        dirty.update(t.teil_id for t in model.teile.values() if t.mat in materialien)
+    if maschinen:
+        dirty.update(teil_id for teil_id, ops in model.arbeitsplaene.items()
+                     if teil_id in model.teile and any(op.maschine in maschinen for op in ops))
+
+    teile = set()
+    knoten = set()
+    for teil_id in dirty:
+        while teil_id in model.teile and teil_id not in teile:
+            teile.add(teil_id)
+            parent = model.teile[teil_id].knoten
+            parent = normalize_knoten(parent) if parent else None
+            if parent and parent not in model.teile:
+                knoten.add(parent)
+            teil_id = parent
+    return teile, knoten
+
+
+def _rows_in(query, column, values) -> List:
+    """Zeilen der Abfrage mit ``column IN values``, in Blöcken abgefragt"""
+    values = sorted(set(values))
+    rows = []
+    for start in range(0, len(values), IN_CHUNK):
+        rows.extend(query.filter(column.in_(values[start:start + IN_CHUNK])).all())
+    return rows
+
+
+def load_affected(session: Session, teil_ids: Iterable[str] = (), materialien: Iterable[str] = (),
+                  maschinen: Iterable[str] = (),
+                  auftraege: Iterable[str] = ()) -> Optional[Tuple[CostModel, Dict[str, Tuple[float, float]]]]:
+    """Teilmodell für eine Änderung und gespeicherte Kosten (K_mat, K_fert) der unveränderten Kinder.
+
+    Das Modell enthält die geänderten Teile mit allen Vorgängern, deren direkte
+    Kinder sowie die Positionen der betroffenen Aufträge. None, wenn für ein
+    unverändertes Kind keine Kosten gespeichert sind.
+    """
+    teil_columns = (Teil.teil_id, Teil.teil_nr, Teil.knoten, Teil.anzahl, Teil.mat)
+
+    dirty = {normalize_id(t) for t in teil_ids}
+    if materialien:
+        dirty.update(r[0] for r in _rows_in(session.query(Teil.teil_id), Teil.mat, materialien))
+    if maschinen:
+        dirty.update(r[0] for r in _rows_in(session.query(Arbeitsplan.teil_id), Arbeitsplan.maschine, maschinen))
+
+    # Vorgänger ebenenweise nachladen; Verweise, die auf kein Teil zeigen, sind Aufträge
+    teile: Dict[str, TeilRow] = {}
+    knoten = {normalize_knoten(a) for a in auftraege}
+    frontier = dirty
+    while frontier:
+        found = [TeilRow(*r) for r in _rows_in(session.query(*teil_columns), Teil.teil_id, frontier)]
+        knoten.update(frontier - dirty - {t.teil_id for t in found})
+        teile.update((t.teil_id, t) for t in found)
+        frontier = {normalize_knoten(t.knoten) for t in found if t.knoten} - teile.keys()
+
+    stored: Dict[str, Tuple[float, float]] = {}
+    children = []
+    for *row, k_mat, k_fert in _rows_in(session.query(*teil_columns, Teil.k_mat, Teil.k_fert),
+                                        Teil.knoten_norm, teile.keys() | knoten):
+        child = TeilRow(*row)
+        if child.teil_id in teile:
+            continue
+        if k_mat is None or k_fert is None:
+            return None
+        children.append(child)
+        stored[child.teil_id] = (k_mat, k_fert)
+
+    arbeitsplaene = [ArbeitsplanRow(*r) for r in _rows_in(
+        session.query(Arbeitsplan.teil_id, Arbeitsplan.ag_nr, Arbeitsplan.maschine, Arbeitsplan.dauer)
+        .order_by(Arbeitsplan.teil_id, Arbeitsplan.ag_nr), Arbeitsplan.teil_id, teile)]
+    maschinen_rows = [MaschineRow(*r) for r in _rows_in(
+        session.query(Maschine.nr, Maschine.bezeichnung, Maschine.ks), Maschine.nr,
+        {op.maschine for op in arbeitsplaene if op.maschine})]
+    material_rows = [MaterialRow(*r) for r in _rows_in(
+        session.query(Material.nr, Material.kost), Material.nr, {t.mat for t in teile.values() if t.mat})]
+
+    model = CostModel(list(teile.values()) + children, arbeitsplaene, maschinen_rows, material_rows)
+    return model, stored
+
+
+def recalc(session: Session, teil_ids: Iterable[str] = (), materialien: Iterable[str] = (),
+           maschinen: Iterable[str] = (), auftraege: Iterable[str] = (),
+           model: Optional[CostModel] = None) -> Dict[str, int]:
+    """Berechnet die betroffenen Teile und Aufträge neu und schreibt sie zurück.
+
+    Ohne ``model`` wird nur der betroffene Ausschnitt geladen (load_affected).
+    Die Änderungen werden in der übergebenen Session ausgeführt, committen
+    muss der Aufrufer.
+    """
+    stored = {}
+    if model is None:
+        session.flush()
+        partial = load_affected(session, teil_ids, materialien, maschinen, auftraege)
+        if partial is None:
+            return recalc_all(session)
+        model, stored = partial
+
+    teile, knoten = affected(model, teil_ids, materialien, maschinen)
+    knoten.update(auftraege)
+
+    rollup = CostRollup(model)
+    for teil_id, (k_mat, k_fert) in stored.items():
+        rollup.preset(teil_id, k_mat, k_fert)
+    rollup.compute(sorted(teile))
+    stand = datetime.now().isoformat(sep=" ", timespec="seconds")
+
+    teil_rows = []
+    for teil_id in teile:
+        unit = rollup.unit(teil_id)
+        teil_rows.append({"b_id": teil_id, "b_mat": unit["mat_gesamt"], "b_fert": unit["fert_gesamt"]})
+
+    auftrag_rows = []
+    for auftrag_nr in knoten:
+        k_mat = 0.0
+        k_fert = 0.0
+        for teil in model.by_knoten.get(normalize_knoten(auftrag_nr), []):
+            unit = rollup.unit(teil.teil_id)
+            k_mat += (teil.anzahl or 1) * unit["mat_gesamt"]
+            k_fert += (teil.anzahl or 1) * unit["fert_gesamt"]
+        auftrag_rows.append({"b_id": auftrag_nr, "b_mat": k_mat, "b_fert": k_fert, "b_dat": stand})
+
+    teil_table = Teil.__table__
+    auftrag_table = Auftrag.__table__
+    conn = session.connection()
+    if teil_rows:
+        conn.execute(
+            update(teil_table)
+            .where(teil_table.c.teil_id == bindparam("b_id"))
+            .values({teil_table.c.K_mat: bindparam("b_mat"), teil_table.c.K_fert: bindparam("b_fert")}),
+            teil_rows
+        )
+    if auftrag_rows:
+        conn.execute(
+            update(auftrag_table)
+            .where(auftrag_table.c.auftrag_nr == bindparam("b_id"))
+            .values({auftrag_table.c.K_mat: bindparam("b_mat"), auftrag_table.c.K_fert: bindparam("b_fert"),
+                     auftrag_table.c.dat_kost: bindparam("b_dat")}),
+            auftrag_rows
+        )
+    session.expire_all()
+
+    return {"teile": len(teil_rows), "auftraege": len(auftrag_rows)}
+
+
+def recalc_all(session: Session) -> Dict[str, int]:
+    model = CostModel.load(session)
+    auftraege = [r[0] for r in session.query(Auftrag.auftrag_nr).all()]
+    return recalc(session, teil_ids=list(model.teile), auftraege=auftraege, model=model)
+
+
+def stored_order_cost(auftrag_nr: str) -> Optional[Dict]:
+    """Gespeicherte Auftragskosten, ohne die Stückliste aufzulösen"""
+    session = Session()
+    try:
+        auftrag = session.get(Auftrag, auftrag_nr)
+        if auftrag is None or auftrag.dat_kost is None:
+            return None
+        return {
+            "auftrag_nr": auftrag.auftrag_nr,
+            "k_mat": auftrag.k_mat or 0.0,
+            "k_fert": auftrag.k_fert or 0.0,
+            "order_total": (auftrag.k_mat or 0.0) + (auftrag.k_fert or 0.0),
+            "dat_kost": auftrag.dat_kost
+        }
+    finally:
+        session.close()
+
+
+def main():
+    session = Session()
+    try:
+        print("🔄 Berechne alle Kosten neu...")
+        counts = recalc_all(session)
+        session.commit()
+        print(f"✅ {counts['teile']} Teile und {counts['auftraege']} Aufträge aktualisiert.")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
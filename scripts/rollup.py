@@ -0,0 +1,305 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .cost_model import BomArrays, CostModel, FGK_SATZ, MGK_SATZ, TeilRow
+from .instrumentation import note
+from .utils import normalize_id, normalize_knoten
+
+
+class CycleError(ValueError):
+    """Die Stückliste enthält einen Zyklus über die knoten-Spalte"""
+
+    def __init__(self, cycle: List[str]):
+        self.cycle = cycle
+        super().__init__("Zyklus in der Stückliste: " + " -> ".join(cycle))
+
+
+class CostRollup:
+    """Stückkosten je Teil, genau einmal und von unten nach oben berechnet.
+
+    Die Ergebnisse bleiben für die Lebensdauer des Objekts gespeichert, sodass
+    alle Aufträge und Positionen einer Anfrage dieselben Teilkosten nutzen.
+    """
+
+    def __init__(self, model: CostModel):
+        self.model = model
+        self._units: Dict[str, dict] = {}
+        self._structures: Dict[Tuple[str, int], List[dict]] = {}
+
+    def _children(self, teil_id: str):
+        return self.model.by_knoten.get(teil_id, [])
+
+    def order_parts(self, auftrag_nr: str) -> List[TeilRow]:
+        """Oberste Teile eines Auftrags"""
+        return self.model.by_knoten.get(normalize_knoten(auftrag_nr), [])
+
+    def _topological_order(self, roots: List[str]) -> List[str]:
+        """Noch nicht berechnete Teile unterhalb der Wurzeln, Kinder vor Eltern"""
+        order = []
+        max_depth = 0
+        state = {}  # 1 = in Bearbeitung, 2 = fertig
+        for root in roots:
+            if root in self._units or root in state:
+                continue
+            stack = [(root, iter(self._children(root)))]
+            state[root] = 1
+            max_depth = max(max_depth, 1)
+            while stack:
+                teil_id, children = stack[-1]
+                for child in children:
+                    child_id = child.teil_id
+                    if child_id in self._units or state.get(child_id) == 2:
+                        continue
+                    if state.get(child_id) == 1:
+                        path = [t for t, _ in stack]
+                        raise CycleError(path[path.index(child_id):] + [child_id])
+                    state[child_id] = 1
+                    stack.append((child_id, iter(self._children(child_id))))
+                    max_depth = max(max_depth, len(stack))
+                    break
+                else:
+                    stack.pop()
+                    state[teil_id] = 2
+                    order.append(teil_id)
+        note(depth=max_depth, nodes=len(order))
+        return order
+
+    def _compute(self, teil_id: str) -> dict:
+        model = self.model
+        teil = model.teile[teil_id]
+
+        direct_mat = model.material_kost(teil)
+        mgk = direct_mat * MGK_SATZ
+        direct_fert = model.fert_kost(teil_id)
+        fgk = direct_fert * FGK_SATZ
+
+        children_cost = 0.0
+        children_mat = 0.0
+        children_fert = 0.0
+        for child in self._children(teil_id):
+            anzahl = child.anzahl or 1
+            child_unit = self._units[child.teil_id]
+            children_cost += anzahl * child_unit["total"]
+            children_mat += anzahl * child_unit["mat_gesamt"]
+            children_fert += anzahl * child_unit["fert_gesamt"]
+
+        return {
+            "teil_id": teil.teil_id,
+            "teil_nr": teil.teil_nr,
+            "k_mat": direct_mat,
+            "mgk": mgk,
+            "k_fert": direct_fert,
+            "fgk": fgk,
+            "children_cost": children_cost,
+            "total": direct_mat + mgk + direct_fert + fgk + children_cost,
+            # Über den ganzen Teilbaum aufsummiert, jeweils inkl. Gemeinkosten
+            "mat_gesamt": direct_mat + mgk + children_mat,
+            "fert_gesamt": direct_fert + fgk + children_fert,
+        }
+
+    def compute(self, teil_ids: List[str]):
+        """Berechnet alle noch fehlenden Teile unterhalb der angegebenen Teile"""
+        roots = [t for t in teil_ids if t in self.model.teile]
+        for teil_id in self._topological_order(roots):
+            self._units[teil_id] = self._compute(teil_id)
+
+    def preset(self, teil_id: str, mat_gesamt: float, fert_gesamt: float):
+        """Übernimmt gespeicherte Kosten eines Teils, dessen Teilbaum nicht neu berechnet wird.
+
+        Vorgegebene Teile liefern nur mat_gesamt, fert_gesamt und total.
+        """
+        self._units[teil_id] = {"teil_id": teil_id, "mat_gesamt": mat_gesamt, "fert_gesamt": fert_gesamt,
+                                "total": mat_gesamt + fert_gesamt}
+
+    def compute_all(self):
+        self.compute(list(self.model.teile))
+
+    def unit(self, teil_id: str) -> Optional[dict]:
+        """Stückkosten eines Teils ohne Strukturbaum (None, wenn das Teil fehlt)"""
+        teil_id = normalize_id(teil_id)
+        if teil_id not in self._units:
+            self.compute([teil_id])
+        return self._units.get(teil_id)
+
+    def structure(self, teil_id: str, level: int = 0) -> List[dict]:
+        """Strukturbaum der Unterkomponenten wie in calc_cost.
+
+        Die Listen werden je (Teil, Ebene) zwischengespeichert und geteilt,
+        Aufrufer dürfen sie daher nicht verändern.
+        """
+        key = (teil_id, level)
+        if key in self._structures:
+            return self._structures[key]
+        # Erkennt Zyklen, bevor der Baum aufgebaut wird
+        self.compute([teil_id])
+
+        # Expliziter Stapel statt Rekursion: ein Knoten wird zweimal besucht,
+        # beim zweiten Mal sind die Strukturen aller Kinder fertig
+        stack = [(teil_id, level, False)]
+        while stack:
+            node, node_level, expanded = stack.pop()
+            if (node, node_level) in self._structures:
+                continue
+            children = self._children(node)
+            if not expanded:
+                stack.append((node, node_level, True))
+                stack.extend((c.teil_id, node_level + 1, False) for c in children
+                             if (c.teil_id, node_level + 1) not in self._structures)
+                continue
+
+            struct = []
+            for child in children:
+                unit = self._units[child.teil_id]
+                anzahl = child.anzahl or 1
+                struct.append({
+                    "teil_id": child.teil_id,
+                    "teil_nr": child.teil_nr,
+                    "anzahl": anzahl,
+                    "kosten_pro_stk": unit["total"],
+                    "kosten_gesamt": anzahl * unit["total"],
+                    "level": node_level + 1,
+                    "struktur": self._structures[(child.teil_id, node_level + 1)]
+                })
+            self._structures[(node, node_level)] = struct
+        return self._structures[key]
+
+    def cost(self, teil_id: str, level: int = 0) -> dict:
+        """Ergebnis im Format von calc_cost"""
+        teil_id = normalize_id(teil_id)
+        unit = self.unit(teil_id)
+        if unit is None:
+            return {
+                "teil_id": teil_id,
+                "total": 0,
+                "structure": [],
+                "level": level
+            }
+
+        return {
+            "teil_id": unit["teil_id"],
+            "teil_nr": unit["teil_nr"],
+            "level": level,
+            "k_mat": unit["k_mat"],
+            "mgk": unit["mgk"],
+            "k_fert": unit["k_fert"],
+            "fgk": unit["fgk"],
+            "children_cost": unit["children_cost"],
+            "total": unit["total"],
+            "structure": self.structure(teil_id, level)
+        }
+
+
+class ArrayRollup(CostRollup):
+    """CostRollup direkt auf einer BomArrays-Instanz (z. B. einem Snapshot).
+
+    Die Stückkosten aller Teile werden beim Anlegen ebenenweise mit NumPy
+    berechnet, ohne das Kostenmodell als Python-Objekte aufzubauen. Kinder
+    werden wie in CostRollup in Teil-Reihenfolge aufsummiert, die Ergebnisse
+    sind daher identisch. Teile auf einem Zyklus bleiben unberechnet und
+    lösen erst beim Abruf einen CycleError aus.
+    """
+
+    def __init__(self, arrays: BomArrays):
+        super().__init__(None)
+        self.arrays = arrays
+        self._ids = arrays.teil_ids.tolist()
+        self._index = {teil_id: i for i, teil_id in enumerate(self._ids)}
+        self._nr = arrays.teil_nr.tolist()
+        self._anzahl = arrays.anzahl.tolist()
+        self._child_rows: Dict[str, List[TeilRow]] = {}
+
+        n = len(self._ids)
+        k_mat = arrays.mat_einzel
+        mgk = k_mat * MGK_SATZ
+        k_fert = arrays.fert_einzel
+        fgk = k_fert * FGK_SATZ
+        children_cost = np.zeros(n)
+        total = np.zeros(n)
+        mat_gesamt = np.zeros(n)
+        fert_gesamt = np.zeros(n)
+        done = np.zeros(n, dtype=bool)
+
+        # Von den Blättern aufwärts: ein Teil ist bereit, sobald alle Kinder berechnet sind
+        child_ptr = arrays.child_ptr
+        counts = np.diff(child_ptr)
+        pending = counts.copy()
+        ready = np.flatnonzero(pending == 0)
+        while len(ready):
+            # Kinder aller bereiten Teile in Teil-Reihenfolge, je Elternteil fortlaufend summiert
+            sizes = counts[ready]
+            rows = arrays.child_order[np.repeat(child_ptr[ready] - np.cumsum(sizes) + sizes, sizes)
+                                      + np.arange(sizes.sum())]
+            owner = np.repeat(ready, sizes)
+            weight = arrays.anzahl[rows]
+            children_cost[ready] = np.bincount(owner, weights=weight * total[rows], minlength=n)[ready]
+            children_mat = np.bincount(owner, weights=weight * mat_gesamt[rows], minlength=n)[ready]
+            children_fert = np.bincount(owner, weights=weight * fert_gesamt[rows], minlength=n)[ready]
+
+            total[ready] = k_mat[ready] + mgk[ready] + k_fert[ready] + fgk[ready] + children_cost[ready]
+            mat_gesamt[ready] = k_mat[ready] + mgk[ready] + children_mat
+            fert_gesamt[ready] = k_fert[ready] + fgk[ready] + children_fert
+            done[ready] = True
+
+            parents = arrays.parent[ready]
+            parents = parents[parents >= 0]
+            pending -= np.bincount(parents, minlength=n)
+            parents = np.unique(parents)
+            ready = parents[pending[parents] == 0]
+
+        self._done = done
+        self._columns = [c.tolist() for c in (k_mat, mgk, k_fert, fgk, children_cost, total, mat_gesamt,
+                                              fert_gesamt)]
+
+    def _children(self, teil_id: str):
+        children = self._child_rows.get(teil_id)
+        if children is None:
+            i = self._index.get(teil_id)
+            if i is None:
+                return []
+            arrays = self.arrays
+            children = self._child_rows[teil_id] = [
+                TeilRow(self._ids[c], self._nr[c] or None, teil_id, self._anzahl[c], None)
+                for c in arrays.child_order[arrays.child_ptr[i]:arrays.child_ptr[i + 1]].tolist()
+            ]
+        return children
+
+    def order_parts(self, auftrag_nr: str) -> List[TeilRow]:
+        knoten = normalize_knoten(auftrag_nr)
+        return [TeilRow(self._ids[i], self._nr[i] or None, knoten, self._anzahl[i], None)
+                for i in self.arrays.roots(knoten).tolist()]
+
+    def _cycle(self, i: int) -> List[str]:
+        # Einziger Elternverweis je Teil: aufwärts laufen, bis sich ein Teil wiederholt
+        path = [i]
+        while self.arrays.parent[path[-1]] != i:
+            path.append(int(self.arrays.parent[path[-1]]))
+        return [self._ids[t] for t in [i] + path[:0:-1] + [i]]
+
+    def _compute(self, teil_id: str) -> dict:
+        i = self._index[teil_id]
+        k_mat, mgk, k_fert, fgk, children_cost, total, mat_gesamt, fert_gesamt = (c[i] for c in self._columns)
+        return {
+            "teil_id": teil_id,
+            "teil_nr": self._nr[i] or None,
+            "k_mat": k_mat,
+            "mgk": mgk,
+            "k_fert": k_fert,
+            "fgk": fgk,
+            "children_cost": children_cost,
+            "total": total,
+            "mat_gesamt": mat_gesamt,
+            "fert_gesamt": fert_gesamt,
+        }
+
+    def compute(self, teil_ids: List[str]):
+        """Übernimmt die vorab berechneten Teile unterhalb der angegebenen Teile"""
+        stack = [t for t in teil_ids if t in self._index and t not in self._units]
+        while stack:
+            teil_id = stack.pop()
+            i = self._index[teil_id]
+            if not self._done[i]:
+                raise CycleError(self._cycle(i))
+            self._units[teil_id] = self._compute(teil_id)
+            stack.extend(c.teil_id for c in self._children(teil_id) if c.teil_id not in self._units)
+
+    def compute_all(self):
+        """Alle Teile sind bereits beim Anlegen berechnet"""
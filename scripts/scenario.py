@@ -0,0 +1,195 @@
+# scripts/scenario.py
+"""Was-wäre-wenn-Rechnung für Preise und Gemeinkostenzuschläge.
+
+Die Kosten eines Auftrags sind linear in den Preisen:
+
+    Kosten = (1 + MGK) · Q p + (1 + FGK) · H k
+
+mit Materialmengen Q (Aufträge × Materialien), Maschinenstunden H
+(Aufträge × Maschinen), Materialpreisen p und Maschinensätzen k. Q und H
+werden einmal aus der Stückliste berechnet, danach ist ein ganzer Stapel
+von Szenarien nur noch zwei Matrixprodukte.
+
+Aufruf: python -m scripts.scenario "Stahl: M001*1.15" "M3: 003+8, FGK=12%"
+"""
+import argparse
+import re
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+import pandas as pd
+from .cost_model import BomArrays, CostModel, FGK_SATZ, MGK_SATZ
+from .gozinto import GozintoSolver
+from .utils import format_de
+
+OPS = ("*", "+", "-", "=")
+# Nummer (darf selbst "-" enthalten), Operator, Wert; der Wert darf ein Vorzeichen haben
+CHANGE = re.compile(r"^([\w\-]+)\s*([*+\-=])\s*(.+)$")
+
+
+class Change(NamedTuple):
+    """Preisänderung eines Materials oder einer Maschine: ``op`` ist einer von OPS"""
+    nr: str
+    op: str
+    value: float
+
+
+class Scenario(NamedTuple):
+    name: str
+    mgk_satz: float = MGK_SATZ
+    fgk_satz: float = FGK_SATZ
+    changes: Sequence[Change] = ()
+
+
+BASIS = Scenario("Basis")
+
+
+def _number(text: str) -> float:
+    return float(text.strip().replace(",", "."))
+
+
+def _rate(text: str) -> float:
+    """Zuschlagssatz in Prozent, das "%" ist optional: "12" und "12%" sind beide 0.12"""
+    return _number(text.strip().removesuffix("%")) / 100
+
+
+def _change(nr: str, op: str, text: str) -> Change:
+    """Preisänderung; "+15%" bzw. "-15%" ändern relativ zum aktuellen Preis"""
+    if not text.strip().endswith("%"):
+        return Change(nr, op, _number(text))
+    if op not in ("+", "-"):
+        raise ValueError(f"'%' nur mit + oder - möglich: '{nr}{op}{text}' (Faktor z. B. {nr}*1.15)")
+    percent = _number(text.strip()[:-1])
+    return Change(nr, "*", 1 + (percent if op == "+" else -percent) / 100)
+
+
+def parse_scenario(line: str) -> Scenario:
+    """Liest ein Szenario der Form ``Name: MGK=12%, M001*1.15, 003+8, M002=20``.
+
+    Mehrere Änderungen derselben Nummer wirken in der angegebenen Reihenfolge.
+    Zuschlagssätze sind immer Prozent (``MGK=12`` wie ``MGK=12%``), Preise
+    ohne "%" absolut in €; ``M001+15%`` erhöht den Preis um 15 %.
+    """
+    name, _, spec = line.rpartition(":")
+    name = name.strip() or line.strip()
+    mgk, fgk = MGK_SATZ, FGK_SATZ
+    changes = []
+    for item in spec.replace(";", ",").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        match = CHANGE.match(item)
+        if not match:
+            raise ValueError(f"Ungültige Änderung '{item}' (erwartet z. B. M001*1.15 oder MGK=12%)")
+        nr, op, value = match.group(1).upper(), match.group(2), match.group(3)
+        if nr in ("MGK", "FGK"):
+            if op != "=":
+                raise ValueError(f"Zuschlagssatz nur mit '=' änderbar: '{item}'")
+            value = _rate(value)
+            if nr == "MGK":
+                mgk = value
+            else:
+                fgk = value
+        else:
+            changes.append(_change(nr, op, value))
+    return Scenario(name, mgk, fgk, tuple(changes))
+
+
+def _apply(index: Dict[str, int], column: np.ndarray, change: Change) -> None:
+    """Wendet eine Änderung auf den aktuellen Wert an, mehrere Änderungen einer Nummer wirken nacheinander"""
+    i = index[change.nr]
+    if change.op == "*":
+        column[i] *= change.value
+    elif change.op == "+":
+        column[i] += change.value
+    elif change.op == "-":
+        column[i] -= change.value
+    else:
+        column[i] = change.value
+
+
+class ScenarioEngine:
+    """Wertet Stapel von Szenarien für alle Aufträge gleichzeitig aus"""
+
+    def __init__(self, arrays: BomArrays, order_ids: Optional[List[str]] = None):
+        self.arrays = arrays
+        solver = GozintoSolver(arrays)
+        self.order_ids, X = solver.total_requirements(order_ids)
+        # Mengen- und Zeitkoeffizienten je Auftrag
+        self.Q = (X @ solver.M).tocsr()
+        self.H = (X @ solver.T).tocsr()
+        self._material_index = {m: i for i, m in enumerate(arrays.material_ids.tolist())}
+        self._maschine_index = {m: i for i, m in enumerate(arrays.maschine_ids.tolist())}
+
+    @classmethod
+    def load(cls) -> "ScenarioEngine":
+        return cls(CostModel.load().arrays())
+
+    def prices(self, scenarios: Sequence[Scenario]):
+        """Preis- und Satzmatrizen (Materialien × Szenarien, Maschinen × Szenarien)"""
+        base_p = self.arrays.material_kost
+        base_k = self.arrays.maschine_ks
+        P = np.repeat(base_p[:, None], len(scenarios), axis=1)
+        K = np.repeat(base_k[:, None], len(scenarios), axis=1)
+        for s, scenario in enumerate(scenarios):
+            for change in scenario.changes:
+                if change.nr in self._material_index:
+                    _apply(self._material_index, P[:, s], change)
+                elif change.nr in self._maschine_index:
+                    _apply(self._maschine_index, K[:, s], change)
+                else:
+                    raise KeyError(f"Szenario '{scenario.name}': {change.nr} ist weder Material noch Maschine")
+        mgk = np.array([s.mgk_satz for s in scenarios], dtype=np.float64)
+        fgk = np.array([s.fgk_satz for s in scenarios], dtype=np.float64)
+        return P, K, mgk, fgk
+
+    def evaluate(self, scenarios: Sequence[Scenario]) -> Dict[str, np.ndarray]:
+        """Material-, Fertigungs- und Gesamtkosten als Matrizen Aufträge × Szenarien"""
+        P, K, mgk, fgk = self.prices(scenarios)
+        material = (self.Q @ P) * (1 + mgk)
+        fertigung = (self.H @ K) * (1 + fgk)
+        return {"material": material, "fertigung": fertigung, "total": material + fertigung}
+
+    def frame(self, scenarios: Sequence[Scenario]) -> pd.DataFrame:
+        """Gesamtkosten je Auftrag (Zeilen) und Szenario (Spalten)"""
+        total = self.evaluate(scenarios)["total"]
+        return pd.DataFrame(total, index=pd.Index(self.order_ids, name="Auftrag"),
+                            columns=[s.name for s in scenarios])
+
+    def summary(self, scenarios: Sequence[Scenario], basis: Scenario = BASIS) -> pd.DataFrame:
+        """Summe über alle Aufträge je Szenario mit Abweichung zur Basis"""
+        result = self.evaluate([basis, *scenarios])
+        material = result["material"].sum(axis=0)
+        fertigung = result["fertigung"].sum(axis=0)
+        total = material + fertigung
+        delta = total[1:] - total[0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            delta_pct = np.where(total[0] != 0, delta / total[0] * 100, np.nan)
+        return pd.DataFrame({
+            "Szenario": [s.name for s in scenarios],
+            "Material": material[1:],
+            "Fertigung": fertigung[1:],
+            "Gesamt": total[1:],
+            "Abweichung": delta,
+            "Abweichung %": delta_pct,
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("szenario", nargs="+",
+                        help="z. B. 'Stahl: M001*1.15, 003+15%%, FGK=12'; Zuschlagssätze immer in Prozent, "
+                             "Preisänderungen absolut in € oder mit + bzw. - und %% relativ")
+    parser.add_argument("--auftraege", action="store_true", help="Kosten je Auftrag ausgeben")
+    args = parser.parse_args()
+
+    scenarios = [parse_scenario(line) for line in args.szenario]
+    engine = ScenarioEngine.load()
+    if args.auftraege:
+        print(engine.frame([BASIS, *scenarios]).to_string(float_format=format_de))
+        print()
+    summary = engine.summary(scenarios)
+    print(summary.to_string(index=False, float_format=format_de))
+
+
+if __name__ == "__main__":
+    main()
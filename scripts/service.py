@@ -0,0 +1,418 @@
+# scripts/service.py
+"""Kalkulationsdienst: Auftragskosten als JSON über HTTP.
+
+Endpunkte (nur GET):
+
+    /auftraege                          alle Auftragsnummern
+    /auftraege/<nr>/kosten              calc_order_cost
+    /auftraege/<nr>/struktur            calc_full_cost_structure (Zeilen als Objekte)
+    /maschinen/kosten[?auftrag=<nr>]    calc_machine_costs
+    /maschinen/auslastung[?wochen=<n>]  calc_machine_utilization
+    /materialien/kosten                 get_material_costs
+    /status                             Datenstand, Warteschlange, Zähler, Latenzen
+
+Die Verbindungen bedient ein ThreadingHTTPServer, gerechnet wird in einem
+festen Pool von Worker-Threads mit einem gemeinsamen, vorgewärmten
+Kostenmodell. Gleiche Anfragen, die gleichzeitig eintreffen, werden nur
+einmal gerechnet; ist die Warteschlange voll, antwortet der Dienst sofort
+mit 503 und ``Retry-After``. Ändert sich der Datenstand, wird das Modell
+im Hintergrund einer Anfrage neu geladen, bis dahin rechnen die übrigen
+Anfragen mit dem bisherigen Modell weiter.
+
+Aufruf: python -m scripts.service [--port 8502] [--workers 4] [--queue 64]
+"""
+import argparse
+import json
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Hashable, Optional, Set
+from urllib.parse import parse_qs, unquote, urlsplit
+import numpy as np
+from sqlalchemy import select
+from .cache import ResultCache, get_data_version
+from .calc import (calc_full_cost_structure, calc_machine_costs, calc_machine_utilization, calc_order_cost,
+                   get_material_costs)
+from .config import settings
+from .cost_model import BomArrays, CostModel
+from .database import Session
+from .embedded import startup
+from .models import Auftrag
+from .rollup import ArrayRollup, CostRollup, CycleError
+from .snapshot import DEFAULT_PATH, load_arrays
+from .utils import normalize_knoten
+
+# Höchstens so oft (Sekunden) wird der Datenstand in der Datenbank abgefragt
+VERSION_CHECK = 1.0
+LATENCY_WINDOW = 10000
+
+
+class Overloaded(Exception):
+    """Warteschlange voll"""
+
+
+class NotFound(Exception):
+    pass
+
+
+class ModelState:
+    """Ein geladener Datenstand.
+
+    Aus einem Snapshot rechnen die Auftragskosten direkt auf den Arrays, das
+    Kostenmodell für die übrigen Endpunkte wird erst beim ersten Zugriff aufgebaut.
+    """
+
+    def __init__(self, version: int, rollup: CostRollup, auftraege: Set[str],
+                 model: Optional[CostModel] = None, arrays: Optional[BomArrays] = None):
+        self.version = version
+        self.rollup = rollup
+        self.auftraege = auftraege
+        # Gespeicherte Auftragsnummern je normalisierter Nummer, für die Suche aus der URL
+        self.auftrag_index = {normalize_knoten(nr): nr for nr in auftraege}
+        self.arrays = arrays
+        # Der Rollup füllt Strukturbäume (und nach Zyklen auch Stückkosten) erst beim Abruf
+        self.rollup_lock = threading.Lock()
+        self.loaded_at = time.time()
+        self._model = model
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self) -> CostModel:
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = CostModel.from_arrays(self.arrays)
+        return self._model
+
+    @property
+    def teile(self) -> int:
+        return len(self.arrays.teil_ids) if self._model is None else len(self._model.teile)
+
+
+class ModelHolder:
+    """Hält das warme Kostenmodell und lädt es bei geändertem Datenstand neu"""
+
+    def __init__(self, snapshot: Optional[str] = None, version_check: float = VERSION_CHECK):
+        self.snapshot = snapshot
+        self.version_check = version_check
+        self.reloads = 0
+        self._state: Optional[ModelState] = None
+        self._checked = 0.0
+        self._reload_lock = threading.Lock()
+
+    def _load(self) -> ModelState:
+        # Datenstand, Modell und Auftragsliste aus derselben Transaktion
+        session = Session()
+        try:
+            version = get_data_version(session)
+            model = None if self.snapshot else CostModel.load(session)
+            auftraege = set(session.execute(select(Auftrag.auftrag_nr)).scalars().all())
+        finally:
+            session.close()
+        if self.snapshot:
+            arrays = load_arrays(self.snapshot, version)
+            return ModelState(version, ArrayRollup(arrays), auftraege, arrays=arrays)
+
+        rollup = CostRollup(model)
+        try:
+            # Alle Stückkosten vorab, danach lesen die Worker nur noch
+            rollup.compute_all()
+        except CycleError:
+            # Zyklen fallen erst bei den betroffenen Aufträgen auf (siehe validate.py)
+            pass
+        return ModelState(version, rollup, auftraege, model=model)
+
+    def current(self) -> ModelState:
+        state = self._state
+        if state is not None and time.monotonic() - self._checked < self.version_check:
+            return state
+        # Nur ein Thread prüft und lädt; die übrigen rechnen so lange mit dem bisherigen Modell
+        if not self._reload_lock.acquire(blocking=state is None):
+            return state
+        try:
+            if self._state is not None and time.monotonic() - self._checked < self.version_check:
+                return self._state
+            if self._state is None or get_data_version() != self._state.version:
+                self._state = self._load()
+                self.reloads += 1
+            self._checked = time.monotonic()
+            return self._state
+        finally:
+            self._reload_lock.release()
+
+
+class WorkerPool:
+    """Feste Anzahl Rechen-Threads hinter einer begrenzten Warteschlange.
+
+    Aufträge mit gleichem Schlüssel, die noch in Arbeit sind, teilen sich
+    ein Future, statt erneut eingereiht zu werden.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+        self.rejected = 0
+        self._threads = [threading.Thread(target=self._run, name=f"kalkulation-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key: Hashable, fn: Callable[[], bytes]) -> Future:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = Future()
+            try:
+                self._queue.put_nowait((key, fn, future))
+            except queue.Full:
+                self.rejected += 1
+                raise Overloaded()
+            self._inflight[key] = future
+            return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            key, fn, future = item
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn())
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            inflight = len(self._inflight)
+        return {
+            "workers": len(self._threads),
+            "queue": self._queue.qsize(),
+            "queue_max": self._queue.maxsize,
+            "in_arbeit": inflight,
+            "zusammengefasst": self.coalesced,
+            "abgewiesen": self.rejected,
+        }
+
+
+def _json(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, default=_json_default).encode("utf-8")
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} ist nicht JSON-serialisierbar")
+
+
+def _auftrag(state: ModelState, nr: str) -> str:
+    auftrag_nr = state.auftrag_index.get(normalize_knoten(nr))
+    if auftrag_nr is None:
+        raise NotFound(f"Auftrag {nr} nicht gefunden")
+    return auftrag_nr
+
+
+def _auftraege(state: ModelState, params: Dict) -> bytes:
+    return _json(sorted(state.auftraege))
+
+
+def _kosten(state: ModelState, params: Dict) -> bytes:
+    auftrag_nr = _auftrag(state, params["nr"])
+    with state.rollup_lock:
+        result = calc_order_cost(auftrag_nr, rollup=state.rollup)
+    return _json(result)
+
+
+def _struktur(state: ModelState, params: Dict) -> bytes:
+    df = calc_full_cost_structure(_auftrag(state, params["nr"]), model=state.model)
+    return df.to_json(orient="records", force_ascii=False).encode("utf-8")
+
+
+def _maschinenkosten(state: ModelState, params: Dict) -> bytes:
+    auftrag = _auftrag(state, params["auftrag"]) if params.get("auftrag") else None
+    return _json(calc_machine_costs(auftrag, model=state.model))
+
+
+def _auslastung(state: ModelState, params: Dict) -> bytes:
+    wochen = int(params.get("wochen") or 1)
+    if wochen < 1:
+        raise ValueError("wochen muss mindestens 1 sein")
+    return _json(calc_machine_utilization(wochen, model=state.model))
+
+
+def _materialkosten(state: ModelState, params: Dict) -> bytes:
+    return _json(get_material_costs(model=state.model))
+
+
+ROUTES = [
+    (re.compile(r"/auftraege"), _auftraege),
+    (re.compile(r"/auftraege/(?P<nr>[^/]+)/kosten"), _kosten),
+    (re.compile(r"/auftraege/(?P<nr>[^/]+)/struktur"), _struktur),
+    (re.compile(r"/maschinen/kosten"), _maschinenkosten),
+    (re.compile(r"/maschinen/auslastung"), _auslastung),
+    (re.compile(r"/materialien/kosten"), _materialkosten),
+]
+
+
+class CostService:
+    """Modell, Worker-Pool, Ergebnis-Cache und Messwerte eines Dienstes"""
+
+    def __init__(self, workers: int = 4, queue_size: int = 64, timeout: float = 30.0,
+                 snapshot: Optional[str] = None, version_check: float = VERSION_CHECK):
+        self.holder = ModelHolder(snapshot, version_check)
+        self.pool = WorkerPool(workers, queue_size)
+        self.cache = ResultCache(settings["cache_size"])
+        self.timeout = timeout
+        self.started = time.time()
+        self._latencies: "deque[float]" = deque(maxlen=LATENCY_WINDOW)
+        self._status_counts: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def handle(self, path: str, query: Dict[str, str]) -> bytes:
+        """Antwort als JSON-Bytes; Fehler als Ausnahmen (siehe Handler)"""
+        if path == "/status":
+            return _json(self.status())
+        for pattern, endpoint in ROUTES:
+            match = pattern.fullmatch(path)
+            if match:
+                break
+        else:
+            raise NotFound(f"Unbekannter Pfad {path}")
+
+        params = {**query, **{k: unquote(v) for k, v in match.groupdict().items()}}
+        state = self.holder.current()
+        key = (endpoint.__name__, tuple(sorted(params.items())))
+        future = self.pool.submit(
+            (state.version, key),
+            lambda: self.cache.get_or_compute(key, state.version, lambda: endpoint(state, params)),
+        )
+        return future.result(timeout=self.timeout)
+
+    def record(self, status: int, seconds: float):
+        with self._lock:
+            self._status_counts[status] = self._status_counts.get(status, 0) + 1
+            self._latencies.append(seconds)
+
+    def status(self) -> Dict:
+        state = self.holder._state
+        with self._lock:
+            lat_ms = np.array(self._latencies) * 1000
+            counts = dict(self._status_counts)
+        return {
+            "datenstand": state.version if state else None,
+            "modell_geladen": state.loaded_at if state else None,
+            "neu_geladen": self.holder.reloads,
+            "laufzeit_s": time.time() - self.started,
+            "pool": self.pool.stats(),
+            "cache": self.cache.stats(),
+            "antworten": {str(k): v for k, v in sorted(counts.items())},
+            "latenz_ms": {
+                f"p{p}": float(np.percentile(lat_ms, p)) if len(lat_ms) else 0.0 for p in (50, 90, 99)
+            } | {"max": float(lat_ms.max()) if len(lat_ms) else 0.0},
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "Kostcalc/1.0"
+    protocol_version = "HTTP/1.1"
+    # Kopf und Rumpf gehen getrennt raus; ohne TCP_NODELAY warten Keep-Alive-Clients auf das verzögerte ACK
+    disable_nagle_algorithm = True
+    service: CostService
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        headers = {}
+        try:
+            body = self.service.handle(url.path.rstrip("/") or "/", query)
+            status = 200
+        except NotFound as e:
+            status, body = 404, _json({"fehler": str(e)})
+        except CycleError as e:
+            # Vor ValueError: CycleError ist eine Unterklasse davon
+            status, body = 422, _json({"fehler": str(e)})
+        except ValueError as e:
+            status, body = 400, _json({"fehler": str(e)})
+        except Overloaded:
+            status, body = 503, _json({"fehler": "Dienst ausgelastet, bitte später erneut versuchen"})
+            headers["Retry-After"] = "1"
+        except FutureTimeout:
+            status, body = 504, _json({"fehler": f"Keine Antwort nach {self.service.timeout:g} s"})
+        except Exception as e:
+            status, body = 500, _json({"fehler": f"{type(e).__name__}: {e}"})
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.service.record(status, time.perf_counter() - start)
+
+    def log_message(self, format, *args):
+        # Zugriffe nicht einzeln protokollieren, Kennzahlen unter /status
+        pass
+
+
+def make_server(host: str, port: int, service: CostService) -> ThreadingHTTPServer:
+    handler = type("BoundHandler", (Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=settings["service_host"])
+    parser.add_argument("--port", type=int, default=settings["service_port"])
+    parser.add_argument("--workers", type=int, default=settings["service_workers"], help="Rechen-Threads")
+    parser.add_argument("--queue", type=int, default=settings["service_queue"],
+                        help="Plätze in der Warteschlange, darüber 503")
+    parser.add_argument("--timeout", type=float, default=settings["service_timeout"],
+                        help="Sekunden bis 504")
+    parser.add_argument("--snapshot", nargs="?", const="", default=None,
+                        help="Stammdaten aus dem Binär-Snapshot laden (optional mit Pfad)")
+    args = parser.parse_args()
+
+    snapshot = None
+    if args.snapshot is not None:
+        snapshot = args.snapshot or settings["snapshot"] or DEFAULT_PATH
+    startup()
+    service = CostService(args.workers, args.queue, args.timeout, snapshot)
+    print("📥 Lade Stammdaten...")
+    state = service.holder.current()
+    server = make_server(args.host, args.port, service)
+    print(f"✅ Datenstand {state.version}, {state.teile} Teile, {len(state.auftraege)} Aufträge. "
+          f"Dienst läuft auf http://{args.host}:{server.server_address[1]} "
+          f"({args.workers} Worker, Warteschlange {args.queue}).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
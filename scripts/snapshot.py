@@ -0,0 +1,152 @@
+# scripts/snapshot.py
+"""Binärer Snapshot der Stammdaten für schnellen Kaltstart.
+
+Der Snapshot enthält alle Arrays einer BomArrays-Instanz (ganzzahlig
+codierte Verweise, Zahlen als float64, IDs als Unicode fester Breite, dazu
+die abgeleiteten Einzelkosten und Kinder-Indizes) als rohe Bytes hinter
+einem kleinen Kopf:
+
+    MAGIC (8 Bytes) | Länge des JSON-Kopfs (uint64) | JSON-Kopf | Arrays
+
+Der Kopf enthält Formatversion, Datenstand und je Array Typ, Form und
+Offset (auf 64 Bytes ausgerichtet). Beim Öffnen werden die Arrays per
+mmap eingeblendet und nicht kopiert, mehrere Prozesse teilen sich so die
+Seiten im Dateicache des Betriebssystems. Stimmt der Datenstand nicht mehr
+mit der Datenbank überein, wird der Snapshot neu geschrieben.
+
+Aufruf: python -m scripts.snapshot [pfad]   (Snapshot erzeugen bzw. auffrischen)
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Dict, Optional
+import numpy as np
+from .cache import get_data_version
+from .config import settings
+from .cost_model import BomArrays, CostModel
+from .database import Session
+
+MAGIC = b"KOSTSNAP"
+FORMAT_VERSION = 1
+ALIGN = 64
+DEFAULT_PATH = "data/stammdaten.snap"
+
+
+def _arrays_of(arrays: BomArrays) -> Dict[str, np.ndarray]:
+    return {name: value for name, value in vars(arrays).items() if isinstance(value, np.ndarray)}
+
+
+def write(arrays: BomArrays, path: str, data_version: int) -> None:
+    """Schreibt den Snapshot atomar (erst temporäre Datei, dann umbenennen)"""
+    fields = _arrays_of(arrays)
+    entries = {}
+    offset = 0
+    for name, value in fields.items():
+        offset = -(-offset // ALIGN) * ALIGN
+        entries[name] = {"dtype": value.dtype.str, "shape": list(value.shape), "offset": offset}
+        offset += value.nbytes
+
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "datenstand": data_version,
+        "arrays": entries,
+    }).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    # Eigene temporäre Datei je Schreiber, damit gleichzeitige Prozesse sich nicht überschreiben
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for name, value in fields.items():
+                f.seek(data_start + entries[name]["offset"])
+                f.write(np.ascontiguousarray(value).tobytes())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def read_header(path: str) -> Dict:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} ist kein Stammdaten-Snapshot")
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    header["data_start"] = -(-(len(MAGIC) + 8 + length) // ALIGN) * ALIGN
+    return header
+
+
+def open_arrays(path: str) -> BomArrays:
+    """Blendet den Snapshot schreibgeschützt ein, ohne die Arrays zu kopieren"""
+    header = read_header(path)
+    if header["format"] != FORMAT_VERSION:
+        raise ValueError(f"Snapshot-Format {header['format']} wird nicht unterstützt")
+
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    arrays = BomArrays.__new__(BomArrays)
+    for name, entry in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"]))
+        if not count:
+            setattr(arrays, name, np.empty(entry["shape"], dtype=dtype))
+            continue
+        value = np.frombuffer(buffer, dtype=dtype, count=count, offset=header["data_start"] + entry["offset"])
+        setattr(arrays, name, value.reshape(entry["shape"]))
+    arrays.data_version = header["datenstand"]
+    return arrays
+
+
+def load_arrays(path: Optional[str] = None, data_version: Optional[int] = None) -> BomArrays:
+    """Öffnet den Snapshot; fehlt er oder ist er veraltet, wird er zuerst aus der Datenbank erzeugt"""
+    path = path or settings["snapshot"] or DEFAULT_PATH
+    if data_version is None:
+        data_version = get_data_version()
+
+    try:
+        if read_header(path)["datenstand"] == data_version:
+            return open_arrays(path)
+    except (OSError, ValueError):
+        pass
+
+    # Datenstand und Stammdaten aus derselben Transaktion, damit der Snapshot nicht falsch etikettiert wird
+    session = Session()
+    try:
+        data_version = get_data_version(session)
+        model = CostModel.load(session)
+    finally:
+        session.close()
+    write(model.arrays(), path, data_version)
+    return open_arrays(path)
+
+
+def load_model(path: Optional[str] = None, data_version: Optional[int] = None) -> CostModel:
+    """Kostenmodell aus dem (bei Bedarf aufgefrischten) Snapshot"""
+    return CostModel.from_arrays(load_arrays(path, data_version))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=None)
+    args = parser.parse_args()
+    path = args.path or settings["snapshot"] or DEFAULT_PATH
+
+    start = time.perf_counter()
+    arrays = load_arrays(path)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Snapshot '{path}' (Datenstand {arrays.data_version}, {len(arrays.teil_ids)} Teile, "
+          f"{os.path.getsize(path) / 1e6:.1f} MB) in {elapsed * 1000:.1f} ms bereit.")
+
+
+if __name__ == "__main__":
+    main()
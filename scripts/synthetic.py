@@ -0,0 +1,114 @@
+# scripts/synthetic.py
+"""Reproduzierbarer Generator für synthetische Stammdaten (Stücklisten, Arbeitspläne, Preise).
+
+Da jedes Teil genau einen Knoten hat, wird die Wiederverwendung von Baugruppen
+als Kopie abgebildet: mit Wahrscheinlichkeit ``reuse`` wird ein bereits
+erzeugter Teilbaum (gleiche Teil-Nr., gleiches Material, gleicher
+Arbeitsplan) unter neuen Teil-IDs erneut eingehängt.
+"""
+import argparse
+import random
+from typing import Dict, List
+from sqlalchemy import create_engine, delete, insert
+from .database import Base
+from .models import Arbeitsplan, Auftrag, Datenstand, Maschine, Material, Teil
+
+
+def generate(seed: int = 42, orders: int = 100, depth: int = 4, fanout: int = 4, reuse: float = 0.3,
+             machines: int = 20, materials: int = 50, ops_per_part: int = 3) -> Dict[str, List[dict]]:
+    rng = random.Random(seed)
+
+    material_rows = [{"nr": f"M{i:03d}", "kost": round(rng.uniform(1, 100), 2)} for i in range(1, materials + 1)]
+    maschine_rows = [{"nr": f"{i:03d}", "bezeichnung": f"Maschine{i}", "ks": float(rng.choice([30, 40, 60, 80]))}
+                     for i in range(1, machines + 1)]
+    auftrag_rows = [{"auftrag_nr": f"A{i:05d}"} for i in range(1, orders + 1)]
+    teil_rows = []
+    ap_rows = []
+    templates = []  # (Ebene, Liste von (teil_nr, mat, anzahl, ops, Kind-Indizes relativ))
+
+    def new_id():
+        return str(len(teil_rows) + 1).zfill(7)
+
+    def add_part(knoten, teil_nr, mat, anzahl, ops):
+        teil_id = new_id()
+        teil_rows.append({"teil_id": teil_id, "teil_nr": teil_nr, "knoten": knoten, "anzahl": anzahl, "mat": mat})
+        for ag, (maschine, dauer) in enumerate(ops, start=1):
+            ap_rows.append({"teil_id": teil_id, "ag_nr": f"{ag:02d}", "maschine": maschine, "dauer": dauer})
+        return teil_id
+
+    def copy_tree(knoten, tree):
+        teil_nr, mat, anzahl, ops, children = tree
+        teil_id = add_part(knoten, teil_nr, mat, anzahl, ops)
+        for child in children:
+            copy_tree(teil_id, child)
+
+    def build(knoten, level):
+        """Erzeugt einen Teilbaum und liefert seine Beschreibung für spätere Kopien"""
+        candidates = [t for lvl, t in templates if lvl == level]
+        if candidates and rng.random() < reuse:
+            tree = rng.choice(candidates)
+            copy_tree(knoten, tree)
+            return tree
+
+        teil_nr = f"{rng.randrange(1, 10000):04d}"
+        mat = rng.choice(material_rows)["nr"]
+        anzahl = float(rng.randint(1, 5))
+        ops = [(rng.choice(maschine_rows)["nr"], float(rng.randint(5, 240)))
+               for _ in range(rng.randint(1, ops_per_part))]
+        teil_id = add_part(knoten, teil_nr, mat, anzahl, ops)
+
+        children = []
+        if level < depth:
+            for _ in range(rng.randint(1, fanout)):
+                children.append(build(teil_id, level + 1))
+        tree = (teil_nr, mat, anzahl, ops, children)
+        templates.append((level, tree))
+        return tree
+
+    for auftrag in auftrag_rows:
+        for _ in range(rng.randint(1, fanout)):
+            build(auftrag["auftrag_nr"], 1)
+
+    return {
+        "material": material_rows,
+        "maschine": maschine_rows,
+        "auftrag": auftrag_rows,
+        "teil": teil_rows,
+        "arbeitsplan": ap_rows,
+    }
+
+
+def load_into(engine, data: Dict[str, List[dict]]):
+    """Ersetzt den Inhalt der Datenbank durch die erzeugten Daten"""
+    Base.metadata.create_all(engine)
+    tables = [(Material, "material"), (Maschine, "maschine"), (Auftrag, "auftrag"), (Teil, "teil"),
+              (Arbeitsplan, "arbeitsplan")]
+    with engine.begin() as conn:
+        for model in (Arbeitsplan, Teil, Auftrag, Maschine, Material, Datenstand):
+            conn.execute(delete(model.__table__))
+        for model, key in tables:
+            rows = [{model.__mapper__.attrs[k].columns[0].name: v for k, v in row.items()} for row in data[key]]
+            if rows:
+                conn.execute(insert(model.__table__), rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("url", help="Ziel-Datenbank, z. B. sqlite:///data/synthetic.db")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--orders", type=int, default=100)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--reuse", type=float, default=0.3)
+    parser.add_argument("--machines", type=int, default=20)
+    parser.add_argument("--materials", type=int, default=50)
+    args = parser.parse_args()
+
+    data = generate(args.seed, args.orders, args.depth, args.fanout, args.reuse, args.machines, args.materials)
+    load_into(create_engine(args.url), data)
+    print(f"✅ {len(data['auftrag'])} Aufträge, {len(data['teil'])} Teile, "
+          f"{len(data['arbeitsplan'])} Arbeitsgänge nach '{args.url}' geschrieben.")
+
+
+if __name__ == "__main__":
+    main()
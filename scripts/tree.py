@@ -0,0 +1,130 @@
+# scripts/tree.py
+"""Seitenweiser Zugriff auf Kostenbäume und Positionstabellen großer Aufträge.
+
+Die App lädt zunächst nur die obersten Teile eines Auftrags und holt
+Unterbäume erst beim Aufklappen. Sortieren, Filtern und Blättern laufen
+serverseitig; für „die ersten k nach Gesamtkosten“ genügt eine
+Teilsortierung per ``np.argpartition`` statt einer vollständigen Sortierung.
+"""
+from typing import NamedTuple, Optional
+import numpy as np
+import pandas as pd
+from .capacity import order_quantities
+from .cost_model import BomArrays
+from .gozinto import GozintoSolver, find_cycles
+from .rollup import CycleError
+
+PAGE_SIZE = 50
+TREE_COLUMNS = ["Teil-ID", "Teil-Nr", "Ebene", "Anzahl", "Gesamt Anzahl", "Kosten/Stk", "Kosten gesamt",
+                "Unterteile"]
+
+
+class Page(NamedTuple):
+    total: int              # Anzahl Zeilen nach dem Filter
+    rows: pd.DataFrame
+
+
+def top_k(values: np.ndarray, k: int, descending: bool = True) -> np.ndarray:
+    """Indizes der k größten (bzw. kleinsten) Werte, sortiert; NaN kommt zuletzt"""
+    values = np.asarray(values)
+    if values.dtype.kind in "fiu":
+        fill = -np.inf if descending else np.inf
+        key = np.where(np.isnan(values), fill, values) if values.dtype.kind == "f" else values
+        key = -key if descending else key
+    else:
+        # Texte: Rangfolge statt Wert, damit sich die Richtung umkehren lässt
+        key = np.unique(values.astype(str), return_inverse=True)[1]
+        key = -key if descending else key
+
+    k = min(k, len(key))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(key):
+        # Alles unter dem k-ten Wert, dazu bei Gleichstand die vorderen Zeilen wie bei stabiler Sortierung
+        kth = np.partition(key, k - 1)[k - 1]
+        below = np.flatnonzero(key < kth)
+        candidates = np.concatenate([below, np.flatnonzero(key == kth)[:k - len(below)]])
+        candidates.sort()
+    else:
+        candidates = np.arange(len(key))
+    return candidates[np.argsort(key[candidates], kind="stable")]
+
+
+def paginate(df: pd.DataFrame, offset: int = 0, limit: int = PAGE_SIZE, sort_by: Optional[str] = None,
+             descending: bool = True, suche: str = "", search_column: str = "Position") -> Page:
+    """Filtert, sortiert und schneidet eine Seite aus einem DataFrame"""
+    if suche:
+        df = df[df[search_column].astype(str).str.contains(suche, case=False, regex=False)]
+    if sort_by:
+        column = df[sort_by]
+        values = column.to_numpy(dtype=float, na_value=np.nan) if pd.api.types.is_numeric_dtype(column) \
+            else column.to_numpy()
+        rows = top_k(values, offset + limit, descending)[offset:]
+    else:
+        rows = np.arange(offset, min(offset + limit, len(df)))
+    return Page(len(df), df.iloc[rows])
+
+
+class CostTree:
+    """Kostenbaum aller Aufträge mit kumulierten Mengen und aufgerollten Stückkosten"""
+
+    def __init__(self, arrays: BomArrays):
+        self.arrays = arrays
+        _, self.gesamt_anzahl = order_quantities(arrays)
+        self.unit_total = GozintoSolver(arrays).unit_costs()["total"]
+        self.child_count = np.diff(arrays.child_ptr)
+        self.ebene = self._depths(arrays)
+        self._index = {t: i for i, t in enumerate(arrays.teil_ids.tolist())}
+
+    @staticmethod
+    def _depths(arrays: BomArrays) -> np.ndarray:
+        """Ebene je Teil (oberste Teile = 1) per Pointer-Jumping"""
+        up = arrays.parent.copy()
+        depth = np.ones(len(up), dtype=np.int64)
+        # Jede Runde verdoppelt die übersprungene Pfadlänge; endet die Kette dann nicht, ist sie ein Zyklus
+        for _ in range(max(1, int(np.ceil(np.log2(len(up) + 1)))) + 1):
+            active = np.flatnonzero(up >= 0)
+            if not len(active):
+                return depth
+            depth[active] += depth[up[active]]
+            up[active] = up[up[active]]
+        raise CycleError(find_cycles(arrays)[0])
+
+    def frame(self, parts: np.ndarray) -> pd.DataFrame:
+        arrays = self.arrays
+        return pd.DataFrame({
+            "Teil-ID": arrays.teil_ids[parts],
+            "Teil-Nr": arrays.teil_nr[parts],
+            "Ebene": self.ebene[parts],
+            "Anzahl": arrays.anzahl[parts],
+            "Gesamt Anzahl": self.gesamt_anzahl[parts],
+            "Kosten/Stk": self.unit_total[parts],
+            "Kosten gesamt": self.gesamt_anzahl[parts] * self.unit_total[parts],
+            "Unterteile": self.child_count[parts],
+        }, columns=TREE_COLUMNS)
+
+    def children(self, auftrag_nr: str, teil_id: Optional[str] = None, offset: int = 0,
+                 limit: int = PAGE_SIZE, sort_by: Optional[str] = "Kosten gesamt",
+                 descending: bool = True) -> Page:
+        """Eine Seite der direkten Unterteile eines Teils (ohne Teil: oberste Teile des Auftrags)"""
+        if teil_id is None:
+            parts = self.arrays.roots(auftrag_nr)
+        else:
+            i = self._index[teil_id]
+            parts = self.arrays.child_order[self.arrays.child_ptr[i]:self.arrays.child_ptr[i + 1]]
+
+        if sort_by:
+            key = {
+                "Kosten gesamt": self.gesamt_anzahl[parts] * self.unit_total[parts],
+                "Kosten/Stk": self.unit_total[parts],
+                "Gesamt Anzahl": self.gesamt_anzahl[parts],
+                "Teil-ID": self.arrays.teil_ids[parts],
+            }[sort_by]
+            page = parts[top_k(key, offset + limit, descending)[offset:]]
+        else:
+            page = parts[offset:offset + limit]
+        return Page(len(parts), self.frame(page))
+
+    def order_total(self, auftrag_nr: str) -> float:
+        parts = self.arrays.roots(auftrag_nr)
+        return float((self.gesamt_anzahl[parts] * self.unit_total[parts]).sum())
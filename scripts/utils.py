@@ -1,10 +1,124 @@
+import numpy as np
+import pandas as pd
+
+
+def normalize_id(id_str):
+    """Normalisiert IDs auf 7 Stellen mit führenden Nullen"""
+    return str(id_str).zfill(7)
+
+
 def format_de(value):
+    # Leere Zellen (None, NaN, pd.NA) wie bei format_de_array als ""
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return ""
     try:
         value = float(value)
     except (ValueError, TypeError):
         return str(value)
 
     if value.is_integer():
-        return f"{int(value):n}".replace(",", ".")
+        return f"{int(value):,}".replace(",", ".")
     else:
         return f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+_DIGITS = 16          # ganze Stellen bis 1e15
+_WIDTH = 1 + _DIGITS + (_DIGITS - 1) // 3 + 3
+
+
+def _format_fast(x: np.ndarray, scaled: np.ndarray) -> np.ndarray:
+    whole = x == np.trunc(x)
+    cents = np.where(whole, 0, np.rint(scaled)).astype(np.int64)
+    integer = np.where(whole, np.abs(x), 0).astype(np.int64) + cents // 100
+    ndigits = np.ones(len(x), dtype=np.int64)
+    for k in range(1, _DIGITS):
+        ndigits += integer >= 10 ** k
+    negative = x < 0
+    # Länge ohne Nachkommastellen, die bei ganzen Zahlen wegfallen
+    length = negative + ndigits + (ndigits - 1) // 3
+
+    # Rechtsbündig, eine Zeile je Zeichenposition: erst die Nachkommastellen, davor der Ganzzahlteil
+    chars = np.zeros((_WIDTH, len(x)), dtype=np.uint8)
+    chars[-1] = (cents % 10).astype(np.uint8) + ord("0")
+    chars[-2] = (cents // 10 % 10).astype(np.uint8) + ord("0")
+    chars[-3] = ord(",")
+    rest = integer
+    for k in range(_DIGITS):
+        pos = 3 + k + k // 3
+        chars[-1 - pos] = ((rest % 10).astype(np.uint8) + ord("0")) * (k < ndigits)
+        if k % 3 == 2 and k + 1 < _DIGITS:
+            chars[-2 - pos] = ord(".") * (k + 1 < ndigits)
+        rest = rest // 10
+    chars = np.ascontiguousarray(chars.T)
+    negative_rows = np.flatnonzero(negative)
+    chars[negative_rows, _WIDTH - 3 - length[negative_rows]] = ord("-")
+
+    # Linksbündig verschieben, gruppiert nach Länge; abschließende Nullbytes fallen beim Umwandeln weg
+    out = np.zeros_like(chars)
+    start = _WIDTH - 3 - length
+    for first in np.unique(start):
+        rows = np.flatnonzero(start == first)
+        out[rows, :_WIDTH - first] = chars[rows, first:]
+    out[whole, :] *= np.arange(_WIDTH) < length[whole, None]
+    return out.view(f"S{_WIDTH}").ravel().astype(str)
+
+
+def format_de_array(values) -> np.ndarray:
+    """format_de für ganze Spalten: ganze Zahlen ohne, alle anderen mit zwei
+    Nachkommastellen, leere Zellen als ""; liefert ein Array von str.
+
+    Die Zeichen werden spaltenweise in einer Byte-Matrix gesetzt, ohne
+    Python-Schleife über die Zellen. Werte, bei denen die Rundung auf Cent
+    knapp auf ,5 fällt, sowie Extremwerte laufen über format_de, damit das
+    Ergebnis gleich bleibt.
+    """
+    raw = np.asarray(values)
+    numeric = raw.dtype.kind in "fiub"
+    if numeric:
+        numbers = raw.astype(np.float64).ravel()
+    else:
+        numbers = pd.to_numeric(pd.Series(raw.ravel()), errors="coerce").to_numpy(dtype=np.float64,
+                                                                                  na_value=np.nan)
+    result = np.full(numbers.shape, "", dtype=object)
+
+    magnitude = np.abs(numbers)
+    with np.errstate(invalid="ignore"):
+        scaled = magnitude * 100
+        tie = np.abs(scaled - np.floor(scaled) - 0.5) <= scaled * 1e-12 + 1e-12
+    fast = np.isfinite(numbers) & (magnitude < 1e15) & ~tie
+    x = numbers[fast]
+    if len(x):
+        result[fast] = _format_fast(x, scaled[fast])
+
+    slow = ~fast & ~np.isnan(numbers)
+    if slow.any():
+        result[slow] = [format_de(v) for v in numbers[slow]]
+    if not numeric:
+        # Nicht-Zahlen wie bei format_de als Text
+        original = raw.ravel()
+        text_cells = np.isnan(numbers) & ~pd.isna(original)
+        result[text_cells] = [str(v) for v in original[text_cells]]
+    return result.reshape(raw.shape)
+
+
+def style_de(df: pd.DataFrame, columns=None):
+    """Styler mit deutscher Zahlendarstellung; die Spalten selbst bleiben numerisch.
+
+    Die Texte werden je Spalte einmal vektorisiert erzeugt, der Styler schlägt
+    beim Rendern nur noch nach. Ohne ``columns`` alle numerischen Spalten.
+    """
+    if columns is None:
+        columns = df.select_dtypes("number").columns
+    formatters = {}
+    for col in columns:
+        if col not in df.columns:
+            continue
+        values = df[col].dropna().unique()
+        formatters[col] = dict(zip(values.tolist(), format_de_array(values))).get
+    return df.style.format(formatters, na_rep="")
+
+
+def normalize_knoten(knoten):
+    """Normalisiert Teil-Verweise auf 7 Stellen, Auftragsnummern bleiben erhalten"""
+    knoten = str(knoten).strip()
+    return knoten.zfill(7) if knoten.isdigit() else knoten.upper()
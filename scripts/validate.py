@@ -0,0 +1,160 @@
+# scripts/validate.py
+"""Prüft die Stammdaten vor einer Kalkulation auf strukturelle Fehler.
+
+Alle Prüfungen laufen mengenbasiert über ganze Spalten (pandas/NumPy),
+ohne Rekursion und ohne Abfragen je Zeile:
+
+* Zyklen über die knoten-Spalte
+* Waisen: Teile, deren Kette nicht bei einem vorhandenen Auftrag endet
+* Verweise auf fehlende Materialien, Maschinen oder Teile
+* ID-Formate (Teil-ID siebenstellig, knoten normalisiert)
+* fehlende oder nicht positive Mengen, Zeiten und Preise
+
+Aufruf: python -m scripts.validate   (Exit-Code 1, wenn Fehler gefunden wurden)
+"""
+import argparse
+import sys
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from .cost_model import BomArrays, CostModel
+from .database import Session
+from .gozinto import find_cycles
+from .models import Auftrag
+from .utils import normalize_knoten
+
+FEHLER = "Fehler"
+WARNUNG = "Warnung"
+COLUMNS = ["Schwere", "Prüfung", "Tabelle", "Schlüssel", "Wert"]
+
+
+def _issues(mask, severity: str, check: str, table: str, keys, values) -> pd.DataFrame:
+    mask = np.asarray(mask, dtype=bool)
+    return pd.DataFrame({
+        "Schwere": severity,
+        "Prüfung": check,
+        "Tabelle": table,
+        "Schlüssel": np.asarray(keys, dtype=object)[mask],
+        "Wert": np.asarray(values, dtype=object)[mask],
+    }, columns=COLUMNS)
+
+
+def validate(model: Optional[CostModel] = None, auftraege: Optional[List[str]] = None) -> pd.DataFrame:
+    """Alle Befunde als DataFrame (leer, wenn die Daten in Ordnung sind)"""
+    if model is None:
+        model = CostModel.load()
+    if auftraege is None:
+        session = Session()
+        try:
+            auftraege = session.execute(select(Auftrag.auftrag_nr)).scalars().all()
+        finally:
+            session.close()
+
+    teile = pd.DataFrame(list(model.teile.values()), columns=["teil_id", "teil_nr", "knoten", "anzahl", "mat"])
+    ops = pd.DataFrame([op for rows in model.arbeitsplaene.values() for op in rows],
+                       columns=["teil_id", "ag_nr", "maschine", "dauer"])
+    teil_set = set(model.teile)
+    found = []
+
+    # ID-Formate
+    teil_id = teile["teil_id"].astype(str)
+    found.append(_issues(~teil_id.str.fullmatch(r"\d{7}"), FEHLER, "Teil-ID nicht siebenstellig", "teil",
+                         teil_id, teil_id))
+    knoten = teile["knoten"].fillna("").astype(str)
+    normalized = knoten.map(normalize_knoten).where(knoten != "", "")
+    found.append(_issues(normalized != knoten, FEHLER, "knoten nicht normalisiert", "teil", teil_id, knoten))
+
+    # Verweise
+    mat = teile["mat"].fillna("").astype(str)
+    found.append(_issues((mat != "") & ~mat.isin(list(model.materialien)), FEHLER, "Material fehlt", "teil",
+                         teil_id, mat))
+    op_key = ops["teil_id"].astype(str) + "/" + ops["ag_nr"].astype(str)
+    found.append(_issues(~ops["teil_id"].isin(teil_set), FEHLER, "Teil fehlt", "arbeitsplan", op_key,
+                         ops["teil_id"]))
+    maschine = ops["maschine"].fillna("").astype(str)
+    found.append(_issues(~maschine.isin(list(model.maschinen)), FEHLER, "Maschine fehlt", "arbeitsplan", op_key,
+                         maschine))
+
+    # Mengen, Zeiten, Preise
+    anzahl = pd.to_numeric(teile["anzahl"], errors="coerce")
+    found.append(_issues(anzahl.isna() | (anzahl <= 0), WARNUNG, "Anzahl fehlt oder ≤ 0", "teil", teil_id,
+                         teile["anzahl"]))
+    dauer = pd.to_numeric(ops["dauer"], errors="coerce")
+    found.append(_issues(dauer.isna() | (dauer < 0), WARNUNG, "Dauer fehlt oder < 0", "arbeitsplan", op_key,
+                         ops["dauer"]))
+    kost = pd.Series([m.kost for m in model.materialien.values()], dtype=object)
+    found.append(_issues(pd.to_numeric(kost, errors="coerce").isna(), WARNUNG, "Preis fehlt", "material",
+                         list(model.materialien), kost))
+    ks = pd.Series([m.ks for m in model.maschinen.values()], dtype=object)
+    found.append(_issues(pd.to_numeric(ks, errors="coerce").isna(), WARNUNG, "Maschinensatz fehlt", "maschine",
+                         list(model.maschinen), ks))
+
+    # Struktur: Zyklen und Waisen über die Elternverweise
+    arrays = model.arrays()
+    cycles = find_cycles(arrays)
+    for cycle in cycles:
+        found.append(pd.DataFrame([[FEHLER, "Zyklus", "teil", cycle[0], " -> ".join(cycle + cycle[:1])]],
+                                  columns=COLUMNS))
+    # arrays.knoten ist normalisiert, die Auftragsnummern daher ebenso
+    found.append(_orphans(arrays, {normalize_knoten(a) for a in auftraege}))
+
+    orders_with_parts = set(arrays.knoten[arrays.parent < 0].tolist())
+    auftraege = np.array(sorted(auftraege), dtype=object)
+    found.append(_issues([normalize_knoten(a) not in orders_with_parts for a in auftraege], WARNUNG,
+                         "Auftrag ohne Teile", "auftrag", auftraege, auftraege))
+
+    found = [f for f in found if len(f)]
+    if not found:
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.concat(found, ignore_index=True)
+
+
+def _orphans(arrays: BomArrays, auftraege: set) -> pd.DataFrame:
+    """Teile, deren oberstes Teil auf keinen vorhandenen Auftrag zeigt (Zyklen ausgenommen).
+
+    ``auftraege`` enthält die normalisierten Auftragsnummern.
+    """
+    n = len(arrays.teil_ids)
+    up = arrays.parent.copy()
+    top = np.where(up < 0, np.arange(n), up)
+    for _ in range(max(1, int(np.ceil(np.log2(n + 1)))) + 1):
+        active = np.flatnonzero(up >= 0)
+        if not len(active):
+            break
+        top[active] = top[up[active]]
+        up[active] = up[up[active]]
+
+    resolved = up < 0
+    top_knoten = arrays.knoten[top]
+    known = np.isin(top_knoten, np.array(sorted(auftraege), dtype=str)) if auftraege else np.zeros(n, dtype=bool)
+    mask = resolved & ~known
+    reason = np.where(top_knoten == "", "ohne knoten", np.char.add("unbekannter Auftrag ", top_knoten))
+    return _issues(mask, WARNUNG, "Waise", "teil", arrays.teil_ids, reason)
+
+
+def summary(issues: pd.DataFrame) -> pd.DataFrame:
+    """Anzahl Befunde je Schwere und Prüfung"""
+    return issues.groupby(["Schwere", "Prüfung"]).size().rename("Anzahl").reset_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alle", action="store_true", help="alle Befunde statt nur der Zusammenfassung ausgeben")
+    args = parser.parse_args()
+
+    issues = validate()
+    if issues.empty:
+        print("✅ Keine Befunde.")
+        return
+    print(summary(issues).to_string(index=False))
+    if args.alle:
+        print()
+        print(issues.to_string(index=False))
+    errors = int((issues["Schwere"] == FEHLER).sum())
+    print(f"\n{'❌' if errors else '⚠️'} {errors} Fehler, {len(issues) - errors} Warnungen.")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# scripts/where_used.py
+"""Verwendungsnachweis: welche Teile und Aufträge hängen an einem Material
+oder einer Maschine, und mit welcher Menge.
+
+Grundlage ist der transitive Abschluss der Stückliste C = (I − N)⁻¹
+(C[a, t] = Stück von t in einem Stück von a). Daraus entstehen einmalig
+
+    Teile × Materialien:    C M   (Materialmenge je Stück des Teils)
+    Teile × Maschinen:      C T   (Maschinenstunden je Stück des Teils)
+    Aufträge × Materialien / Maschinen:  A C M bzw. A C T
+
+als CSC-Matrizen, deren Spalten die Abfrage in Millisekunden liefert. Neue
+Teile und Arbeitsplanzeilen aus der App werden als Deltas entlang des
+Pfads zur Wurzel nachgetragen, statt den Abschluss neu zu berechnen. Da die
+Kosten linear in den Preisen sind, ist die Kostenänderung je € Preis-
+änderung die Menge mal (1 + Zuschlagssatz).
+"""
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from .cost_model import BomArrays, FGK_SATZ, MGK_SATZ
+from .gozinto import GozintoSolver
+from .utils import normalize_id, normalize_knoten
+
+KINDS = ("material", "maschine")
+ZUSCHLAG = {"material": MGK_SATZ, "maschine": FGK_SATZ}
+
+
+class WhereUsedIndex:
+    """Verwendungsnachweis für Materialien und Maschinen, inkrementell fortschreibbar"""
+
+    def __init__(self, arrays: BomArrays, version: Optional[int] = None):
+        self._lock = threading.Lock()
+        self.rebuild(arrays, version)
+
+    def rebuild(self, arrays: BomArrays, version: Optional[int] = None) -> None:
+        solver = GozintoSolver(arrays)
+        n = len(arrays.teil_ids)
+
+        # Transitiver Abschluss als Summe der Potenzen von N (N ist nilpotent)
+        closure = sparse.identity(n, format="csr")
+        step = closure
+        while step.nnz:
+            step = step @ solver.N
+            closure = closure + step
+        order_ids, A = solver.order_demand()
+
+        with self._lock:
+            self.version = version
+            self.teil_ids = arrays.teil_ids
+            self.order_ids = order_ids
+            self._ids = {
+                "material": {m: i for i, m in enumerate(arrays.material_ids.tolist())},
+                "maschine": {m: i for i, m in enumerate(arrays.maschine_ids.tolist())},
+            }
+            per_part = {"material": closure @ solver.M, "maschine": closure @ solver.T}
+            self._parts = {kind: m.tocsc() for kind, m in per_part.items()}
+            self._orders = {kind: (A @ m).tocsc() for kind, m in per_part.items()}
+            self._delta_parts = {kind: defaultdict(lambda: defaultdict(float)) for kind in KINDS}
+            self._delta_orders = {kind: defaultdict(lambda: defaultdict(float)) for kind in KINDS}
+
+            # Elternverweise für die Fortschreibung: Teil -> (Elternteil oder None, Knoten, Anzahl)
+            teil_ids = arrays.teil_ids.tolist()
+            self._parent = {
+                t: (teil_ids[p] if p >= 0 else None, k, a)
+                for t, p, k, a in zip(teil_ids, arrays.parent.tolist(), arrays.knoten.tolist(),
+                                      arrays.anzahl.tolist())
+            }
+            # Knoten oberster Teile, die (noch) auf kein Teil zeigen
+            self._open_knoten = {k for t, (p, k, _) in self._parent.items() if p is None and k}
+
+    def _path(self, teil_id: str) -> Tuple[List[Tuple[str, float]], Optional[Tuple[str, float]]]:
+        """Vorgänger mit Stückzahl des Teils je Vorgänger-Stück, dazu Auftrag und Menge je Auftrag"""
+        ancestors = []
+        factor = 1.0
+        node = teil_id
+        for _ in range(len(self._parent)):
+            parent, knoten, anzahl = self._parent[node]
+            factor *= anzahl
+            if parent is None:
+                return ancestors, ((knoten, factor) if knoten else None)
+            ancestors.append((parent, factor))
+            node = parent
+        raise ValueError(f"Zyklus oberhalb von Teil {teil_id}")
+
+    def _add(self, kind: str, nr: str, teil_id: str, amount: float) -> None:
+        ancestors, order = self._path(teil_id)
+        parts = self._delta_parts[kind][nr]
+        parts[teil_id] += amount
+        for ancestor, factor in ancestors:
+            parts[ancestor] += amount * factor
+        if order:
+            self._delta_orders[kind][nr][order[0]] += amount * order[1]
+
+    def add_teil(self, teil_id: str, knoten: Optional[str], anzahl: Optional[float], mat: Optional[str]) -> bool:
+        """Trägt ein neues Teil nach; False, wenn sich Teilbäume verschieben (dann neu aufbauen)"""
+        with self._lock:
+            if teil_id in self._parent or teil_id in self._open_knoten:
+                return False
+            knoten = normalize_knoten(knoten) if knoten else ""
+            parent = knoten if knoten in self._parent else None
+            self._parent[teil_id] = (parent, knoten, float(anzahl or 1))
+            if parent is None and knoten:
+                self._open_knoten.add(knoten)
+            if mat:
+                self._add("material", mat, teil_id, 1.0)
+            return True
+
+    def add_teile(self, rows: List[Tuple[str, Optional[str], Optional[float], Optional[str]]]) -> bool:
+        """Trägt mehrere neue Teile nach (teil_id, knoten, anzahl, mat), Elternteile aus der Liste zuerst"""
+        pending = {teil_id: row for teil_id, *row in rows}
+        while pending:
+            ready = [t for t, (knoten, _, _) in pending.items()
+                     if not knoten or normalize_knoten(knoten) not in pending]
+            if not ready:
+                return False
+            for teil_id in ready:
+                if not self.add_teil(teil_id, *pending.pop(teil_id)):
+                    return False
+        return True
+
+    def add_arbeitsplan(self, teil_id: str, maschine: str, dauer: float) -> bool:
+        with self._lock:
+            if teil_id not in self._parent:
+                return False
+            self._add("maschine", maschine, teil_id, (dauer or 0.0) / 60)
+            return True
+
+    def advance(self, to_version: int, update: Callable[[], bool]) -> None:
+        """Schreibt den Index fort, wenn er genau auf dem Stand vor der Änderung war, sonst veraltet er"""
+        if self.version == to_version - 1 and update():
+            self.version = to_version
+        else:
+            self.version = None
+
+    def _column(self, base: sparse.csc_matrix, labels: np.ndarray, kind: str, nr: str,
+                delta: Dict) -> pd.Series:
+        i = self._ids[kind].get(nr)
+        values = pd.Series(dtype=np.float64)
+        if i is not None:
+            lo, hi = base.indptr[i], base.indptr[i + 1]
+            values = pd.Series(base.data[lo:hi], index=labels[base.indices[lo:hi]])
+        extra = delta.get(nr)
+        if extra:
+            values = values.add(pd.Series(extra, dtype=np.float64), fill_value=0)
+        return values[values != 0]
+
+    def orders(self, kind: str, nr: str) -> pd.DataFrame:
+        """Betroffene Aufträge mit Menge (bzw. Stunden) und Kostenänderung je € Preisänderung"""
+        with self._lock:
+            values = self._column(self._orders[kind], self.order_ids, kind, nr, self._delta_orders[kind])
+        values = values.sort_values(ascending=False)
+        return pd.DataFrame({
+            "Auftrag": values.index.astype(str),
+            "Menge": values.to_numpy(),
+            "€ je € Preisänderung": values.to_numpy() * (1 + ZUSCHLAG[kind]),
+        })
+
+    def parts(self, kind: str, nr: str) -> pd.DataFrame:
+        """Betroffene Teile (direkte Verwender und alle Vorgänger) mit Menge je Stück"""
+        with self._lock:
+            values = self._column(self._parts[kind], self.teil_ids, kind, nr, self._delta_parts[kind])
+        values = values.sort_values(ascending=False)
+        return pd.DataFrame({
+            "Teil-ID": values.index.astype(str),
+            "Menge je Stück": values.to_numpy(),
+            "€ je € Preisänderung": values.to_numpy() * (1 + ZUSCHLAG[kind]),
+        })
+
+    def ancestors(self, teil_id: str) -> pd.DataFrame:
+        """Verwendung eines Teils: alle Vorgänger und der Auftrag mit der jeweiligen Stückzahl"""
+        with self._lock:
+            ancestors, order = self._path(normalize_id(teil_id))
+        rows = [("Teil", a, f) for a, f in ancestors]
+        if order:
+            rows.append(("Auftrag", order[0], order[1]))
+        return pd.DataFrame(rows, columns=["Art", "Nr", "Menge"])
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+# Eigene In-Memory-Datenbank für die Tests, unabhängig von kostcalc.ini
+os.environ["KOSTCALC_DB_URL"] = "sqlite://"
+os.environ["KOSTCALC_SEED_XLSX"] = ""
+os.environ["KOSTCALC_CALC_MODE"] = "python"
+os.environ["KOSTCALC_SNAPSHOT"] = ""
+os.environ["KOSTCALC_PROFILE"] = "false"
+# Kostenläufe nie ins Arbeitsverzeichnis schreiben; Tests übergeben ohnehin tmp_path
+os.environ["KOSTCALC_KOSTENSTAENDE"] = tempfile.mkdtemp(prefix="kostenstaende-")
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+import pytest
+from sqlalchemy import event
+
+
+@pytest.fixture(scope="session")
+def seeded():
+    """Datenbank einmal aus data/source.xlsx befüllen"""
+    from scripts.database import engine
+    from scripts.embedded import seed
+
+    seed(engine, os.path.join(ROOT, "data", "source.xlsx"))
+    return engine
+
+
+@pytest.fixture
+def statements(seeded):
+    """Zählt die an die Datenbank geschickten SQL-Anweisungen"""
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(seeded, "before_cursor_execute", count)
+    yield executed
+    event.remove(seeded, "before_cursor_execute", count)
@@ -0,0 +1,30 @@
+import json
+import pytest
+from scripts.batch_cost import run_batch, verify
+from scripts.calc import calc_order_cost, get_all_auftrag_ids
+from scripts.cost_model import CostModel
+
+
+@pytest.fixture(scope="module")
+def model(seeded):
+    return CostModel.load()
+
+
+def _results(path):
+    with open(path, encoding="utf-8") as f:
+        return {r["auftrag_nr"]: r for r in map(json.loads, f)}
+
+
+def test_pool_matches_serial(model, tmp_path):
+    auftraege = get_all_auftrag_ids()
+    # Ein Auftrag je Paket, damit beide Worker rechnen und die Ergebnisse durcheinander eintreffen
+    stats = run_batch(auftraege, model, str(tmp_path / "pool.jsonl"), workers=2, chunk_size=1)
+    run_batch(auftraege, model, str(tmp_path / "seriell.jsonl"), workers=0)
+
+    assert stats["orders"] == len(auftraege)
+    pool = _results(tmp_path / "pool.jsonl")
+    assert pool == _results(tmp_path / "seriell.jsonl")
+    assert sorted(pool) == sorted(auftraege)
+    for auftrag_nr in auftraege:
+        assert pool[auftrag_nr]["order_total"] == pytest.approx(calc_order_cost(auftrag_nr)["order_total"])
+    assert verify(str(tmp_path / "pool.jsonl"), model) == []
@@ -0,0 +1,73 @@
+import pytest
+from scripts.bulk import insert_rows, read_table, validate
+from scripts.cache import get_data_version
+from scripts.calc import calc_order_cost
+from scripts.cost_model import CostModel
+from scripts.database import Session
+from scripts.models import Auftrag, Teil
+
+# Neue Baugruppe unter A00001 mit einem Kind aus derselben Datei, dazu fehlerhafte Zeilen
+TEILE = """Teil-ID;knoten;Material-Nr;anzahl
+99301;a00001;m001;2
+99302;A00001;M001;x
+99303;A00001;M999;1
+17;A00001;M001;1
+99304;A99999;M001;1
+99305;99301;M001;3
+99306;A00001;M001;0
+99301;A00002;M001;1
+"""
+
+
+@pytest.fixture
+def session(seeded):
+    # Nicht committen: die Änderungen verschwinden mit dem Rollback
+    session = Session()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def test_validate_rejects_rows(session):
+    result = validate(session, "Teil", read_table(TEILE))
+    # 99305 hängt an 99301, das selbst abgelehnt wird
+    assert result.rows.empty
+    assert dict(zip(result.errors["Zeile"], result.errors["Fehler"])) == {
+        2: "Schlüssel mehrfach in der Datei",
+        3: "anzahl ist keine Zahl",
+        4: "mat verweist auf unbekannten Eintrag",
+        5: "existiert bereits",
+        6: "knoten verweist auf unbekannten Eintrag",
+        7: "knoten verweist auf unbekannten Eintrag",
+        8: "anzahl kleiner als 1",
+        9: "Schlüssel mehrfach in der Datei",
+    }
+
+
+def test_validate_missing_column(session):
+    with pytest.raises(ValueError, match="anzahl"):
+        validate(session, "Teil", read_table("Teil-ID;knoten\n99301;A00001\n"))
+
+
+def test_insert_recalculates_and_bumps_version(session):
+    version = get_data_version(session)
+    before = session.get(Auftrag, "A00001").k_mat
+
+    text = "\n".join(TEILE.splitlines()[:2] + TEILE.splitlines()[6:7])
+    result = validate(session, "Teil", read_table(text))
+    assert result.errors.empty
+    assert insert_rows(session, result) == 2
+
+    assert get_data_version(session) == version + 1
+    assert session.get(Teil, "0099305").k_mat is not None
+    auftrag = session.get(Auftrag, "A00001")
+    assert auftrag.k_mat > before
+    expected = calc_order_cost("A00001", model=CostModel.load(session))
+    assert auftrag.k_mat + auftrag.k_fert == pytest.approx(expected["order_total"])
+
+
+def test_insert_nothing(session):
+    version = get_data_version(session)
+    result = validate(session, "Teil", read_table("Teil-ID;knoten;Mat;anzahl\n17;A00001;M001;1\n"))
+    assert insert_rows(session, result) == 0
+    assert get_data_version(session) == version
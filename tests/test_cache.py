@@ -0,0 +1,28 @@
+from scripts.cache import ResultCache, bump_data_version, get_data_version
+from scripts.database import Session
+from scripts.models import Datenstand
+
+
+def test_bump_creates_and_increments_version(seeded):
+    session = Session()
+    try:
+        before = get_data_version(session)
+        session.query(Datenstand).delete()
+        assert bump_data_version(session) == 1
+        assert get_data_version(session) == 1
+        assert bump_data_version(session) == 2
+        assert get_data_version(session) == 2
+        session.query(Datenstand).update({Datenstand.version: before})
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_new_version_clears_cache():
+    cache = ResultCache(maxsize=2)
+    assert cache.get_or_compute("a", 1, lambda: 1) == 1
+    assert cache.get_or_compute("a", 1, lambda: 2) == 1
+    assert cache.get_or_compute("a", 2, lambda: 3) == 3
+    # Ein Aufrufer mit altem Datenstand überschreibt nichts
+    assert cache.get_or_compute("a", 1, lambda: 4) == 4
+    assert cache.get_or_compute("a", 2, lambda: 5) == 3
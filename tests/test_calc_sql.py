@@ -0,0 +1,92 @@
+import pytest
+from scripts.calc import calc_full_cost_structure, calc_order_cost, get_all_auftrag_ids
+from scripts.calc_sql import compare
+from scripts.cost_model import CostModel
+from scripts.database import Session
+from scripts.models import Teil
+from scripts.rollup import CycleError
+
+# Nicht normalisiert gespeicherte Verweise: Teil-ID ohne führende Nullen, Auftrag klein und mit Leerzeichen
+EXTRA_TEILE = [
+    dict(teil_id="0099001", teil_nr="T1", knoten="1", anzahl=2, mat="M001"),
+    dict(teil_id="0099002", teil_nr="T2", knoten=" 99001", anzahl=3, mat="M002"),
+    dict(teil_id="0099003", teil_nr="T3", knoten="a00002 ", anzahl=1, mat="M003"),
+]
+
+
+# Zwei Teile, die aufeinander verweisen; die Auftragsnummer 99101 führt in den Zyklus
+ZYKLUS_TEILE = [
+    dict(teil_id="0099101", teil_nr="Z1", knoten="0099102", anzahl=1, mat="M001"),
+    dict(teil_id="0099102", teil_nr="Z2", knoten="0099101", anzahl=2, mat="M002"),
+]
+
+# Teil-IDs, die Präfix einer anderen sind: kein Zyklus, Geschwister in derselben Reihenfolge wie in Python
+PRAEFIX_TEILE = [
+    dict(teil_id="00993011", teil_nr="P1", knoten="A00002", anzahl=1, mat="M001"),
+    dict(teil_id="0099301", teil_nr="P2", knoten="A00002", anzahl=2, mat="M002"),
+    dict(teil_id="0099302", teil_nr="P3", knoten="0099301", anzahl=1, mat="M003"),
+    dict(teil_id="009930", teil_nr="P4", knoten="00993011", anzahl=1, mat="M001"),
+]
+
+
+def _add_teile(specs):
+    teile = [Teil(**spec) for spec in specs]
+    session = Session()
+    session.add_all(teile)
+    session.commit()
+    yield [t.teil_id for t in teile]
+    session.query(Teil).filter(Teil.teil_id.in_([t.teil_id for t in teile])).delete()
+    session.commit()
+    session.close()
+
+
+@pytest.fixture
+def extra_teile(seeded):
+    yield from _add_teile(EXTRA_TEILE)
+
+
+@pytest.fixture
+def zyklus_teile(seeded):
+    yield from _add_teile(ZYKLUS_TEILE)
+
+
+@pytest.fixture
+def praefix_teile(seeded):
+    yield from _add_teile(PRAEFIX_TEILE)
+
+
+def test_sql_matches_python(seeded):
+    model = CostModel.load()
+    for auftrag_nr in get_all_auftrag_ids():
+        assert compare(auftrag_nr, model) < 1e-6, auftrag_nr
+
+
+def test_sql_matches_python_with_unnormalized_knoten(extra_teile):
+    model = CostModel.load()
+    for auftrag_nr in get_all_auftrag_ids():
+        assert compare(auftrag_nr, model) < 1e-6, auftrag_nr
+
+    positions = calc_full_cost_structure("A00001", mode="sql")["Position"].tolist()
+    assert "Teil 0099001" in positions and "Teil 0099002" in positions
+    assert "Teil 0099003" in calc_full_cost_structure("A00002", mode="sql")["Position"].tolist()
+
+
+def test_sql_order_number_is_normalized(seeded):
+    assert calc_order_cost(" a00001", mode="sql")["order_total"] == pytest.approx(
+        calc_order_cost("A00001")["order_total"])
+
+
+@pytest.mark.parametrize("calc", [calc_order_cost, calc_full_cost_structure])
+def test_sql_raises_cycle_error_like_python(calc, zyklus_teile):
+    with pytest.raises(CycleError):
+        calc("99101", mode="python")
+    with pytest.raises(CycleError) as exc:
+        calc("99101", mode="sql")
+    # Pfad wie in CostRollup: vom ersten Auftreten bis zur Wiederholung
+    assert exc.value.cycle == ["0099102", "0099101", "0099102"]
+
+
+def test_sql_prefix_ids_are_no_cycle(praefix_teile):
+    assert compare("A00002", CostModel.load()) < 1e-6
+    positions = calc_full_cost_structure("A00002", mode="sql")["Position"].tolist()
+    assert all(f"Teil {t}" in positions for t in praefix_teile)
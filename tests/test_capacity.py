@@ -0,0 +1,84 @@
+from collections import defaultdict
+import pytest
+from scripts.calc import calc_full_cost_structure, get_all_auftrag_ids
+from scripts.capacity import machine_load, order_quantities
+from scripts.cost_model import BomArrays, CostModel
+from scripts.rollup import CycleError
+
+
+@pytest.fixture(scope="module")
+def model(seeded):
+    return CostModel.load()
+
+
+@pytest.fixture(scope="module")
+def strukturen(model):
+    # Gesamtmenge je Teil und Auftrag aus der Stücklistenauflösung
+    result = {}
+    for auftrag_nr in get_all_auftrag_ids():
+        df = calc_full_cost_structure(auftrag_nr, model=model).iloc[1:-1]
+        result[auftrag_nr] = dict(zip(df["Position"].str.removeprefix("Teil "), df["Gesamt Anzahl"]))
+    return result
+
+
+def test_order_quantities_match_structure(model, strukturen):
+    arrays = model.arrays()
+    top, qty = order_quantities(arrays)
+    index = {t: i for i, t in enumerate(arrays.teil_ids.tolist())}
+    order_ids, root_parts, root_orders = arrays.order_roots()
+    order_of_root = dict(zip(root_parts.tolist(), order_ids[root_orders].tolist()))
+
+    seen = 0
+    for auftrag_nr, mengen in strukturen.items():
+        for teil_id, menge in mengen.items():
+            i = index[teil_id]
+            assert qty[i] == pytest.approx(menge, rel=1e-12), teil_id
+            assert order_of_root[top[i]] == auftrag_nr
+            seen += 1
+    assert seen == len(arrays.teil_ids)
+
+
+def test_machine_load_matches_structure(model, strukturen):
+    result = machine_load(model.arrays())
+    ks = {nr: m.ks for nr, m in model.maschinen.items()}
+    gesamt = defaultdict(float)
+    for auftrag_nr, mengen in strukturen.items():
+        expected = defaultdict(float)
+        for teil_id, menge in mengen.items():
+            for op in model.arbeitsplaene.get(teil_id, ()):
+                if op.maschine in model.maschinen:
+                    expected[op.maschine] += menge * op.dauer / 60
+                    gesamt[op.maschine] += menge * op.dauer / 60
+        frame = result.order_frame(auftrag_nr)
+        stunden = dict(zip(frame["Maschine"], frame["Stunden"]))
+        assert stunden and stunden == pytest.approx(dict(expected), rel=1e-9), auftrag_nr
+        assert dict(zip(frame["Maschine"], frame["Kosten"])) == pytest.approx(
+            {nr: h * ks[nr] for nr, h in stunden.items()}, rel=1e-9)
+
+    assert result.order_frame("A99999").empty
+    assert result.order_frame(" a00001").equals(result.order_frame("A00001"))
+    actual = {nr: h for nr, h in zip(result.maschine_ids.tolist(), result.machine_hours()) if h}
+    assert actual == pytest.approx(dict(gesamt), rel=1e-9)
+
+
+def test_utilization_zero_hours(model):
+    util = machine_load(model.arrays()).utilization(hours_per_week=0)
+    assert (util["Kapazität"] == 0).all()
+    assert util.loc[util["Stunden"] > 0, "Überlastet"].all()
+
+
+def test_order_quantities_cycle(model):
+    # 0000017 hängt unter seinem eigenen Kind
+    arrays = model.arrays()
+    i = arrays.teil_ids.tolist().index("0000017")
+    child = arrays.child_order[arrays.child_ptr[i]]
+    parent = arrays.parent.copy()
+    parent[i] = child
+    cyclic = BomArrays(arrays.teil_ids, arrays.teil_nr, arrays.knoten, parent, arrays.anzahl, arrays.teil_mat,
+                       arrays.material_ids, arrays.material_kost, arrays.maschine_ids, arrays.maschine_ks,
+                       arrays.maschine_bez, arrays.op_teil, arrays.op_maschine, arrays.op_dauer, arrays.op_ag_nr)
+
+    with pytest.raises(CycleError) as exc:
+        order_quantities(cyclic)
+    # Nur der Zyklus, nicht die Teile darunter
+    assert sorted(exc.value.cycle) == sorted(["0000017", arrays.teil_ids[child]])
@@ -0,0 +1,72 @@
+import math
+import numpy as np
+import pytest
+from scripts.calc import calc_order_cost, get_all_auftrag_ids
+from scripts.cost_drivers import DIMENSIONS, DriverAnalysis, ExactSums, SketchTopK
+from scripts.cost_model import CostModel
+
+
+@pytest.fixture(scope="module")
+def analysis(seeded):
+    return DriverAnalysis(CostModel.load().arrays())
+
+
+def test_sketch_matches_exact_sums_within_bound():
+    # Schiefe Verteilung über viele Schlüssel, in Blöcken; schmaler Sketch, damit Kollisionen auftreten
+    rng = np.random.default_rng(1)
+    size, width, k = 5000, 256, 20
+    exact, sketch = ExactSums(size), SketchTopK(k, width=width, seed=3)
+    for _ in range(10):
+        codes = rng.zipf(1.5, 20000) % size
+        values = rng.uniform(0.5, 1.5, len(codes))
+        exact.add(codes, values)
+        sketch.add(codes, values)
+
+    assert sketch.total == pytest.approx(exact.total)
+    bound = math.e / width * exact.total
+    top = sketch.top(k)
+    assert len(top) == k
+    for code, estimate in top:
+        assert exact.sums[code] - 1e-6 <= estimate <= exact.sums[code] + bound
+
+    # Schlüssel, die alle anderen um mehr als die Fehlerschranke übertreffen, fehlen nicht
+    expected = exact.top(k)
+    heavy = [code for code, value in expected if value > expected[-1][1] + bound]
+    assert heavy and set(heavy) <= {code for code, _ in top}
+
+
+def test_sketch_run_matches_exact_run(analysis):
+    exact = analysis.run(k=100, share=1.0)
+    sketch = analysis.run(k=100, share=1.0, sketch=True)
+    for dim in DIMENSIONS:
+        assert sketch[dim].exact == (dim not in ("teil", "teil_nr"))
+        assert sketch[dim].total == pytest.approx(exact[dim].total)
+        bound = math.e / 2 ** 16 * exact[dim].total
+        expected = exact[dim].table.set_index(exact[dim].table.columns[1])["Kosten"]
+        for key, kosten in sketch[dim].table.set_index(sketch[dim].table.columns[1])["Kosten"].items():
+            assert expected[key] - 1e-6 <= kosten <= expected[key] + bound
+
+
+def test_pareto_table(analysis):
+    result = analysis.run(share=0.8)
+    assert result["teil"].total == pytest.approx(sum(calc_order_cost(nr)["order_total"]
+                                                     for nr in get_all_auftrag_ids()))
+
+    for dim, pareto in result.items():
+        table = pareto.table
+        assert pareto.exact and len(table)
+        assert table["Rang"].tolist() == list(range(1, len(table) + 1))
+        assert table["Kosten"].is_monotonic_decreasing
+        assert table["Kumuliert %"].tolist() == pytest.approx(table["Anteil %"].cumsum().tolist())
+        # Genau bis zum ersten Schlüssel, mit dem 80 % erreicht sind
+        assert table["Kumuliert %"].iloc[-1] >= 80 - 1e-9
+        assert (table["Kumuliert %"].iloc[:-1] < 80).all()
+
+    maschine = result["maschine"].table
+    assert maschine.columns.tolist() == ["Rang", "Maschine", "Bezeichnung", "Kosten", "Anteil %", "Kumuliert %"]
+
+
+def test_pareto_table_full_share(analysis):
+    for pareto in analysis.run(share=1.0).values():
+        assert pareto.table["Kumuliert %"].iloc[-1] == pytest.approx(100)
+        assert pareto.table["Kosten"].sum() == pytest.approx(pareto.total)
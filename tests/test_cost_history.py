@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+from scripts.calc import calc_full_cost_structure, get_all_auftrag_ids
+from scripts.cost_history import CostHistory, positions
+from scripts.cost_model import CostModel, FGK_SATZ, MGK_SATZ
+from scripts.database import Session
+from scripts.models import Auftrag, Material, Teil
+from scripts.rollup import CycleError
+
+
+def test_cycle_names_the_parts():
+    parts = pd.DataFrame({
+        "teil_id": ["0000001", "0000002", "0000003"],
+        "knoten": ["A00001", "0000003", "0000002"],
+        "anzahl": [1.0, 2.0, 3.0],
+        "mat_einzel": [1.0, 1.0, 1.0],
+        "fert_einzel": [0.0, 0.0, 0.0],
+    })
+    with pytest.raises(CycleError) as exc:
+        positions(parts, MGK_SATZ, FGK_SATZ)
+    assert exc.value.cycle == ["0000002", "0000003"]
+
+
+@pytest.fixture
+def session(seeded):
+    # Nicht committen: die Änderungen verschwinden mit dem Rollback
+    session = Session()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def _kosten(model, auftraege):
+    """Material- und Fertigungskosten je Auftrag aus der Stücklistenauflösung"""
+    result = {}
+    for auftrag_nr in auftraege:
+        df = calc_full_cost_structure(auftrag_nr, model=model).iloc[1:-1]
+        result[auftrag_nr] = (df["Mat. Pos."].sum(), df["Fert. Pos."].sum())
+    return result
+
+
+def test_record_and_diff(session, tmp_path):
+    pytest.importorskip("pyarrow")
+    auftraege = get_all_auftrag_ids()
+    history = CostHistory(str(tmp_path))
+    alt = CostModel.load(session)
+    erster = history.record(alt, auftraege, data_version=1)
+    assert erster["teile_geschrieben"] == erster["teile"] == len(alt.teile)
+
+    session.get(Material, "M001").kost += 10
+    session.flush()
+    neu = CostModel.load(session)
+    zweiter = history.record(neu, auftraege, data_version=2)
+
+    # Nur die Teile mit dem geänderten Material werden geschrieben
+    betroffen = sorted(t.teil_id for t in neu.teile.values() if t.mat == "M001")
+    geschrieben = pd.read_parquet(tmp_path / "lauf-00002-teile.parquet")
+    assert sorted(geschrieben["teil_id"]) == betroffen
+    assert zweiter["teile_geschrieben"] == len(betroffen)
+
+    # Ein frisch geöffneter Stand liest die übrigen Teile aus Lauf 1
+    reopened = CostHistory(str(tmp_path))
+    teile = reopened.parts(2).set_index("teil_id")
+    arrays = neu.arrays()
+    assert teile.loc[arrays.teil_ids.tolist(), "mat_einzel"].tolist() == pytest.approx(arrays.mat_einzel.tolist())
+    assert teile.loc[arrays.teil_ids.tolist(), "fert_einzel"].tolist() == pytest.approx(arrays.fert_einzel.tolist())
+
+    diff = reopened.diff(1, 2, alle=True).auftraege.set_index("Auftrag")
+    kosten_alt, kosten_neu = _kosten(alt, auftraege), _kosten(neu, auftraege)
+    for auftrag_nr in auftraege:
+        d_mat = kosten_neu[auftrag_nr][0] - kosten_alt[auftrag_nr][0]
+        row = diff.loc[auftrag_nr]
+        assert row["Δ Material"] == pytest.approx(d_mat)
+        assert row["Δ MGK"] == pytest.approx(d_mat * MGK_SATZ)
+        assert row["Δ Fertigung"] == pytest.approx(0.0, abs=1e-9)
+        assert row["Δ FGK"] == pytest.approx(0.0, abs=1e-9)
+    assert (diff["Δ Material"] > 0).any()
+    assert (diff.loc[diff["Δ Material"] == 0, "Status"] == "unverändert").all()
+
+
+def test_record_normalizes_order_numbers(session, tmp_path):
+    pytest.importorskip("pyarrow")
+    session.add_all([Auftrag(auftrag_nr=" a00077"), Teil(teil_id="0099077", knoten="A00077", anzahl=2, mat="M001")])
+    session.flush()
+    history = CostHistory(str(tmp_path))
+    history.record(CostModel.load(session), [" a00077"], data_version=1)
+
+    totals = history.orders(1).set_index("Auftrag")["Gesamt"]
+    assert totals["A00077"] > 0
+    assert len(history.positions(1, " a00077")) == 1
@@ -0,0 +1,41 @@
+import pytest
+from scripts import calc
+from scripts.calc import get_all_auftrag_ids
+from scripts.cost_model import CostModel
+
+# Je Kalkulationsfunktion ein Aufruf für einen Auftrag, optional mit geladenem Modell
+CALC_FUNCTIONS = [
+    pytest.param(lambda nr, **kw: calc.calc_full_cost_structure(nr, **kw), id="calc_full_cost_structure"),
+    pytest.param(lambda nr, **kw: calc.calc_order_cost(nr, **kw), id="calc_order_cost"),
+    pytest.param(lambda nr, **kw: calc.calc_cost("0000001", **kw), id="calc_cost"),
+    pytest.param(lambda nr, **kw: calc.calc_machine_costs(nr, **kw), id="calc_machine_costs"),
+    pytest.param(lambda nr, **kw: calc.calc_machine_utilization(**kw), id="calc_machine_utilization"),
+    pytest.param(lambda nr, **kw: calc.get_material_costs(**kw), id="get_material_costs"),
+]
+
+
+@pytest.fixture(scope="module")
+def auftraege(seeded):
+    return get_all_auftrag_ids()
+
+
+def test_load_query_count(statements):
+    CostModel.load()
+    assert len(statements) == CostModel.QUERY_COUNT
+
+
+@pytest.mark.parametrize("fn", CALC_FUNCTIONS)
+def test_statements_per_order(fn, auftraege, statements):
+    for auftrag_nr in auftraege:
+        statements.clear()
+        fn(auftrag_nr)
+        assert len(statements) == CostModel.QUERY_COUNT, (auftrag_nr, statements)
+
+
+@pytest.mark.parametrize("fn", CALC_FUNCTIONS)
+def test_no_statements_with_model(fn, auftraege, statements):
+    model = CostModel.load()
+    statements.clear()
+    for auftrag_nr in auftraege:
+        fn(auftrag_nr, model=model)
+    assert statements == []
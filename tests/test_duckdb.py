@@ -0,0 +1,62 @@
+import os
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.schema import CreateTable
+from conftest import ROOT
+from scripts.cache import get_data_version
+from scripts import calc_sql
+from scripts.calc import calc_full_cost_structure, calc_order_cost, get_all_auftrag_ids
+from scripts.cost_model import CostModel
+from scripts.embedded import seed
+from scripts.models import Teil
+from scripts.rollup import CycleError
+
+pytest.importorskip("duckdb_engine")
+
+
+@pytest.fixture
+def duckdb_engine(tmp_path):
+    engine = create_engine(f"duckdb:///{tmp_path / 'kostcalc.duckdb'}")
+    yield engine
+    engine.dispose()
+
+
+def test_seed_and_cost(duckdb_engine):
+    seed(duckdb_engine, os.path.join(ROOT, "data", "source.xlsx"))
+    with OrmSession(duckdb_engine) as session:
+        assert get_data_version(session) == 1
+        result = calc_order_cost("A00001", model=CostModel.load(session))
+    assert result["order_total"] == pytest.approx(1316.70)
+
+
+def test_knoten_norm_is_virtual(duckdb_engine):
+    seed(duckdb_engine, os.path.join(ROOT, "data", "source.xlsx"))
+    ddl = str(CreateTable(Teil.__table__).compile(duckdb_engine))
+    assert "VIRTUAL" in ddl and "STORED" not in ddl
+
+    with OrmSession(duckdb_engine) as session:
+        session.add(Teil(teil_id="0999001", knoten=" 17", anzahl=1))
+        session.flush()
+        assert session.execute(select(Teil.knoten_norm).where(Teil.teil_id == "0999001")).scalar() == "0000017"
+        session.rollback()
+
+
+def test_sql_mode_matches_python(duckdb_engine):
+    seed(duckdb_engine, os.path.join(ROOT, "data", "source.xlsx"))
+    with OrmSession(duckdb_engine) as session:
+        model = CostModel.load(session)
+        for auftrag_nr in get_all_auftrag_ids():
+            sql_df = calc_sql.calc_full_cost_structure(auftrag_nr, session)
+            py_df = calc_full_cost_structure(auftrag_nr, model=model)
+            assert sql_df["Position"].tolist() == py_df["Position"].tolist()
+            assert calc_sql.calc_order_cost(auftrag_nr, session)["order_total"] == pytest.approx(
+                calc_order_cost(auftrag_nr, model=model)["order_total"])
+
+        session.add_all([Teil(teil_id="0099101", knoten="0099102", anzahl=1),
+                         Teil(teil_id="0099102", knoten="0099101", anzahl=1)])
+        session.flush()
+        with pytest.raises(CycleError) as exc:
+            calc_sql.calc_order_cost("99101", session)
+        assert exc.value.cycle == ["0099102", "0099101", "0099102"]
+        session.rollback()
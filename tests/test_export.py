@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+from scripts.calc import calc_order_cost
+from scripts.export import KOPF, POSITION, SUMME, export
+
+pytest.importorskip("pyarrow")
+
+
+def test_export_row_types(seeded, tmp_path):
+    stats = export(str(tmp_path), "parquet", progress=False)
+    df = pd.read_parquet(tmp_path)
+    assert len(df) == stats["zeilen"]
+
+    per_order = df.groupby("Auftrag")["Zeilenart"].agg(list)
+    assert all(arten[0] == KOPF and arten[-1] == SUMME for arten in per_order)
+
+    positions = df[df["Zeilenart"] == POSITION]
+    assert positions["Teil-ID"].str.fullmatch(r"\d{7}").all()
+    assert df.loc[df["Zeilenart"] != POSITION, "Teil-ID"].isna().all()
+
+    totals = positions.groupby("Auftrag")["Gesamtkosten"].sum()
+    for auftrag_nr, total in totals.items():
+        assert total == pytest.approx(calc_order_cost(auftrag_nr)["order_total"])
@@ -0,0 +1,69 @@
+from collections import defaultdict
+import numpy as np
+import pytest
+from scripts.calc import calc_full_cost_structure, calc_order_cost, get_all_auftrag_ids
+from scripts.cost_model import CostModel
+from scripts.gozinto import GozintoSolver
+from scripts.rollup import ArrayRollup, CostRollup
+
+
+@pytest.fixture(scope="module")
+def model(seeded):
+    return CostModel.load()
+
+
+@pytest.fixture(scope="module")
+def solver(model):
+    return GozintoSolver(model.arrays())
+
+
+@pytest.fixture(scope="module")
+def strukturen(model):
+    # Gesamtmenge je Teil und Auftrag aus der Stücklistenauflösung
+    result = {}
+    for auftrag_nr in get_all_auftrag_ids():
+        df = calc_full_cost_structure(auftrag_nr, model=model).iloc[1:-1]
+        result[auftrag_nr] = dict(zip(df["Position"].str.removeprefix("Teil "), df["Gesamt Anzahl"]))
+    return result
+
+
+@pytest.mark.parametrize("rollup_class", [CostRollup, ArrayRollup])
+def test_unit_costs_match_rollup(rollup_class, model, solver):
+    rollup = rollup_class(model) if rollup_class is CostRollup else rollup_class(model.arrays())
+    units = solver.unit_costs()
+    for i, teil_id in enumerate(model.arrays().teil_ids.tolist()):
+        unit = rollup.unit(teil_id)
+        for key in ("mat_gesamt", "fert_gesamt", "total"):
+            assert units[key][i] == pytest.approx(unit[key], rel=1e-9, abs=1e-9), (teil_id, key)
+
+
+def test_order_totals_match_calc_order_cost(model, solver):
+    arrays = model.arrays()
+    order_ids, root_parts, root_orders = arrays.order_roots()
+    totals = np.bincount(root_orders, weights=arrays.anzahl[root_parts] * solver.unit_costs()["total"][root_parts],
+                         minlength=len(order_ids))
+    for auftrag_nr, total in zip(order_ids.tolist(), totals):
+        assert total == pytest.approx(calc_order_cost(auftrag_nr, model=model)["order_total"], rel=1e-9)
+
+
+def test_material_requirements_match_structure(model, solver, strukturen):
+    order_ids, material_ids, R = solver.material_requirements()
+    for row, auftrag_nr in enumerate(order_ids.tolist()):
+        expected = defaultdict(float)
+        for teil_id, menge in strukturen[auftrag_nr].items():
+            if model.teile[teil_id].mat:
+                expected[model.teile[teil_id].mat] += menge
+        actual = {m: q for m, q in zip(material_ids.tolist(), R.getrow(row).toarray().ravel()) if q}
+        assert actual and actual == pytest.approx(dict(expected), rel=1e-9), auftrag_nr
+
+
+def test_machine_hours_match_structure(model, solver, strukturen):
+    order_ids, maschine_ids, H = solver.machine_hours()
+    for row, auftrag_nr in enumerate(order_ids.tolist()):
+        expected = defaultdict(float)
+        for teil_id, menge in strukturen[auftrag_nr].items():
+            for op in model.arbeitsplaene.get(teil_id, ()):
+                if op.maschine in model.maschinen:
+                    expected[op.maschine] += menge * op.dauer / 60
+        actual = {m: h for m, h in zip(maschine_ids.tolist(), H.getrow(row).toarray().ravel()) if h}
+        assert actual and actual == pytest.approx(dict(expected), rel=1e-9), auftrag_nr
@@ -0,0 +1,75 @@
+import pytest
+from openpyxl import Workbook
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session as OrmSession
+from scripts.cache import get_data_version
+from scripts.calc import calc_order_cost
+from scripts.cost_model import CostModel
+from scripts.import_data import import_workbook
+from scripts.models import Arbeitsplan, Auftrag, Base, Material, Teil
+
+# Zeilenzahlen bewusst kein Vielfaches der Blockgröße
+SHEETS = {
+    "Material": (["Nr", "kost"], [["M1", 2.0], ["M2", 3.5], ["M3", 1.25]]),
+    "Maschine": (["Nr", "Bezeichnung", "KS (€/h)"], [["001", "Säge", 60.0], ["002", "Fräse", 90.0]]),
+    "Auftrag": (["auftrag_nr"], [["A1"], ["A2"], ["A3"]]),
+    "Teil": (["teil_id", "teil_nr", "knoten", "Anzahl", "Mat"], [
+        [1, "T1", "A1", 2, "M1"], [2, "T2", 1, 3, "M2"], [3, "T3", 2, 1, "M3"],
+        [4, "T4", "a2", 1, "M1"], [5, "T5", "A3", 4, "M2"],
+    ]),
+    "Arbeitsplan": (["teil_id", "ag_nr", "maschine", "dauer (min)"], [
+        [1, "10", "001", 30], [1, "20", "002", 15], [2, "10", "001", 6], [4, "10", "002", 12], [5, "10", "001", 3],
+    ]),
+}
+
+
+def _workbook(path, kost_m1=2.0):
+    wb = Workbook()
+    wb.remove(wb.active)
+    for name, (header, rows) in SHEETS.items():
+        if name == "Material":
+            rows = [["M1", kost_m1]] + rows[1:]
+        ws = wb.create_sheet(name)
+        ws.append(header)
+        for row in rows:
+            ws.append(row)
+    wb.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _check_stored_costs(session):
+    model = CostModel.load(session)
+    for auftrag in session.scalars(select(Auftrag)):
+        expected = calc_order_cost(auftrag.auftrag_nr, model=model)["order_total"]
+        assert auftrag.k_mat + auftrag.k_fert == pytest.approx(expected)
+
+
+def test_import_twice_upserts(engine, tmp_path):
+    import_workbook(_workbook(tmp_path / "erst.xlsx"), engine, chunk_size=2, quiet=True)
+    with OrmSession(engine) as session:
+        counts = {m.__name__: session.scalar(select(func.count()).select_from(m))
+                  for m in (Material, Auftrag, Teil, Arbeitsplan)}
+        assert counts == {"Material": 3, "Auftrag": 3, "Teil": 5, "Arbeitsplan": 5}
+        # Normalisiert geladen: Teil-ID 7-stellig, Knoten groß bzw. 7-stellig
+        assert session.get(Teil, "0000002").knoten == "0000001"
+        assert session.get(Teil, "0000004").knoten == "A2"
+        assert get_data_version(session) == 1
+        _check_stored_costs(session)
+        before = session.get(Auftrag, "A1").k_mat
+
+    # Zweiter Import derselben Schlüssel mit neuem Preis: Upsert statt Schlüsselverletzung
+    import_workbook(_workbook(tmp_path / "zweit.xlsx", kost_m1=5.0), engine, chunk_size=2, quiet=True)
+    with OrmSession(engine) as session:
+        assert session.scalar(select(func.count()).select_from(Teil)) == 5
+        assert session.get(Material, "M1").kost == 5.0
+        assert get_data_version(session) == 2
+        assert session.get(Auftrag, "A1").k_mat > before
+        _check_stored_costs(session)
@@ -0,0 +1,45 @@
+import json
+import pytest
+from scripts import calc, instrumentation
+
+
+@pytest.fixture
+def profile(seeded, monkeypatch, tmp_path):
+    # Schalter und Protokollpfad nach dem Test wiederherstellen
+    monkeypatch.setattr(instrumentation, "_enabled", False)
+    monkeypatch.setattr(instrumentation, "_log_path", None)
+    log = tmp_path / "profile.jsonl"
+    instrumentation.reset()
+    instrumentation.enable(str(log))
+    yield log
+    instrumentation.reset()
+
+
+def test_counts_calls_statements_and_notes(profile, statements):
+    ids = calc.get_all_auftrag_ids()
+    assert len(statements) == 1
+    calc.calc_order_cost("A00001")
+    calc.calc_order_cost("A00002")
+
+    report = {r["function"]: r for r in instrumentation.report()}
+    assert set(report) == {"get_all_auftrag_ids", "calc_order_cost"}
+    ids_row = report["get_all_auftrag_ids"]
+    assert (ids_row["calls"], ids_row["statements"], ids_row["rows"]) == (1, 1, len(ids))
+
+    order_row = report["calc_order_cost"]
+    assert order_row["calls"] == 2
+    # Jede Anweisung nach get_all_auftrag_ids gehört zu einem der beiden calc_order_cost-Aufrufe
+    assert order_row["statements"] == len(statements) - 1 > 0
+    assert order_row["nodes"] > 0 and order_row["max_depth"] >= 1
+
+    lines = [json.loads(line) for line in profile.read_text(encoding="utf-8").splitlines()]
+    assert [line["function"] for line in lines] == ["get_all_auftrag_ids", "calc_order_cost", "calc_order_cost"]
+    assert sum(line["statements"] for line in lines) == len(statements)
+
+
+def test_disabled_records_nothing(profile, statements):
+    instrumentation.disable()
+    calc.get_all_auftrag_ids()
+    assert len(statements) == 1
+    assert instrumentation.report() == []
+    assert not profile.exists()
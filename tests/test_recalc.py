@@ -0,0 +1,56 @@
+import pytest
+from scripts.cost_model import CostModel
+from scripts.database import Session
+from scripts.models import Arbeitsplan, Material, Teil
+from scripts.recalc import recalc, recalc_all
+from scripts.rollup import CostRollup, CycleError
+
+
+@pytest.fixture
+def session(seeded):
+    session = Session()
+    recalc_all(session)
+    session.commit()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def assert_stored_costs_match(session):
+    rollup = CostRollup(CostModel.load(session))
+    for teil in session.query(Teil):
+        unit = rollup.unit(teil.teil_id)
+        assert teil.k_mat == pytest.approx(unit["mat_gesamt"]), teil.teil_id
+        assert teil.k_fert == pytest.approx(unit["fert_gesamt"]), teil.teil_id
+
+
+def test_partial_recalc_matches_full(session, statements):
+    material = session.get(Material, "M001")
+    material.kost += 7
+    statements.clear()
+    recalc(session, materialien=["M001"])
+    # Nur der betroffene Ausschnitt wird geladen, keine Tabelle vollständig
+    assert all("WHERE" in s for s in statements if s.lstrip().upper().startswith("SELECT"))
+    assert_stored_costs_match(session)
+
+    op = session.query(Arbeitsplan).first()
+    op.dauer += 5
+    recalc(session, teil_ids=[op.teil_id])
+    assert_stored_costs_match(session)
+
+
+def test_recalc_without_stored_costs(session):
+    session.query(Teil).update({Teil.k_mat: None, Teil.k_fert: None})
+    teil = session.query(Teil).filter(Teil.knoten.like("00%")).first()
+    counts = recalc(session, teil_ids=[teil.teil_id])
+    assert counts["teile"] == session.query(Teil).count()
+    assert_stored_costs_match(session)
+
+
+def test_recalc_detects_cycle(session):
+    child = session.query(Teil).filter(Teil.knoten.like("00%")).first()
+    parent = session.get(Teil, child.knoten)
+    session.add(Teil(teil_id="0099100", teil_nr="Z", knoten=child.teil_id, anzahl=1, mat="M001"))
+    parent.knoten = "0099100"
+    with pytest.raises(CycleError):
+        recalc(session, teil_ids=[parent.teil_id])
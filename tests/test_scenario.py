@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from scripts.cost_model import CostModel
+from scripts.scenario import BASIS, ScenarioEngine, parse_scenario
+
+
+@pytest.fixture(scope="module")
+def engine(seeded):
+    return ScenarioEngine(CostModel.load().arrays())
+
+
+def test_changes_of_one_number_stack(engine):
+    i = engine._material_index["M001"]
+    base = engine.arrays.material_kost[i]
+    P, _, _, _ = engine.prices([parse_scenario("A: M001*1.1, M001+2"), parse_scenario("B: M001+2, M001*1.1")])
+    assert P[i, 0] == pytest.approx(base * 1.1 + 2)
+    assert P[i, 1] == pytest.approx((base + 2) * 1.1)
+
+
+def test_basis_matches_cost_model(engine):
+    from scripts.calc import calc_order_cost
+
+    totals = engine.frame([BASIS])["Basis"]
+    expected = [calc_order_cost(nr)["order_total"] for nr in totals.index]
+    np.testing.assert_allclose(totals.to_numpy(), expected)
+
+
+def test_parse_scenario():
+    scenario = parse_scenario("A: MGK=12, FGK=-2%, M-01-2, 003 = -5")
+    assert scenario.mgk_satz == pytest.approx(0.12)
+    assert scenario.fgk_satz == pytest.approx(-0.02)
+    assert [tuple(c) for c in scenario.changes] == [("M-01", "-", 2.0), ("003", "=", -5.0)]
+    with pytest.raises(ValueError):
+        parse_scenario("C: M001")
+
+
+@pytest.mark.parametrize("value, rate", [("12", 0.12), ("12%", 0.12), ("0.99", 0.0099), ("1", 0.01),
+                                         ("1.5", 0.015), ("0", 0.0)])
+def test_rates_are_percent(value, rate):
+    assert parse_scenario(f"A: MGK={value}").mgk_satz == pytest.approx(rate)
+
+
+def test_percent_price_change_is_relative(engine):
+    i = engine._material_index["M001"]
+    base = engine.arrays.material_kost[i]
+    P, _, _, _ = engine.prices([parse_scenario("A: M001+15%"), parse_scenario("B: M001-15%")])
+    assert P[i, 0] == pytest.approx(base * 1.15)
+    assert P[i, 1] == pytest.approx(base * 0.85)
+    for line in ("C: M001*15%", "D: M001=15%"):
+        with pytest.raises(ValueError, match="%"):
+            parse_scenario(line)
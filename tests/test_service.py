@@ -0,0 +1,153 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from scripts.calc import calc_order_cost
+from scripts.database import Session
+from scripts.models import Auftrag, Teil
+from scripts.service import CostService, NotFound, Overloaded, WorkerPool, make_server
+
+
+@pytest.fixture
+def service(seeded):
+    service = CostService(workers=2, queue_size=8, timeout=10.0, version_check=0.0)
+    yield service
+    service.pool.shutdown()
+
+
+@pytest.fixture
+def raw_auftrag(seeded):
+    # Auftragsnummer klein und mit Leerzeichen gespeichert, das Teil verweist normalisiert darauf
+    session = Session()
+    session.add_all([Auftrag(auftrag_nr=" a00077"), Teil(teil_id="0099077", knoten="A00077", anzahl=2, mat="M001")])
+    session.commit()
+    yield " a00077"
+    session.query(Teil).filter(Teil.teil_id == "0099077").delete()
+    session.query(Auftrag).filter(Auftrag.auftrag_nr == " a00077").delete()
+    session.commit()
+    session.close()
+
+
+@pytest.fixture
+def zyklus_auftrag(seeded):
+    # Auftrag 0099201 -> 0099202 -> 0099201 -> ...
+    session = Session()
+    session.add_all([Auftrag(auftrag_nr="0099201"),
+                     Teil(teil_id="0099201", knoten="0099202", anzahl=1, mat="M001"),
+                     Teil(teil_id="0099202", knoten="0099201", anzahl=1, mat="M001")])
+    session.commit()
+    yield "0099201"
+    session.query(Teil).filter(Teil.teil_id.in_(["0099201", "0099202"])).delete()
+    session.query(Auftrag).filter(Auftrag.auftrag_nr == "0099201").delete()
+    session.commit()
+    session.close()
+
+
+def test_unnormalized_order_number_is_found(service, raw_auftrag):
+    result = json.loads(service.handle("/auftraege/A00077/kosten", {}))
+    assert result["auftrag_nr"] == raw_auftrag
+    assert [p["teil_id"] for p in result["positions"]] == ["0099077"]
+    assert result["order_total"] == pytest.approx(calc_order_cost("A00077")["order_total"])
+
+    with pytest.raises(NotFound):
+        service.handle("/auftraege/A00078/kosten", {})
+
+
+@pytest.fixture
+def blocked_pool():
+    """Pool mit einem Worker, der bis zur Freigabe an der ersten Aufgabe hängt"""
+    pool = WorkerPool(workers=1, queue_size=1)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(10)
+        return b"erste"
+
+    first = pool.submit("erste", blocking)
+    assert started.wait(10)
+    yield pool, first, release
+    release.set()
+    pool.shutdown()
+
+
+def test_identical_requests_share_a_future(blocked_pool):
+    pool, first, release = blocked_pool
+    second = pool.submit("zweite", lambda: b"zweite")
+    assert pool.submit("zweite", lambda: b"nochmal") is second
+    assert pool.submit("erste", lambda: b"nochmal") is first
+    assert pool.coalesced == 2
+
+    release.set()
+    assert first.result(10) == b"erste"
+    assert second.result(10) == b"zweite"
+
+
+def test_full_queue_is_rejected(blocked_pool):
+    pool, first, release = blocked_pool
+    pool.submit("zweite", lambda: b"zweite")
+    with pytest.raises(Overloaded):
+        pool.submit("dritte", lambda: b"dritte")
+    assert pool.rejected == 1
+
+
+@pytest.mark.parametrize("path, query, error", [
+    ("/unbekannt", {}, NotFound),
+    ("/auftraege/A99999/kosten", {}, NotFound),
+    ("/auftraege/A00001/unbekannt", {}, NotFound),
+    ("/maschinen/kosten", {"auftrag": "A99999"}, NotFound),
+    ("/maschinen/auslastung", {"wochen": "0"}, ValueError),
+    ("/maschinen/auslastung", {"wochen": "x"}, ValueError),
+])
+def test_routing_errors(service, path, query, error):
+    with pytest.raises(error):
+        service.handle(path, query)
+
+
+def test_routes(service):
+    auftraege = json.loads(service.handle("/auftraege", {}))
+    assert "A00001" in auftraege
+    kosten = json.loads(service.handle("/auftraege/a00001/kosten", {}))
+    assert kosten["order_total"] == pytest.approx(calc_order_cost("A00001")["order_total"])
+    assert json.loads(service.handle("/auftraege/A00001/struktur", {}))[-1]["Position"] == "GESAMT"
+    assert json.loads(service.handle("/maschinen/auslastung", {"wochen": "2"}))
+    assert json.loads(service.handle("/status", {}))["datenstand"] is not None
+
+
+def _get(service, path):
+    """Status und Kopfzeilen einer Anfrage über einen echten HTTP-Server"""
+    server = make_server("127.0.0.1", 0, service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}{path}", timeout=10) as response:
+            return response.status, response.headers
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize("path, status", [
+    ("/auftraege/A00001/kosten", 200),
+    ("/auftraege/A99999/kosten", 404),
+    ("/maschinen/auslastung?wochen=0", 400),
+])
+def test_http_status(service, path, status):
+    assert _get(service, path)[0] == status
+
+
+def test_http_503_when_queue_is_full(service, blocked_pool):
+    pool, first, release = blocked_pool
+    pool.submit("zweite", lambda: b"zweite")
+    idle_pool, service.pool = service.pool, pool
+    try:
+        status, headers = _get(service, "/materialien/kosten")
+    finally:
+        service.pool = idle_pool
+    assert status == 503 and headers["Retry-After"] == "1"
+
+
+def test_http_422_for_cycle(service, zyklus_auftrag):
+    assert _get(service, f"/auftraege/{zyklus_auftrag}/kosten")[0] == 422
@@ -0,0 +1,64 @@
+import os
+import pytest
+from scripts.calc import calc_order_cost, get_all_auftrag_ids
+from scripts.cost_model import BomArrays, CostModel
+from scripts.explosion import explode
+from scripts.rollup import ArrayRollup, CostRollup, CycleError
+from scripts.snapshot import load_arrays, write
+
+
+@pytest.fixture(scope="module")
+def model(seeded):
+    return CostModel.load()
+
+
+def test_write_leaves_no_temp_files(model, tmp_path):
+    path = tmp_path / "stammdaten.snap"
+    write(model.arrays(), str(path), 7)
+    write(model.arrays(), str(path), 7)
+    assert os.listdir(tmp_path) == ["stammdaten.snap"]
+
+    arrays = load_arrays(str(path), 7)
+    assert arrays.data_version == 7
+    assert arrays.teil_ids.tolist() == model.arrays().teil_ids.tolist()
+
+
+def test_array_rollup_matches_cost_rollup(model):
+    # Vergleich mit dem Modell, das ein Snapshot-Leser bisher aufgebaut hat
+    arrays = model.arrays()
+    rollup = CostRollup(CostModel.from_arrays(arrays))
+    array_rollup = ArrayRollup(arrays)
+    for auftrag_nr in get_all_auftrag_ids() + [" a00001", "A99999"]:
+        assert calc_order_cost(auftrag_nr, rollup=array_rollup) == calc_order_cost(auftrag_nr, rollup=rollup)
+
+
+def test_array_rollup_cycle(model):
+    # 0000017 hängt unter seinem eigenen Kind
+    arrays = model.arrays()
+    child = arrays.child_order[arrays.child_ptr[arrays.teil_ids.tolist().index("0000017")]]
+    parent = arrays.parent.copy()
+    parent[arrays.teil_ids.tolist().index("0000017")] = child
+    cyclic = BomArrays(arrays.teil_ids, arrays.teil_nr, arrays.knoten, parent, arrays.anzahl, arrays.teil_mat,
+                       arrays.material_ids, arrays.material_kost, arrays.maschine_ids, arrays.maschine_ks,
+                       arrays.maschine_bez, arrays.op_teil, arrays.op_maschine, arrays.op_dauer, arrays.op_ag_nr)
+
+    rollup = ArrayRollup(cyclic)
+    with pytest.raises(CycleError) as exc:
+        rollup.cost("0000017")
+    assert exc.value.cycle == ["0000017", arrays.teil_ids[child], "0000017"]
+
+
+def test_explode_cycle(model):
+    # 0000017 hängt unter seinem eigenen Kind, die Auflösung beginnt beim Kind
+    arrays = model.arrays()
+    i = arrays.teil_ids.tolist().index("0000017")
+    child = arrays.child_order[arrays.child_ptr[i]]
+    parent = arrays.parent.copy()
+    parent[i] = child
+    cyclic = BomArrays(arrays.teil_ids, arrays.teil_nr, arrays.knoten, parent, arrays.anzahl, arrays.teil_mat,
+                       arrays.material_ids, arrays.material_kost, arrays.maschine_ids, arrays.maschine_ks,
+                       arrays.maschine_bez, arrays.op_teil, arrays.op_maschine, arrays.op_dauer, arrays.op_ag_nr)
+
+    with pytest.raises(CycleError) as exc:
+        explode(cyclic, [child])
+    assert exc.value.cycle == [arrays.teil_ids[child], "0000017", arrays.teil_ids[child]]
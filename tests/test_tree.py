@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.calc import calc_order_cost, get_all_auftrag_ids
+from scripts.cost_model import BomArrays, CostModel
+from scripts.rollup import CycleError
+from scripts.tree import CostTree, paginate, top_k
+
+
+@pytest.fixture(scope="module")
+def arrays(seeded):
+    return CostModel.load().arrays()
+
+
+@pytest.mark.parametrize("descending", [True, False])
+@pytest.mark.parametrize("k", [0, 1, 5, 19, 20, 25])
+def test_top_k_matches_full_sort(k, descending):
+    rng = np.random.default_rng(7)
+    # Viele gleiche Werte und NaN: Reihenfolge muss der stabilen Vollsortierung entsprechen
+    values = rng.integers(0, 5, 20).astype(float)
+    values[[3, 11]] = np.nan
+    fill = -np.inf if descending else np.inf
+    key = np.where(np.isnan(values), fill, values)
+    expected = np.argsort(-key if descending else key, kind="stable")[:k]
+    assert top_k(values, k, descending).tolist() == expected.tolist()
+
+    texts = np.array([f"T{v:03d}" for v in rng.integers(0, 8, 20)])
+    ranks = np.unique(texts, return_inverse=True)[1]
+    expected = np.argsort(-ranks if descending else ranks, kind="stable")[:k]
+    assert top_k(texts, k, descending).tolist() == expected.tolist()
+
+
+def test_paginate_page_boundaries():
+    df = pd.DataFrame({"Position": [f"Teil {i:03d}" for i in range(23)], "Wert": np.arange(23.0)})
+    pages = [paginate(df, offset, 10) for offset in (0, 10, 20, 30)]
+    assert [p.total for p in pages] == [23] * 4
+    assert [len(p.rows) for p in pages] == [10, 10, 3, 0]
+    assert pd.concat([p.rows for p in pages]).equals(df)
+
+    sorted_pages = [paginate(df, offset, 10, sort_by="Wert").rows for offset in (0, 10, 20)]
+    assert pd.concat(sorted_pages)["Wert"].tolist() == list(range(22, -1, -1))
+
+    found = paginate(df, 0, 2, suche="teil 01")
+    assert found.total == 10 and found.rows["Position"].tolist() == ["Teil 010", "Teil 011"]
+
+
+def test_tree_pages_match_sorted_children(arrays):
+    tree = CostTree(arrays)
+    for auftrag_nr in get_all_auftrag_ids():
+        assert tree.order_total(auftrag_nr) == pytest.approx(calc_order_cost(auftrag_nr)["order_total"])
+
+        full = tree.children(auftrag_nr, limit=len(arrays.teil_ids), sort_by=None).rows
+        expected = full.sort_values("Kosten gesamt", ascending=False, kind="stable")["Teil-ID"].tolist()
+        paged = [tree.children(auftrag_nr, offset=o, limit=2).rows for o in range(0, len(full) + 2, 2)]
+        assert pd.concat(paged)["Teil-ID"].tolist() == expected
+
+
+def test_depths_cycle(arrays):
+    # 0000017 hängt unter seinem eigenen Kind
+    i = arrays.teil_ids.tolist().index("0000017")
+    child = arrays.child_order[arrays.child_ptr[i]]
+    parent = arrays.parent.copy()
+    parent[i] = child
+    cyclic = BomArrays(arrays.teil_ids, arrays.teil_nr, arrays.knoten, parent, arrays.anzahl, arrays.teil_mat,
+                       arrays.material_ids, arrays.material_kost, arrays.maschine_ids, arrays.maschine_ks,
+                       arrays.maschine_bez, arrays.op_teil, arrays.op_maschine, arrays.op_dauer, arrays.op_ag_nr)
+
+    with pytest.raises(CycleError) as exc:
+        CostTree._depths(cyclic)
+    assert sorted(exc.value.cycle) == sorted(["0000017", arrays.teil_ids[child]])
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.utils import format_de, format_de_array
+
+GEMISCHT = [None, np.nan, pd.NA, "abc", "12,5", 0, -0.0, 1, -1, 1234567, 0.005, 0.015, 2.675, -1234.5,
+            999.995, 12.34, 1e15 - 0.5, 1e15, 1e20, np.inf, -np.inf]
+
+
+def _zufall():
+    rng = np.random.default_rng(0)
+    return np.concatenate([
+        rng.normal(0, 1e6, 2000),
+        np.round(rng.uniform(-1e5, 1e5, 2000), 3),
+        # Werte, deren Cent-Rundung auf ,5 fällt
+        np.arange(-2000, 2000) / 1000 + 0.0005,
+        rng.integers(-10 ** 12, 10 ** 12, 2000).astype(float),
+    ])
+
+
+@pytest.mark.parametrize("values", [
+    pytest.param(np.array(GEMISCHT, dtype=object), id="gemischt"),
+    pytest.param(_zufall(), id="float"),
+    pytest.param(np.arange(-5000, 5000, 7), id="int"),
+    pytest.param(pd.Series([1.5, None, 3.0]).to_numpy(), id="nan"),
+])
+def test_format_de_array_matches_format_de(values):
+    assert format_de_array(values).tolist() == [format_de(v) for v in values]
+
+
+def test_format_de_array_keeps_shape():
+    values = np.array([[1.5, 2.0], [np.nan, -1234.567]])
+    assert format_de_array(values).tolist() == [["1,50", "2"], ["", "-1.234,57"]]
+
+
+@pytest.mark.parametrize("value", [None, np.nan, pd.NA])
+def test_empty_cells(value):
+    assert format_de(value) == "" == format_de_array(np.array([value], dtype=object))[0]
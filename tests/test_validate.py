@@ -0,0 +1,55 @@
+import pytest
+from scripts.calc import get_all_auftrag_ids
+from scripts.database import Session
+from scripts.models import Arbeitsplan, Teil
+from scripts.validate import FEHLER, WARNUNG, validate
+
+# Je Fall die zusätzlichen Zeilen und der erwartete Befund (Schwere, Prüfung, Schlüssel, Wert)
+FAELLE = [
+    pytest.param(
+        [Teil(teil_id="0099201", knoten="0099202", anzahl=1), Teil(teil_id="0099202", knoten="0099201", anzahl=1)],
+        (FEHLER, "Zyklus", "0099201", "0099201 -> 0099202 -> 0099201"), id="zyklus"),
+    pytest.param(
+        [Teil(teil_id="0099211", knoten="A99999", anzahl=1)],
+        (WARNUNG, "Waise", "0099211", "unbekannter Auftrag A99999"), id="waise"),
+    pytest.param(
+        [Teil(teil_id="0099221", knoten="A00001", anzahl=1, mat="M999")],
+        (FEHLER, "Material fehlt", "0099221", "M999"), id="material"),
+    pytest.param(
+        [Teil(teil_id="0099231", knoten="A00001", anzahl=1),
+         Arbeitsplan(teil_id="0099231", ag_nr="10", maschine="999", dauer=5)],
+        (FEHLER, "Maschine fehlt", "0099231/10", "999"), id="maschine"),
+    pytest.param(
+        [Teil(teil_id="0099241", knoten="A00001", anzahl=0)],
+        (WARNUNG, "Anzahl fehlt oder ≤ 0", "0099241", 0), id="anzahl"),
+]
+
+
+@pytest.fixture
+def zeilen(request, seeded):
+    rows = request.param
+    session = Session()
+    session.add_all(rows)
+    session.commit()
+    yield rows
+    for row in rows:
+        session.delete(row)
+    session.commit()
+    session.close()
+
+
+def test_clean_data_has_no_findings(seeded):
+    assert validate().empty
+
+
+def test_order_numbers_are_normalized(seeded):
+    # Klein und mit Leerzeichen gespeicherte Auftragsnummern sind weder leer noch Ursache von Waisen
+    auftraege = [" " + nr.lower() for nr in get_all_auftrag_ids()]
+    assert validate(auftraege=auftraege).empty
+
+
+@pytest.mark.parametrize("zeilen, befund", FAELLE, indirect=["zeilen"])
+def test_findings(zeilen, befund):
+    issues = validate()
+    assert [tuple(row) for row in issues[["Schwere", "Prüfung", "Schlüssel", "Wert"]].itertuples(index=False)] \
+        == [befund]
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+from scripts.cost_model import CostModel
+from scripts.database import Session
+from scripts.models import Arbeitsplan, Teil
+from scripts.where_used import KINDS, WhereUsedIndex
+
+# Neue Baugruppe unter 0000017; das Kind steht vor seinem Elternteil
+TEILE = [("0099402", "0099401", 3.0, "M002"), ("0099401", "0000017", 2.0, "M001")]
+ARBEITSPLAN = [("0099402", "003", 30.0), ("0099401", "001", 12.0)]
+
+
+@pytest.fixture
+def session(seeded):
+    # Nicht committen: die Änderungen verschwinden mit dem Rollback
+    session = Session()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def _frame(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(df.columns[0], ignore_index=True)
+
+
+def test_incremental_matches_rebuild(session):
+    arrays = CostModel.load(session).arrays()
+    index = WhereUsedIndex(arrays, 1)
+
+    session.add_all([Teil(teil_id=t, knoten=k, anzahl=a, mat=m) for t, k, a, m in TEILE])
+    session.add_all([Arbeitsplan(teil_id=t, ag_nr="10", maschine=m, dauer=d) for t, m, d in ARBEITSPLAN])
+    session.flush()
+    index.advance(2, lambda: index.add_teile(TEILE))
+    index.advance(3, lambda: all(index.add_arbeitsplan(*row) for row in ARBEITSPLAN))
+    assert index.version == 3
+
+    rebuilt = WhereUsedIndex(CostModel.load(session).arrays(), 3)
+    ids = {"material": arrays.material_ids.tolist(), "maschine": arrays.maschine_ids.tolist()}
+    for kind in KINDS:
+        for nr in ids[kind]:
+            pd.testing.assert_frame_equal(_frame(index.orders(kind, nr)), _frame(rebuilt.orders(kind, nr)))
+            pd.testing.assert_frame_equal(_frame(index.parts(kind, nr)), _frame(rebuilt.parts(kind, nr)))
+    assert index.ancestors("0099402").equals(rebuilt.ancestors("0099402"))
+    assert "0099402" in index.parts("maschine", "003")["Teil-ID"].tolist()
+
+
+def test_advance_from_other_version_goes_stale(seeded):
+    index = WhereUsedIndex(CostModel.load().arrays(), 1)
+    # Ein anderer Schreiber hat den Stand dazwischen erhöht
+    index.advance(3, lambda: True)
+    assert index.version is None
+
+
+def test_moved_subtree_needs_rebuild(seeded):
+    index = WhereUsedIndex(CostModel.load().arrays(), 1)
+    # Ein vorhandenes Teil erneut anzulegen verschiebt Teilbäume
+    index.advance(2, lambda: index.add_teil("0000017", "A00002", 1, "M001"))
+    assert index.version is None